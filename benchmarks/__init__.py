@@ -0,0 +1,7 @@
+"""
+Benchmarks for `scheintool`.
+
+Run them from the base of the repository, e.g. with
+
+    python -m benchmarks.bench_workers
+"""
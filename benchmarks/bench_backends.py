@@ -0,0 +1,59 @@
+"""
+Per-certificate time of the rendering backends, and a check that all of them
+place the same text at the same coordinates as the reference backend `merge`.
+
+    python -m benchmarks.bench_backends -n 10 100 1000
+
+The positions are the text matrices at which PyPDF2 finds the strings while
+extracting the text, so both the template and the entries are compared.
+Each entry has to be within 0.1 pt of its position in the reference, else
+the benchmark exits with status 1. `tests/test_backends.py` checks the same
+with names that are not in WinAnsi.
+"""
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from scheintool import settings, backends
+from scheintool.synthetic import certificate_data, placed_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[10, 100, 1000], help='number of certificates')
+    parser.add_argument('--degree', default='master', choices=['master', 'bachelor'])
+    args = parser.parse_args()
+
+    available = [name for name, backend in backends.backends.items() if backend.available()]
+
+    print(f'{"students":>8s} ' + ' '.join(f'{name + " [ms]":>12s}' for name in available) + f' {"fastest":>8s} {"same text":>10s}')
+
+    mismatch = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.students:
+            data = certificate_data(n)
+            times = {}
+            for name in available:
+                fname = Path(tmp) / f'{n}_{name}.pdf'
+                t0 = time.perf_counter()
+                settings.fill_certificate(data, fname, degree=args.degree, backend=name)
+                times[name] = (time.perf_counter() - t0) / n * 1e3
+
+            reference = placed_text(Path(tmp) / f'{n}_merge.pdf')
+            same = all(placed_text(Path(tmp) / f'{n}_{name}.pdf') == reference for name in available)
+            mismatch = mismatch or not same
+            fastest = min(times, key=times.get)
+            print(f'{n:8d} ' + ' '.join(f'{times[name]:12.2f}' for name in available) + f' {fastest:>8s} {str(same):>10s}')
+
+        # what `fill_certificate(..., backend='auto')` picks on this machine
+
+        print(f'auto: {backends.fastest(settings.normalize_grades(certificate_data(20)), args.degree).name}')
+
+    if mismatch:
+        sys.exit('the backends do not place the same text')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Time of the XLS -> XLSX conversion with LibreOffice: one `soffice` call per
+file (`settings.convert_xls_xsls`) compared to the `ConversionPool`, which
+converts the queued files together, each worker with its own profile.
+
+    python -m benchmarks.bench_convert -n 1 10 50 -w 1 2 --soffice /usr/bin/soffice
+
+The input is copied from `example/LSF.XLS`. For the pool, the first round
+includes setting up the profiles, the second round converts fresh copies
+with the same pool, and the third uses a new pool that finds the profiles of
+the first one (as the GUI does when it is started again, see
+`settings.get_conversion_pool`). In every round, `soffice` is started again,
+the pool keeps no instance running. Without LibreOffice, the benchmark
+cannot run; its numbers have not been measured with LibreOffice yet.
+"""
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+from scheintool import settings
+from scheintool.convert import ConversionPool
+
+example = Path(__file__).parents[1] / 'example' / 'LSF.XLS'
+
+
+def copies(directory, n):
+    "returns `n` copies of the example roster in `directory`"
+    directory.mkdir()
+    files = [directory / f'LSF_{i}.XLS' for i in range(n)]
+    for filename in files:
+        shutil.copy(example, filename)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--files', type=int, nargs='+', default=[1, 10, 50], help='numbers of files')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1, 2], help='sizes of the pool')
+    parser.add_argument('--soffice', default=None, help='LibreOffice executable (default: from the config file)')
+    args = parser.parse_args()
+
+    executable = args.soffice or settings.guess_path(settings.platform)
+    if executable is None or shutil.which(str(executable)) is None:
+        print('LibreOffice not found, give the executable with --soffice', file=sys.stderr)
+        sys.exit(1)
+
+    print(f'{"files":>6s} {"workers":>8s} {"cold [s]":>9s} {"pool [s]":>9s} {"second [s]":>11s} '
+          f'{"kept profiles [s]":>18s} {"calls":>6s} {"speedup":>8s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for n in args.files:
+            files = copies(tmp / f'cold_{n}', n)
+            t0 = time.perf_counter()
+            for filename in files:
+                if settings.convert_xls_xsls(filename, libreoffice_executable=executable) is None:
+                    raise RuntimeError(f'conversion of {filename} failed')
+            cold = time.perf_counter() - t0
+
+            for workers in args.workers:
+                profiles = tmp / f'profiles_{n}_{workers}'
+                times = []
+                with ConversionPool(executable, size=workers, profiles=profiles) as pool:
+                    for run in ['first', 'second']:
+                        files = copies(tmp / f'pool_{n}_{workers}_{run}', n)
+                        t0 = time.perf_counter()
+                        pool.convert_many(files)
+                        times.append(time.perf_counter() - t0)
+                    calls = pool.calls
+
+                with ConversionPool(executable, size=workers, profiles=profiles) as pool:
+                    files = copies(tmp / f'pool_{n}_{workers}_restart', n)
+                    t0 = time.perf_counter()
+                    pool.convert_many(files)
+                    times.append(time.perf_counter() - t0)
+
+                print(f'{n:6d} {workers:8d} {cold:9.2f} {times[0]:9.2f} {times[1]:11.2f} {times[2]:18.2f} {calls:6d} '
+                      f'{cold / times[1]:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
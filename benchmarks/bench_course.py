@@ -0,0 +1,51 @@
+"""
+Per-certificate time and output size with the entries of the course drawn
+once as shared form XObject, compared to drawing them on every page.
+
+    python -m benchmarks.bench_course -n 10 100 1000
+
+Both ways have to put the same text at the same positions, see
+`scheintool.synthetic.placed_text` and `tests/test_course.py`.
+"""
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from scheintool import settings
+from scheintool.backends import ReportlabBackend, DirectBackend
+from scheintool.synthetic import certificate_data, placed_text
+
+variants = {
+    'form': lambda shared: ReportlabBackend(shared_course=shared),
+    'direct': lambda shared: DirectBackend(shared_course=shared),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[10, 100, 1000], help='number of certificates')
+    args = parser.parse_args()
+
+    print(f'{"students":>8s} {"backend":>8s} {"per page [ms]":>14s} {"shared [ms]":>12s} '
+          f'{"per page [kB]":>14s} {"shared [kB]":>12s} {"same text":>10s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.students:
+            data = certificate_data(n)
+            for name, backend in variants.items():
+                times = {}
+                files = {}
+                for shared in [False, True]:
+                    files[shared] = Path(tmp) / f'{n}_{name}_{shared}.pdf'
+                    t0 = time.perf_counter()
+                    settings.fill_certificate(data, files[shared], backend=backend(shared))
+                    times[shared] = (time.perf_counter() - t0) / n * 1e3
+
+                same = placed_text(files[False]) == placed_text(files[True])
+                print(f'{n:8d} {name:>8s} {times[False]:14.2f} {times[True]:12.2f} '
+                      f'{files[False].stat().st_size / 1024:14.1f} {files[True].stat().st_size / 1024:12.1f} {str(same):>10s}')
+
+
+if __name__ == '__main__':
+    main()
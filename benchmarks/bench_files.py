@@ -0,0 +1,67 @@
+"""
+Throughput of `fill_certificate_files`, one PDF per student, into a directory
+and into a ZIP archive, compared to splitting the combined PDF afterwards.
+
+    python -m benchmarks.bench_files -n 10 100 1000 -w 1 4
+"""
+import io
+import time
+import zipfile
+import argparse
+import tempfile
+from pathlib import Path
+
+import PyPDF2
+
+from scheintool import settings
+from scheintool.synthetic import certificate_data
+
+
+def split(filename, directory):
+    "writes every page of `filename` into its own PDF, as done before by hand"
+    directory.mkdir()
+    for i, page in enumerate(PyPDF2.PdfReader(str(filename)).pages):
+        output = PyPDF2.PdfWriter()
+        output.add_page(page)
+        with open(directory / f'{i}.pdf', 'wb') as fh:
+            output.write(fh)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[10, 100, 1000], help='number of certificates')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1], help='numbers of worker processes')
+    parser.add_argument('--backend', default='direct', help='rendering backend')
+    args = parser.parse_args()
+
+    print(f'{"students":>8s} {"workers":>8s} {"split [files/s]":>16s} {"dir [files/s]":>14s} {"zip [files/s]":>14s} {"zip size [kB]":>14s} {"complete":>9s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for n in args.students:
+            data = certificate_data(n)
+            n_passed = int((settings.normalize_grades(data)['BENB'] == 'BE').sum())
+            for workers in args.workers:
+                run = tmp / f'{n}_{workers}'
+                run.mkdir()
+
+                t0 = time.perf_counter()
+                settings.fill_certificate(data, run / 'all.pdf', workers=workers, backend=args.backend)
+                split(run / 'all.pdf', run / 'split')
+                t_split = n_passed / (time.perf_counter() - t0)
+
+                directory = settings.fill_certificate_files(data, run / 'files', workers=workers, backend=args.backend)
+                archive = settings.fill_certificate_files(data, run / 'files.zip', workers=workers, backend=args.backend)
+
+                # every file needs to be a readable one page PDF
+                with zipfile.ZipFile(run / 'files.zip') as zf:
+                    names = zf.namelist()
+                    complete = (len(names) == n_passed == len(list((run / 'files').iterdir())) and
+                                all(len(PyPDF2.PdfReader(io.BytesIO(zf.read(name))).pages) == 1 for name in names))
+
+                print(f'{n:8d} {workers:8d} {t_split:16.1f} {directory["files_per_s"]:14.1f} {archive["files_per_s"]:14.1f} '
+                      f'{(run / "files.zip").stat().st_size / 1024:14.1f} {str(complete):>9s}')
+
+
+if __name__ == '__main__':
+    main()
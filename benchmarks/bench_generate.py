@@ -0,0 +1,116 @@
+"""
+Wall time of the GUI's Generate run (`scheintool.pipeline.generate`) with the
+stages overlapped, compared to running them one after the other.
+
+    python -m benchmarks.bench_generate -n 300 -w 1 2
+
+Every run starts a fresh interpreter, as the GUI does its first run after
+starting: imports and parsing the template are part of the time. The roster
+is an `.xlsx` file, the grades a `.csv` file, and the roster is not in the
+cache yet. The start and end of every stage are printed for the fastest run
+of each variant.
+
+With `--libreoffice 3`, the roster is an HTML export with an `.XLS` suffix,
+which has to be converted. Instead of LibreOffice, a script that waits 3 s
+and then writes the converted roster is called, so the benchmark shows how
+much of the conversion is hidden without needing LibreOffice.
+"""
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from scheintool.pipeline import timings
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, course
+
+# runs one Generate in a fresh interpreter and prints the result as JSON
+
+run_once = """
+import sys, json, tempfile
+from pathlib import Path
+from scheintool import settings, pipeline
+from scheintool.convert import ConversionPool
+
+settings.interactive = False
+settings.cache_dir = Path(tempfile.mkdtemp())
+lsf_file, grade_file, filename, course, workers, backend, concurrent, soffice = json.loads(sys.argv[1])
+if soffice is not None:
+    settings._conversion_pool = ConversionPool(soffice)
+result = pipeline.generate(lsf_file, grade_file, filename, course, workers=workers, backend=backend, concurrent=concurrent)
+result['report'] = None
+print(json.dumps(result))
+"""
+
+
+# stands in for LibreOffice: waits, then "converts" by copying the roster
+
+stand_in = """#!{python}
+import sys, time, shutil
+from pathlib import Path
+
+time.sleep({delay})
+outdir = Path(sys.argv[sys.argv.index('--outdir') + 1])
+for source in sys.argv[sys.argv.index('--outdir') + 2:]:
+    shutil.copy({roster!r}, outdir / (Path(source).stem + '.xlsx'))
+"""
+
+
+def generate(tmp, lsf_file, soffice, workers, backend, concurrent):
+    "returns the result of `pipeline.generate` in a fresh interpreter"
+    # a fresh copy, so the conversion is not skipped
+    if lsf_file.suffix == '.XLS':
+        lsf_file = lsf_file.with_name(f'run_{workers}_{concurrent}_{len(list(tmp.iterdir()))}.XLS')
+        lsf_file.write_bytes((tmp / 'lsf.XLS').read_bytes())
+    args = [str(lsf_file), str(tmp / 'grades.csv'), str(tmp / f'out_{workers}_{concurrent}.pdf'), course,
+            workers, backend, concurrent, soffice]
+    output = subprocess.run([sys.executable, '-c', run_once, json.dumps(args)], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, default=300, help='number of students in the course')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1, 2], help='worker processes of fill_certificate')
+    parser.add_argument('-b', '--backend', default='form', help='backend of fill_certificate')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='runs per variant, the fastest is shown')
+    parser.add_argument('--libreoffice', type=float, default=None, metavar='SECONDS',
+                        help='convert the roster with a stand-in for LibreOffice that takes SECONDS')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        roster = lsf_roster(args.students)
+        write_lsf(roster, tmp / 'lsf.xlsx')
+        write_grades(grade_file(roster), tmp / 'grades.csv')
+
+        lsf_file, soffice = tmp / 'lsf.xlsx', None
+        if args.libreoffice is not None:
+            lsf_file, soffice = tmp / 'lsf.XLS', tmp / 'soffice'
+            lsf_file.write_text('<html><body><table></table></body></html>\n')
+            soffice.write_text(stand_in.format(python=sys.executable, delay=args.libreoffice, roster=str(tmp / 'lsf.xlsx')))
+            soffice.chmod(0o755)
+            soffice = str(soffice)
+
+        totals = {}
+        for workers in args.workers:
+            for concurrent in [False, True]:
+                runs = [generate(tmp, lsf_file, soffice, workers, args.backend, concurrent) for _ in range(args.repeat)]
+                fastest = min(runs, key=lambda result: result['time'])
+                failed = [name for name, stage in fastest['stages'].items() if stage['error']]
+                if failed or not (fastest['certificates'] and fastest['table']):
+                    raise RuntimeError(f'stages failed: {failed}\n{timings(fastest)}')
+
+                totals[workers, concurrent] = fastest['time']
+                print(f'\n{args.students} students, {workers} workers, {"overlapped" if concurrent else "one after the other"}:')
+                print(timings(fastest))
+
+        print(f'\n{"workers":>7s} {"sequential [s]":>15s} {"overlapped [s]":>15s} {"saved":>6s}')
+        for workers in args.workers:
+            sequential, overlapped = totals[workers, False], totals[workers, True]
+            print(f'{workers:7d} {sequential:15.2f} {overlapped:15.2f} {1 - overlapped / sequential:6.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Time and peak memory of `write_grade_table` for different table sizes.
+
+    python -m benchmarks.bench_grade_table -n 1000 10000 100000
+"""
+import time
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from scheintool import settings
+from scheintool.synthetic import certificate_data, course
+
+modes = {
+    'xlsx': ('.xlsx', False),
+    'xlsx constant memory': ('.xlsx', True),
+    'csv': ('.csv', True),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[1000, 10000, 100000], help='table sizes')
+    args = parser.parse_args()
+
+    print(f'{"rows":>8s} {"mode":>22s} {"time [s]":>10s} {"peak [MB]":>10s} {"size [kB]":>10s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.students:
+            data = settings.normalize_grades(certificate_data(n))
+            for name, (suffix, constant_memory) in modes.items():
+                fname = Path(tmp) / f'grades_{n}{suffix}'
+
+                tracemalloc.start()
+                t0 = time.perf_counter()
+                settings.write_grade_table(fname, data, course, constant_memory=constant_memory)
+                dt = time.perf_counter() - t0
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                print(f'{n:8d} {name:>22s} {dt:10.3f} {peak / 1024**2:10.1f} {fname.stat().st_size / 1024:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
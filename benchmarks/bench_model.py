@@ -0,0 +1,112 @@
+"""
+Memory per student and time to iterate and sort the table of students, with
+the course copied into every row (as `merge_course_data` did before) and
+with the course as one record next to a table with only the students
+(`scheintool.model`).
+
+    python -m benchmarks.bench_model -n 10000 100000
+
+For both layouts, the entries of all certificates are built and the rows
+sorted as every writer needs them; the compact table only checks the order
+computed when merging. The entries must be the same. With `--writers`, the
+end-to-end time of `fill_certificate` and `write_grade_table` is compared.
+"""
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from scheintool import settings, model
+from scheintool.backends import student_entries, course_entries, today_text
+from scheintool.cache import RosterCache
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, course
+
+
+def broadcast(data, course_info):
+    "returns `data` with every value of the course copied into every row"
+    return data.drop(columns='order').assign(**{name: course_info[name] for name in model.Course._fields})
+
+
+def entries_per_row(data, today):
+    "the entries of all certificates, iterating the rows of the table with the course in every row"
+    return [student_entries(row) + course_entries(row, today) for row in data.sort_values('lastname').itertuples()]
+
+
+def entries_per_course(data, course_info, today):
+    "the entries of all certificates, iterating the students and building the entries of the course once"
+    entries = {}
+    result = []
+    for student, course in model.rows(model.sorted_students(data), course_info):
+        if course not in entries:
+            entries[course] = course_entries(course, today)
+        result.append(student_entries(student) + entries[course])
+    return result
+
+
+def timed(function, repeat=3):
+    "returns the result of `function()` and its best time of `repeat` runs in s"
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[10000, 100000], help='number of students')
+    parser.add_argument('--writers', action='store_true', help='also time fill_certificate (direct) and write_grade_table')
+    args = parser.parse_args()
+
+    settings.interactive = False
+    today = today_text()
+
+    print(f'{"students":>8s} {"layout":>9s} {"columns":>8s} {"B/student":>10s} {"sort [ms]":>10s} '
+          f'{"iterate [µs/row]":>17s} {"writers [s]":>12s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        settings._roster_cache = RosterCache(tmp / 'cache')
+
+        for n in args.students:
+            roster = lsf_roster(n)
+            write_lsf(roster, tmp / 'lsf.csv')
+            write_grades(grade_file(roster), tmp / 'grades.csv')
+            lsf = settings.read_LSF(tmp / 'lsf.csv', use_cache=False)
+            grades = settings.read_grades(tmp / 'grades.csv')
+
+            compact, course_info = settings.merge_course_data(lsf, grades, course)
+            layouts = {
+                'broadcast': (broadcast(compact, course_info), None),
+                'compact': (compact, course_info),
+            }
+
+            results = {}
+            for name, (data, info) in layouts.items():
+                memory = data.memory_usage(deep=True).sum() / len(data)
+                if info is None:
+                    _, sort = timed(lambda: data.sort_values('lastname'))
+                    results[name], iterate = timed(lambda: entries_per_row(data, today))
+                else:
+                    _, sort = timed(lambda: model.sorted_students(data))
+                    results[name], iterate = timed(lambda: entries_per_course(data, info, today))
+
+                writers = float('nan')
+                if args.writers:
+                    t0 = time.perf_counter()
+                    settings.fill_certificate(data, tmp / f'{name}.pdf', backend='direct', course=info)
+                    settings.write_grade_table(tmp / f'{name}.xlsx', data, course_info)
+                    writers = time.perf_counter() - t0
+
+                print(f'{n:8d} {name:>9s} {data.shape[1]:8d} {memory:10.0f} {sort * 1e3:10.1f} '
+                      f'{iterate / len(data) * 1e6:17.2f} {writers:12.2f}')
+
+            # the order differs only where the German order differs from comparing the code points
+            same = sorted(map(repr, results['broadcast'])) == sorted(map(repr, results['compact']))
+            _, once = timed(lambda: model.sort_order(compact))
+            print(f'{"":8s} same entries: {same}, German order computed once when merging: {once * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
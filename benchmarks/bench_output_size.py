@@ -0,0 +1,53 @@
+"""
+Size and write time of the certificate PDF with the template embedded once
+as form XObject compared to one copy of the template per page.
+
+    python -m benchmarks.bench_output_size -n 10 100 1000 -w 1 3
+
+Both files have to show the same words on every page. They are compared
+without their order, as PyPDF2 extracts them in a different order (and
+sometimes without a space in between) when the template is a form.
+"""
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from scheintool import settings
+from scheintool.synthetic import certificate_data, placed_text
+
+
+def page_words(filename):
+    "returns the sorted words shown on every page"
+    return [sorted(word for text, x, y in page for word in text.split()) for page in placed_text(filename)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[10, 100, 1000], help='number of certificates')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1], help='number of processes rendering the certificates')
+    parser.add_argument('--degree', default='master', choices=['master', 'bachelor'])
+    args = parser.parse_args()
+
+    print(f'{"students":>8s} {"workers":>8s} {"copies [kB]":>12s} {"shared [kB]":>12s} {"ratio":>6s} '
+          f'{"copies [s]":>11s} {"shared [s]":>11s} {"same text":>10s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n, workers in [(n, workers) for n in args.students for workers in args.workers]:
+            data = certificate_data(n)
+            sizes = {}
+            times = {}
+            for shared in [False, True]:
+                fname = Path(tmp) / f'{n}_{workers}_{shared}.pdf'
+                t0 = time.perf_counter()
+                settings.fill_certificate(data, fname, degree=args.degree, workers=workers, backend='form' if shared else 'merge')
+                times[shared] = time.perf_counter() - t0
+                sizes[shared] = fname.stat().st_size / 1024
+
+            same = page_words(Path(tmp) / f'{n}_{workers}_False.pdf') == page_words(Path(tmp) / f'{n}_{workers}_True.pdf')
+            print(f'{n:8d} {workers:8d} {sizes[False]:12.1f} {sizes[True]:12.1f} {sizes[False] / sizes[True]:6.1f} '
+                  f'{times[False]:11.2f} {times[True]:11.2f} {str(same):>10s}')
+
+
+if __name__ == '__main__':
+    main()
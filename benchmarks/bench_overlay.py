@@ -0,0 +1,46 @@
+"""
+Per-certificate time of `fill_certificate` with one canvas for all overlays
+compared to one canvas (and PDF) per certificate.
+
+    python -m benchmarks.bench_overlay -n 10 100 1000
+"""
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import PyPDF2
+
+from scheintool import settings
+from scheintool.backends import ReportlabBackend
+from scheintool.synthetic import certificate_data
+
+
+def page_contents(filename):
+    "returns the text and the decoded content streams of every page"
+    return [(page.extract_text(), page.get_contents().get_data()) for page in PyPDF2.PdfReader(str(filename)).pages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[10, 100, 1000], help='number of certificates')
+    args = parser.parse_args()
+
+    print(f'{"students":>8s} {"per PDF [ms]":>13s} {"one canvas [ms]":>16s} {"speedup":>8s} {"identical":>10s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.students:
+            data = certificate_data(n)
+            times = {}
+            for single_canvas in [False, True]:
+                fname = Path(tmp) / f'{n}_{single_canvas}.pdf'
+                t0 = time.perf_counter()
+                settings.fill_certificate(data, fname, backend=ReportlabBackend(single_canvas=single_canvas))
+                times[single_canvas] = (time.perf_counter() - t0) / n * 1e3
+
+            same = page_contents(Path(tmp) / f'{n}_False.pdf') == page_contents(Path(tmp) / f'{n}_True.pdf')
+            print(f'{n:8d} {times[False]:13.2f} {times[True]:16.2f} {times[False] / times[True]:8.2f} {str(same):>10s}')
+
+
+if __name__ == '__main__':
+    main()
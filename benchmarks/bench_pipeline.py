@@ -0,0 +1,178 @@
+"""
+Time and peak memory of every stage of a run, from reading the LSF export to
+writing the grade table, on synthetic courses of different sizes.
+
+    python -m benchmarks.bench_pipeline -n 10 1000 10000 100000 -o results.json
+    python -m benchmarks.bench_pipeline -n 10 1000 --compare results.json
+
+The LSF exports and grade files are generated as `.xlsx` and `.csv`, see
+`scheintool.synthetic`. Every stage is run once for the wall and CPU time and,
+unless `--no-memory` is given, once more with `tracemalloc` for the peak
+memory. A small course is run first without recording it, so that imports
+and parsing the templates are not attributed to the first course. The
+results are stored as JSON, and `--compare` prints the ratio of the times to
+an earlier result file. Neither Tk nor LibreOffice is needed.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+
+import scheintool
+from scheintool import settings
+from scheintool.cache import RosterCache
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, course
+
+
+def measure(function, memory=True):
+    """Runs `function` and returns its result, wall and CPU time in s, and the peak memory in MB (or None)."""
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    result = function()
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - c0
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+
+    return result, wall, cpu, peak
+
+
+def run(n, fmt, tmp, backend='form', memory=True, selected=None):
+    """Runs all stages on a course of `n` students with input files of format `fmt`.
+
+    If `selected` is given, only these stages are recorded, and the stages
+    after the last of them are not run.
+
+    Returns
+    -------
+    list
+        one dict per stage with rows, format, stage, wall and CPU time,
+        peak memory and the number of rows the stage produced
+    """
+    tmp = Path(tmp)
+    lsf_file = tmp / f'lsf_{n}.{fmt}'
+    grades_file = tmp / f'grades_{n}.{fmt}'
+    pdf_file = tmp / f'certificates_{n}_{fmt}.pdf'
+    table_file = tmp / f'grades_{n}_{fmt}.xlsx'
+
+    roster = lsf_roster(n)
+    write_lsf(roster, lsf_file)
+    write_grades(grade_file(roster), grades_file)
+
+    # the cache is filled before its stage is timed, so that stage is a cache hit
+
+    settings.read_LSF(lsf_file)
+
+    stages = [
+        ('read_LSF', lambda inputs: settings.read_LSF(lsf_file, use_cache=False)),
+        ('read_LSF (cached)', lambda inputs: settings.read_LSF(lsf_file)),
+        ('read_grades', lambda inputs: settings.read_grades(grades_file)),
+        ('merge', lambda inputs: settings.merge_course_data(inputs['read_LSF'], inputs['read_grades'], course)),
+        ('fill_certificate', lambda inputs: settings.fill_certificate(inputs['merge'][0], pdf_file, backend=backend, course=inputs['merge'][1])),
+        ('write_grade_table', lambda inputs: settings.write_grade_table(table_file, *inputs['merge'])),
+    ]
+
+    if selected:
+        last = max(i for i, (name, _) in enumerate(stages) if name in selected)
+        stages = stages[:last + 1]
+
+    inputs = {}
+    results = []
+    for name, stage in stages:
+        record = not selected or name in selected
+        result, wall, cpu, peak = measure(lambda: stage(inputs), memory=memory and record)
+        inputs[name] = result
+        if not record:
+            continue
+
+        table = result[0] if isinstance(result, tuple) else result
+        results.append({
+            'rows': n,
+            'format': fmt,
+            'stage': name,
+            'wall': wall,
+            'cpu': cpu,
+            'peak_mb': peak,
+            'rows_out': len(table) if hasattr(table, '__len__') else None,
+        })
+    return results
+
+
+def compare(results, filename):
+    "prints the time of every stage relative to the results in an earlier result file"
+    with open(filename) as fh:
+        old = {(r['rows'], r['format'], r['stage']): r for r in json.load(fh)['results']}
+
+    print(f'\ncompared to {filename}:')
+    print(f'{"rows":>8s} {"format":>6s} {"stage":>18s} {"old [s]":>9s} {"new [s]":>9s} {"new/old":>8s}')
+    for r in results:
+        key = (r['rows'], r['format'], r['stage'])
+        if key in old:
+            print(f'{r["rows"]:8d} {r["format"]:>6s} {r["stage"]:>18s} {old[key]["wall"]:9.3f} {r["wall"]:9.3f} '
+                  f'{r["wall"] / old[key]["wall"]:8.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[10, 1000, 10000, 100000], help='course sizes')
+    parser.add_argument('-f', '--formats', nargs='+', default=['xlsx', 'csv'], choices=['xlsx', 'csv'], help='input file formats')
+    parser.add_argument('-b', '--backend', default='form', help='backend of fill_certificate')
+    parser.add_argument('-o', '--output', default='pipeline.json', help='where to store the results')
+    parser.add_argument('--compare', default=None, help='earlier result file to compare with')
+    parser.add_argument('-s', '--stages', nargs='+', default=None,
+                        choices=['read_LSF', 'read_LSF (cached)', 'read_grades', 'merge', 'fill_certificate', 'write_grade_table'],
+                        help='only record these stages')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure the peak memory (halves the run time)')
+    args = parser.parse_args()
+
+    # errors should raise instead of opening dialogs
+    settings.interactive = False
+
+    print(f'{"rows":>8s} {"format":>6s} {"stage":>18s} {"wall [s]":>9s} {"cpu [s]":>9s} {"peak [MB]":>10s} {"rows out":>9s}')
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # do not use (or fill) the cache of the user
+        settings._roster_cache = RosterCache(Path(tmp) / 'cache')
+
+        # warm up: import the libraries and parse the templates, which is
+        # otherwise attributed to the first course
+        run(10, args.formats[0], Path(tmp), backend=args.backend, memory=False)
+
+        for n in args.students:
+            for fmt in args.formats:
+                for r in run(n, fmt, tmp, backend=args.backend, memory=not args.no_memory, selected=args.stages):
+                    peak = '' if r['peak_mb'] is None else f'{r["peak_mb"]:.1f}'
+                    print(f'{r["rows"]:8d} {r["format"]:>6s} {r["stage"]:>18s} {r["wall"]:9.3f} {r["cpu"]:9.3f} '
+                          f'{peak:>10s} {r["rows_out"] or "":>9}')
+                    results.append(r)
+
+    info = {
+        'version': scheintool.__version__,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': args.backend,
+        'headless': 'tkinter' not in sys.modules,
+        'results': results,
+    }
+    with open(args.output, 'w') as fh:
+        json.dump(info, fh, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
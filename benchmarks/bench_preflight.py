@@ -0,0 +1,92 @@
+"""
+Time of `scheintool.preflight.check` for different numbers of students, on
+clean inputs and on inputs with one problem of every kind.
+
+    python -m benchmarks.bench_preflight -n 1000 10000 100000
+
+The inputs are read with `read_LSF` and `read_grades` from synthetic files.
+Every injected problem must be found, with the matrikel number of the row
+it was injected into.
+"""
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from scheintool import settings, preflight
+from scheintool.cache import RosterCache
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, course
+
+
+def broken(lsf, grades):
+    """Returns copies of `lsf` and `grades` (with the grades as text) with
+    one problem of every check, and the check and matrikel number each
+    should be reported with."""
+    lsf = lsf.copy()
+    grades = grades[['MNR']].assign(grade=grades['grade'].map('{:.1f}'.format))
+    graded = lsf.index[lsf['MNR'].isin(grades['MNR'])]
+    mnr = lsf['MNR']
+
+    lsf.loc[graded[0], 'pob'] = None
+    lsf.loc[graded[1], 'lastname'] = ' '
+    grades.loc[grades['MNR'] == mnr[graded[2]], 'grade'] = 'gut'
+    grades.loc[grades['MNR'] == mnr[graded[3]], 'grade'] = '0.7'
+    grades.loc[grades['MNR'] == mnr[graded[4]], 'grade'] = '2.5'
+    grades = pd.concat([grades, grades[grades['MNR'] == mnr[graded[5]]], pd.DataFrame({'MNR': [1], 'grade': ['1.0']})])
+
+    expected = [
+        ('empty', mnr[graded[0]]),
+        ('empty', mnr[graded[1]]),
+        ('grade format', mnr[graded[2]]),
+        ('grade range', mnr[graded[3]]),
+        ('grade scale', mnr[graded[4]]),
+        ('duplicates', mnr[graded[5]]),
+        ('unmatched', 1),
+    ]
+    return lsf, grades.reset_index(drop=True), expected
+
+
+def timed(function, repeat=5):
+    "returns the result of `function()` and its best time of `repeat` runs in s"
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, nargs='+', default=[1000, 10000, 100000], help='number of students')
+    args = parser.parse_args()
+
+    settings.interactive = False
+
+    print(f'{"students":>8s} {"clean [ms]":>11s} {"issues":>7s} {"broken [ms]":>12s} {"issues":>7s} {"all found":>10s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        settings._roster_cache = RosterCache(tmp / 'cache')
+
+        for n in args.students:
+            roster = lsf_roster(n)
+            write_lsf(roster, tmp / 'lsf.csv')
+            write_grades(grade_file(roster), tmp / 'grades.csv')
+            lsf = settings.read_LSF(tmp / 'lsf.csv', use_cache=False)
+            grades = settings.read_grades(tmp / 'grades.csv')
+
+            clean, t_clean = timed(lambda: preflight.check(lsf, grades, course))
+
+            bad_lsf, bad_grades, expected = broken(lsf, grades)
+            report, t_broken = timed(lambda: preflight.check(bad_lsf, bad_grades, course))
+            found = all(any(issue.check == check and key in issue.keys for issue in report.issues) for check, key in expected)
+
+            print(f'{n:8d} {t_clean * 1e3:11.1f} {len(clean.issues):7d} {t_broken * 1e3:12.1f} {len(report.issues):7d} '
+                  f'{str(found and not report.ok and clean.ok):>10s}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Time and peak memory of sanitizing LSF exports before the conversion with
+LibreOffice: the streaming `scheintool.convert.sanitize` compared to reading
+the whole file and replacing the whitespace with a regular expression, as
+done before.
+
+    python -m benchmarks.bench_sanitize -s 1 10 100
+
+The exports are HTML tables with non-breaking spaces, tabs and line breaks,
+in latin-1 and UTF-8. Both ways need to give the same bytes. The binary
+`example/LSF.XLS` must be passed on unchanged. Both are tested, also for
+line breaks split between chunks, in `tests/test_convert.py`.
+"""
+import re
+import time
+import filecmp
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from scheintool import xls
+from scheintool.convert import is_binary, sanitize, sanitized
+from scheintool.synthetic import lsf_roster
+
+example = Path(__file__).parents[1] / 'example' / 'LSF.XLS'
+
+
+def whole_file(source, target, encoding):
+    "the sanitization as it was done before: read all, replace, write all"
+    with open(source, 'r', encoding=encoding) as fh:
+        content = re.sub(r'\s', ' ', fh.read())
+    with open(target, 'w', encoding=encoding) as fh:
+        fh.write(content)
+
+
+def html_export(filename, size, encoding):
+    "writes an HTML table of students of about `size` bytes"
+    rows = ''.join(
+        '<tr>\n' + ''.join(f'\t<td>{value}</td>\n' for value in row) + '</tr>\r\n'
+        for row in lsf_roster(1000).astype(str).replace(' ', '\xa0', regex=True).itertuples(index=False))
+    block = rows.encode(encoding)
+    with open(filename, 'wb') as fh:
+        fh.write('<html><body><table>\n'.encode(encoding))
+        for _ in range(max(1, size // len(block))):
+            fh.write(block)
+        fh.write('</table></body></html>\n'.encode(encoding))
+
+
+def measure(function):
+    "returns the time in s and the peak memory in MB of `function()`"
+    t0 = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1] / 1024**2
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-s', '--sizes', type=float, nargs='+', default=[1, 10, 100], help='sizes of the exports in MB')
+    parser.add_argument('-e', '--encodings', nargs='+', default=['latin-1', 'utf-8'], help='encodings of the exports')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        # the binary export is not touched, the regular expression would change it
+
+        whole_file(example, tmp / 'regex.XLS', 'latin-1')
+        changed = sum(a != b for a, b in zip(example.read_bytes(), (tmp / 'regex.XLS').read_bytes()))
+        passed = sanitized(example, tmp, 'latin-1')
+        print(f'{example.name}: binary {is_binary(example)}, passed on unchanged {passed == example}, '
+              f'{len(xls.read_xls(passed))} rows readable; the regular expression would change {changed} bytes\n')
+
+        print(f'{"size [MB]":>9s} {"encoding":>9s} {"regex [s]":>10s} {"regex [MB]":>11s} {"stream [s]":>11s} {"stream [MB]":>12s} {"same":>5s}')
+        for size in args.sizes:
+            for encoding in args.encodings:
+                source = tmp / f'export_{size}_{encoding}.xls'
+                html_export(source, int(size * 1024**2), encoding)
+
+                old = measure(lambda: whole_file(source, tmp / 'old.xls', encoding))
+                new = measure(lambda: sanitize(source, tmp / 'new.xls', encoding))
+                same = filecmp.cmp(tmp / 'old.xls', tmp / 'new.xls', shallow=False)
+
+                print(f'{source.stat().st_size / 1024**2:9.1f} {encoding:>9s} {old[0]:10.3f} {old[1]:11.1f} '
+                      f'{new[0]:11.3f} {new[1]:12.1f} {str(same):>5s}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Latency of `schein serve` (`scheintool.serve`) compared to starting a new
+process for every course.
+
+    python -m benchmarks.bench_serve -n 300 -r 10 -c 4
+
+The service and the client run in this process and talk over 127.0.0.1, no
+network access is needed. A new process per course (as `schein batch` with
+one course) is timed first, then the same course is sent to the service:
+once with a new roster, `--repeat` times one after the other, and
+`--concurrent` at a time. Every answer is checked (one page per
+certificate, a readable workbook), as are the answers to inputs that fail
+the check (422) and to more requests than workers and queue (503). Finally
+the metrics of the service are printed.
+"""
+import io
+import sys
+import json
+import time
+import zipfile
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import PyPDF2
+
+from scheintool import settings, serve
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, write_config
+
+# one course in a new interpreter, with the roster cache of earlier runs
+
+run_once = """
+import sys
+from pathlib import Path
+from scheintool import settings, batch
+
+settings.interactive = False
+settings.cache_dir = Path(sys.argv[1])
+config, lsf, grades, output = sys.argv[2:]
+result = batch.run_course({'name': 'course', 'config': config}, settings.read_LSF(lsf), settings.read_grades(grades), output)
+assert result['status'] == 'ok', result['error']
+"""
+
+
+def check(status, content, certificates):
+    "raises an error if the answer is not a ZIP with `certificates` pages and a workbook"
+    if status != 200:
+        raise RuntimeError(f'status {status}: {content[:2000].decode(errors="replace")}')
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        pages = len(PyPDF2.PdfReader(io.BytesIO(archive.read('course.pdf'))).pages)
+        with zipfile.ZipFile(io.BytesIO(archive.read('course.xlsx'))) as workbook:
+            workbook.testzip()
+        report = json.loads(archive.read('preflight.json'))
+    if pages != certificates or not report['ok']:
+        raise RuntimeError(f'{pages} pages instead of {certificates}')
+
+
+def timed(function):
+    "returns the result of `function()` and its time in s"
+    t0 = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - t0
+
+
+def percentiles(times):
+    times = sorted(times)
+    return f'p50 {1e3 * times[len(times) // 2]:7.0f} ms   max {1e3 * times[-1]:7.0f} ms'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, default=300, help='number of students in the course')
+    parser.add_argument('-j', '--jobs', type=int, default=2, help='worker processes of the service')
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='requests one after the other')
+    parser.add_argument('-c', '--concurrent', type=int, default=4, help='requests at the same time')
+    parser.add_argument('-b', '--backend', default='form', help='backend of the service')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        roster = lsf_roster(args.students)
+        write_lsf(roster, tmp / 'lsf.xlsx')
+        grades = grade_file(roster)
+        write_grades(grades, tmp / 'grades.csv')
+        certificates = int((grades['note'].str.replace(',', '.').astype(float) <= 4.0).sum())
+        write_config(tmp / 'config.txt', encoding=settings.encoding)
+        inputs = [tmp / 'config.txt', tmp / 'lsf.xlsx', tmp / 'grades.csv']
+
+        # a new process per course, the second one finds the roster in the cache
+
+        launches = []
+        for _ in range(3):
+            _, seconds = timed(lambda: subprocess.run([sys.executable, '-c', run_once, str(tmp / 'cache'), *map(str, inputs),
+                                                       str(tmp)], check=True))
+            launches.append(seconds)
+
+        settings.cache_dir = tmp / 'service_cache'
+        server, seconds = timed(lambda: serve.Server(('127.0.0.1', 0), jobs=args.jobs, queue=args.concurrent,
+                                                     backend=args.backend, quiet=True))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        print(f'{args.students} students, {certificates} certificates, service with {args.jobs} workers '
+              f'started in {seconds:.2f} s\n')
+
+        def post(name='course', grades=inputs[2]):
+            return serve.post(server.url, inputs[0], inputs[1], grades, name=name)
+
+        try:
+            (status, content), first = timed(post)
+            check(status, content, certificates)
+
+            sequential = []
+            for _ in range(args.repeat):
+                (status, content), seconds = timed(post)
+                check(status, content, certificates)
+                sequential.append(seconds)
+
+            with ThreadPoolExecutor(args.concurrent) as pool:
+                answers, burst = timed(lambda: list(pool.map(lambda _: timed(post), range(args.concurrent))))
+            for (status, content), _ in answers:
+                check(status, content, certificates)
+
+            print(f'{"new process per course":32s} {percentiles(launches)}')
+            print(f'{"service, first request":32s} {percentiles([first])}')
+            print(f'{"service, one after the other":32s} {percentiles(sequential)}')
+            print(f'{f"service, {args.concurrent} at a time":32s} {percentiles([seconds for _, seconds in answers])}'
+                  f'   {args.concurrent / burst:.1f} courses/s')
+
+            # errors are answered, not raised
+
+            bad = tmp / 'bad.csv'
+            bad.write_text(f'matrikelnummer,note\n{grades["matrikelnummer"].iloc[0]},0.7\n')
+            status, content = post(grades=bad)
+            found = status == 422 and any(issue['check'] == 'grade range' for issue in json.loads(content)['report']['issues'])
+            print(f'\ngrade 0.7 answered with {status}, reported: {found}')
+
+            overload = args.jobs + args.concurrent + 2
+            with ThreadPoolExecutor(overload) as pool:
+                statuses = [status for status, _ in pool.map(lambda _: post(), range(overload))]
+            print(f'{overload} requests at once: {statuses.count(200)} answered, {statuses.count(503)} rejected (503)')
+
+            with urllib.request.urlopen(f'{server.url}/metrics') as response:
+                metrics = json.loads(response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        print(f'\nmetrics: {json.dumps(metrics["requests"])}, rosters: {json.dumps(metrics["rosters"])}')
+        print(f'{"":24s} {"count":>6s} {"p50 [ms]":>9s} {"p90 [ms]":>9s} {"max [ms]":>9s}')
+        for name, entry in [*metrics['latency'].items(), *metrics['stages'].items()]:
+            print(f'{name:24s} {entry["count"]:6d} {entry["p50"]:9.1f} {entry["p90"]:9.1f} {entry["max"]:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
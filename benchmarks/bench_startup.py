@@ -0,0 +1,83 @@
+"""
+Startup time of the GUI: import time of `scheintool.Scheintool` and, if a
+display is available, the time until the first window is drawn.
+
+    python -m benchmarks.bench_startup --target 0.5
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# these should not be imported before the first window is shown
+
+heavy_modules = ['pandas', 'reportlab', 'PyPDF2', 'xlsxwriter', 'babel', 'yaml', 'pyarrow']
+
+# starts the GUI, but closes it as soon as it is drawn
+
+first_window = """
+import tkinter
+from scheintool import Scheintool
+
+def mainloop(self, n=0):
+    self.update()
+    self.destroy()
+
+tkinter.Tk.mainloop = mainloop
+Scheintool.main().start()
+"""
+
+
+def import_time():
+    "returns the cumulative import time of scheintool.Scheintool in seconds, measured with -X importtime"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import scheintool.Scheintool'],
+        capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == 'scheintool.Scheintool':
+            return int(fields[1]) * 1e-6
+    raise RuntimeError('scheintool.Scheintool not found in import times')
+
+
+def loaded_heavy_modules():
+    "returns the heavy modules that are loaded by importing the GUI"
+    code = f'import sys, scheintool.Scheintool; print(",".join(m for m in {heavy_modules} if m in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(',') if m]
+
+
+def window_time():
+    "returns the wall time from starting python to the first drawn window"
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, '-c', first_window], check=True, capture_output=True)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of repetitions')
+    parser.add_argument('-t', '--target', type=float, default=0.5, help='target for the time to the first window in seconds')
+    args = parser.parse_args()
+
+    t_import = statistics.median(import_time() for _ in range(args.repeat))
+    print(f'import scheintool.Scheintool: {t_import * 1e3:.0f} ms')
+
+    heavy = loaded_heavy_modules()
+    print('heavy modules loaded at startup: ' + (', '.join(heavy) or 'none'))
+
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        print('no display, time to first window not measured')
+        return int(bool(heavy))
+
+    t_window = statistics.median(window_time() for _ in range(args.repeat))
+    ok = t_window <= args.target
+    print(f'time to first window: {t_window * 1e3:.0f} ms (target {args.target * 1e3:.0f} ms: {"ok" if ok else "missed"})')
+
+    return int(bool(heavy) or not ok)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Overhead of the instrumentation in `scheintool.instrument`, with tracing off
+and on, and the trace of a run on a synthetic course.
+
+    python -m benchmarks.bench_trace -n 1000 -o trace.json
+
+The traced run goes through all stages from reading the LSF export to
+writing the grade table. The trace can be opened in `chrome://tracing` or
+https://ui.perfetto.dev.
+"""
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+from scheintool import settings
+from scheintool.cache import RosterCache
+from scheintool.instrument import tracer, traced
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, course
+
+
+def call_overhead(n=200000):
+    "returns the time in ns of a call of an empty traced function, minus that of an untraced one"
+    def plain():
+        pass
+
+    wrapped = traced('empty')(plain)
+
+    times = []
+    for function in [plain, wrapped]:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            function()
+        times.append(time.perf_counter() - t0)
+    return 1e9 * (times[1] - times[0]) / n
+
+
+def pipeline(tmp, backend):
+    "runs all stages once and returns the time it took"
+    t0 = time.perf_counter()
+    lsf = settings.read_LSF(tmp / 'lsf.xlsx', use_cache=False)
+    grades = settings.read_grades(tmp / 'grades.xlsx')
+    data, course_info = settings.merge_course_data(lsf, grades, course)
+    settings.fill_certificate(data, tmp / 'certificates.pdf', backend=backend, course=course_info)
+    settings.write_grade_table(tmp / 'grades_out.xlsx', data, course_info)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, default=1000, help='course size')
+    parser.add_argument('-b', '--backend', default='form', help='backend of fill_certificate')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='runs with tracing off and on, the best is used')
+    parser.add_argument('-o', '--output', default='trace.json', help='where to write the trace')
+    args = parser.parse_args()
+
+    settings.interactive = False
+    print(f'traced call of an empty function, tracing off: {call_overhead():.0f} ns overhead')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        settings._roster_cache = RosterCache(tmp / 'cache')
+
+        roster = lsf_roster(args.students)
+        write_lsf(roster, tmp / 'lsf.xlsx')
+        write_grades(grade_file(roster), tmp / 'grades.xlsx')
+        pipeline(tmp, args.backend)
+
+        # alternate, so that both see the same state of the machine
+        off, on = [], []
+        for _ in range(args.repeat):
+            tracer.disable()
+            off.append(pipeline(tmp, args.backend))
+            tracer.reset()
+            tracer.enable()
+            on.append(pipeline(tmp, args.backend))
+        tracer.disable()
+
+    print(f'{args.students} students, tracing off: {min(off):.3f} s, on: {min(on):.3f} s '
+          f'({100 * (min(on) / min(off) - 1):+.1f} %)')
+
+    tracer.export(args.output)
+    with open(args.output) as fh:
+        trace = json.load(fh)
+
+    print(f'\n{"stage":>24s} {"wall [s]":>9s} {"cpu [s]":>9s} {"rows":>7s}')
+    for name, stage in trace['stages'].items():
+        print(f'{name:>24s} {stage["wall"]:9.3f} {stage["cpu"]:9.3f} {stage["rows"]:7d}')
+
+    print(f'\n{"latency [ms]":>24s} {"count":>7s} {"mean":>7s} {"p50":>7s} {"p90":>7s} {"p99":>7s} {"max":>7s}')
+    for name, hist in trace['histograms'].items():
+        print(f'{name:>24s} {hist["count"]:7d} {hist["mean"]:7.3f} {hist["p50"]:7.3f} {hist["p90"]:7.3f} '
+              f'{hist["p99"]:7.3f} {hist["max"]:7.3f}')
+    print(f'\ntrace written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
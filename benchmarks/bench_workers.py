@@ -0,0 +1,52 @@
+"""
+Speedup of `fill_certificate` with the number of worker processes.
+
+    python -m benchmarks.bench_workers -n 400
+"""
+import os
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import PyPDF2
+
+from scheintool import settings
+from scheintool.synthetic import certificate_data
+
+
+def page_texts(filename):
+    "returns the extracted text of every page, used to compare the page order"
+    return [page.extract_text() for page in PyPDF2.PdfReader(str(filename)).pages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--students', type=int, default=400, help='number of certificates')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=None, help='worker counts to test (default: 1 ... #cores)')
+    args = parser.parse_args()
+
+    workers = args.workers or list(range(1, (os.cpu_count() or 1) + 1))
+    data = certificate_data(args.students)
+
+    print(f'{args.students} students, {os.cpu_count()} cores')
+    print(f'{"workers":>8s} {"time [s]":>10s} {"speedup":>8s} {"same order":>11s}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reference = Path(tmp) / 'serial.pdf'
+        t0 = time.perf_counter()
+        settings.fill_certificate(data, reference, degree='master')
+        t_serial = time.perf_counter() - t0
+        expected = page_texts(reference)
+
+        for n in workers:
+            fname = Path(tmp) / f'workers_{n}.pdf'
+            t0 = time.perf_counter()
+            settings.fill_certificate(data, fname, degree='master', workers=n)
+            dt = time.perf_counter() - t0
+            same = page_texts(fname) == expected
+            print(f'{n:8d} {dt:10.3f} {t_serial / dt:8.2f} {str(same):>11s}')
+
+
+if __name__ == '__main__':
+    main()
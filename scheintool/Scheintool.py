@@ -1,14 +1,25 @@
+import os
+import sys
 import csv
-import traceback
+import argparse
+import queue
+import threading
+import multiprocessing
 from pathlib import Path
 
 import tkinter as tk
+from tkinter import ttk
 from tkinter import filedialog as fd
 from tkinter import IntVar
+from tkinter import BooleanVar
 from tkinter import StringVar
 from tkinter import messagebox
 
 from scheintool import settings
+from scheintool import batch
+from scheintool import serve
+from scheintool import pipeline
+from scheintool.instrument import tracer, traced
 
 
 def add_entry(label, content='', row=0):
@@ -25,9 +36,15 @@ def add_entry(label, content='', row=0):
 
 class main():
 
-    def __init__(self):
+    def __init__(self, workers=1, backend='form', concurrent=False):
         self.entries = {}
         self.fields = settings.fields.copy()
+        self.n_workers = workers
+        self.backend = backend
+        self.overlap = concurrent
+        self.worker = None
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
 
     # start by defining the callback functions
 
@@ -36,22 +53,18 @@ class main():
         filename = fd.askopenfilename()
         if filename is not None:
             try:
-                with open(filename, 'r', encoding=settings.encoding) as fh:
-                    reader = csv.reader(fh)
-                    for row in reader:
-                        name = row[0]
-                        if name in self.entries:
-                            entry = self.entries[name]['entry']
-                            entry.delete(0, tk.END)
-                            entry.insert(0, row[1])
-                        elif name == 'type':
-                            self.lecture_type.set(int(row[1]))
-                        elif name == 'mb':
-                            self.mb.set(row[1])
-                        elif name == 'semester':
-                            self.semester.set(row[1])
-                        else:
-                            raise ValueError(f'unknown entry: {row[0]}')
+                course = settings.read_course_config(filename, encoding=settings.encoding)
+                for name, value in course.items():
+                    if name in self.entries:
+                        entry = self.entries[name]['entry']
+                        entry.delete(0, tk.END)
+                        entry.insert(0, value)
+                    elif name == 'type':
+                        self.lecture_type.set(value)
+                    elif name == 'mb':
+                        self.mb.set(value)
+                    elif name == 'semester':
+                        self.semester.set(value)
             except Exception as err:
                 messagebox.showinfo(title='Error', message='Could not load configuration:\n' + str(err))
         else:
@@ -74,7 +87,7 @@ class main():
     def start(self):
         """This is the first window where the general settings are defined."""
         self.window = tk.Tk(className='Schein Tool')
-        self.window.rowconfigure(list(range(len(self.fields) + 2)), minsize=50, weight=1)
+        self.window.rowconfigure(list(range(len(self.fields) + 9)), minsize=50, weight=1)
         self.window.columnconfigure([0, 1], minsize=50, weight=1)
 
         greeting = tk.Label(
@@ -125,6 +138,27 @@ class main():
         radio_frame_mb.grid(row=row, column=1)
         row += 1
 
+        # number of processes used for rendering
+        tk.Label(text='Workers').grid(row=row, column=0)
+        self.workers = IntVar(value=self.n_workers)
+        tk.Spinbox(from_=1, to=max(os.cpu_count() or 1, self.n_workers), textvariable=self.workers).grid(row=row, column=1)
+        row += 1
+
+        # re-use unchanged certificates and grade table of an earlier run
+        self.incremental = BooleanVar(value=True)
+        tk.Checkbutton(text='Only update changed students', variable=self.incremental).grid(row=row, column=1, sticky='w')
+        row += 1
+
+        # one PDF per student, e.g. for the student portal
+        self.single_files = BooleanVar(value=False)
+        tk.Checkbutton(text='Also one PDF per student (ZIP)', variable=self.single_files).grid(row=row, column=1, sticky='w')
+        row += 1
+
+        # read the inputs at the same time and write the grade table while rendering, see scheintool/pipeline.py
+        self.concurrent = BooleanVar(value=self.overlap)
+        tk.Checkbutton(text='Overlap the stages', variable=self.concurrent).grid(row=row, column=1, sticky='w')
+        row += 1
+
         # add the buttons on the bottom
 
         btn_frame = tk.Frame()
@@ -141,12 +175,25 @@ class main():
         self.btn_run.pack(side='left')
 
         btn_frame.grid(column=0, columnspan=2, row=row, sticky='se')
+        row += 1
+
+        # progress of the generation, with a button to stop it
+
+        progress_frame = tk.Frame()
+        self.progress = ttk.Progressbar(master=progress_frame, length=300, maximum=100)
+        self.status = tk.Label(master=progress_frame, text='')
+        self.btn_cancel = tk.Button(master=progress_frame, text="Cancel", state='disabled')
+        self.progress.pack(side='left')
+        self.btn_cancel.pack(side='left')
+        self.status.pack(side='left')
+        progress_frame.grid(column=0, columnspan=2, row=row, sticky='sw')
 
         btn_save.bind("<Button-1>", self.save)
         btn_load.bind("<Button-1>", self.load)
         self.btn_lsf.bind("<Button-1>", self.set_lsf_file)
         self.btn_grades.bind("<Button-1>", self.set_grade_file)
         self.btn_run.bind("<Button-1>", self.run)
+        self.btn_cancel.bind("<Button-1>", self.cancel)
 
         self.window.mainloop()
 
@@ -172,63 +219,180 @@ class main():
         elif filename == '' and not Path(filename).is_file():
             tk.messagebox.showinfo(title='Error', message='invalid file')
 
+    @traced('run')
     def run(self, event):
-        """Final Step: read the files, merge the information and create the scheins"""
-        if not hasattr(self, 'lsf_file') and hasattr(self, 'grade_file'):
-            tk.messagebox.showinfo(title='Error', message='Set LSF & Grade file first')
-            return
-
-        lsf = settings.read_LSF(self.lsf_file)
-        grades = settings.read_grades(self.grade_file)
-
-        data = lsf.merge(grades[['MNR', 'grade']], on='MNR')
-        course_info = {'beisitzer': ''}
+        """Final Step: read the files, merge the information and create the scheins
 
-        for name, entry in self.entries.items():
-            content = entry['entry'].get()
-
-            course_info[name] = content
-
-            if name in data:
-                mask = (data[name] == "") | data[name].isna()
-                data[name][mask] = content
-            else:
-                data[name] = content
+        The work is done in a background thread, see `generate`, so that the
+        window stays responsive and the generation can be cancelled.
+        """
+        if self.worker is not None and self.worker.is_alive():
+            return
 
-        data['place'] = 'München'
-        data['type'] = self.lecture_type.get()
-        data['semester'] = self.semester.get()
-        course_info['semester'] = self.semester.get()
+        if not (hasattr(self, 'lsf_file') and hasattr(self, 'grade_file')):
+            tk.messagebox.showinfo(title='Error', message='Set LSF & Grade file first')
+            return
 
         filename = fd.asksaveasfilename(defaultextension=".pdf", initialfile="scheine.pdf")
         if filename == '':
             return
 
+        course = {name: entry['entry'].get() for name, entry in self.entries.items()}
+        course['type'] = self.lecture_type.get()
+        course['semester'] = self.semester.get()
+
+        # errors of the reading functions are shown by the main thread, which
+        # also asks for libreoffice if an XLS file needs to be converted
+        settings.error_handler = lambda title, message: self.messages.put(('error', title, message))
+        settings.path_handler = self.ask_libreoffice
+
+        self.cancel_event.clear()
+        self.btn_cancel.configure(state='normal')
+        self.btn_run.configure(fg='gray')
+
+        self.worker = threading.Thread(
+            target=self.generate,
+            args=(filename, course, self.mb.get(), self.workers.get(), self.incremental.get(), self.single_files.get(),
+                  self.concurrent.get()),
+            daemon=True)
+        self.worker.start()
+        self.window.after(100, self.poll)
+
+    def cancel(self, event):
+        "stops the generation after the current certificate"
+        if self.worker is not None and self.worker.is_alive():
+            self.cancel_event.set()
+            self.status.configure(text='cancelling ...')
+
+    def ask_libreoffice(self):
+        "asks the main thread for the libreoffice executable and waits for the answer, called by the background thread"
+        answer = queue.Queue()
+        self.messages.put(('ask', answer))
+        return answer.get()
+
+    def report(self, stage):
+        "returns a progress callback for `stage` that also checks for cancellation"
+        def progress(done, total):
+            if self.cancel_event.is_set():
+                raise settings.Cancelled()
+            self.messages.put(('progress', stage, done, total))
+        return progress
+
+    @traced('generate')
+    def generate(self, filename, course, degree, workers, incremental=False, single_files=False, concurrent=False):
+        """Reads the data and writes certificates and grade table.
+
+        Runs in the background thread. It does not touch any widgets but
+        puts its progress, errors and result into `self.messages`.
+        """
+        self.messages.put(('progress', 'reading LSF file and grades', 0, 1))
+        result = pipeline.generate(self.lsf_file, self.grade_file, filename, course, degree=degree, workers=workers,
+                                   backend=self.backend, incremental=incremental, single_files=single_files,
+                                   progress=self.report, concurrent=concurrent)
+
+        # the errors of every stage, in the order the stages were started, with the name of the stage
+        for name, stage in result['stages'].items():
+            if stage['error'] is None or stage['shown']:
+                continue
+            if name == 'preflight':
+                self.messages.put(('error', 'Check failed (preflight)', stage['error']))
+            elif name in ['read_LSF', 'read_grades', 'merge']:
+                self.messages.put(('error', f'Error in {name}', f'Could not read the data:\n{stage["error"]}'))
+            elif name in ['fill_certificate', 'fill_certificate_files']:
+                self.messages.put(('error', f'Error in {name}', 'Could not generate Schein:\n' + stage['error']))
+            elif name == 'write_grade_table':
+                self.messages.put(('error', f'Error in {name}',
+                                   f'Could not generate grade spread sheet:\n{stage["error"]}\n{stage["traceback"]}'))
+
+        if result['report'] is not None and result['report'].ok and result['report'].warnings:
+            self.messages.put(('error', 'Warning', result['report'].summary(['warning'])))
+
+        self.messages.put(('done', not result['certificates'], not result['table'], result['cancelled'], result['files']))
+
+    def poll(self):
+        "handles the messages of the background thread in the Tk main loop"
         try:
-            settings.fill_certificate(data, filename, degree=self.mb.get())
-            schein_error = False
-        except Exception as err:
-            schein_error = True
-            messagebox.showinfo(title='Error', message='Could not generate Schein:\n' + str(err))
-
-        try:
-            settings.write_grade_table(Path(filename).with_suffix('.xlsx'), data, course_info)
-            table_error = False
-        except Exception as err:
-            table_error = True
-            messagebox.showinfo(title='Error', message=f'Could not generate grade spread sheet:\n{err}\n{traceback.format_exc()}')
-
-        messagebox.showinfo(
-            title='Completed',
-            message=f'Schein was {"not " * schein_error}created successfully!\n' +
-            f'Grade table was {"not " * table_error}created successfully!'
-        )
+            while True:
+                message = self.messages.get_nowait()
+                kind = message[0]
+
+                if kind == 'progress':
+                    stage, done, total = message[1:]
+                    self.progress['value'] = 100 * done / max(total, 1)
+                    self.status.configure(text=f'{stage}: {done} / {total}' if total > 1 else stage)
+
+                elif kind == 'error':
+                    messagebox.showinfo(title=message[1], message=message[2])
+
+                elif kind == 'ask':
+                    message[1].put(fd.askopenfilename(title='Select the LibreOffice executable (soffice, soffice.exe, ...)'))
+
+                elif kind == 'done':
+                    schein_error, table_error, cancelled, files = message[1:]
+                    self.finish()
+                    written = '\n\nWritten:\n' + '\n'.join(files) if files else '\n\nNo file was written.'
+                    if cancelled:
+                        self.status.configure(text='cancelled')
+                        messagebox.showinfo(
+                            title='Cancelled',
+                            message='Generation was cancelled.\n' +
+                            f'Schein was {"not " * schein_error}created.\n' +
+                            f'Grade table was {"not " * table_error}created.' + written
+                        )
+                    else:
+                        messagebox.showinfo(
+                            title='Completed',
+                            message=f'Schein was {"not " * schein_error}created successfully!\n' +
+                            f'Grade table was {"not " * table_error}created successfully!' + written
+                        )
+                    return
+        except queue.Empty:
+            pass
+
+        self.window.after(100, self.poll)
+
+    def finish(self):
+        "resets the window after the generation"
+        settings.error_handler = None
+        settings.path_handler = None
+        self.btn_cancel.configure(state='disabled')
+        self.btn_run.configure(fg='green')
+        self.progress['value'] = 0
+        self.status.configure(text='done')
 
 
 def start():
-    m = main()
+    parser = argparse.ArgumentParser(description='GUI for making LMU Physics Certificates')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='number of processes used to render the certificates')
+    parser.add_argument('--backend', default='form', choices=['merge', 'form', 'direct', 'auto'],
+                        help='how the certificates are rendered, see scheintool/backends.py (default: form)')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='overlap the stages of Generate that do not depend on each other, see scheintool/pipeline.py')
+    parser.add_argument('--clear-cache', action='store_true', help='remove all cached LSF rosters and exit')
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help='record the time of every stage and write it to FILE on exit, see scheintool/instrument.py')
+    subparsers = parser.add_subparsers(dest='command')
+    batch.add_parser(subparsers)
+    serve.add_parser(subparsers)
+    args = parser.parse_args()
+
+    if args.trace:
+        tracer.enable(args.trace)
+
+    if args.clear_cache:
+        settings.roster_cache.clear()
+        return
+
+    if args.command == 'batch':
+        sys.exit(batch.main(args))
+    if args.command == 'serve':
+        sys.exit(serve.main(args))
+
+    m = main(workers=args.workers, backend=args.backend, concurrent=args.concurrent)
     m.start()
 
 
 if __name__ == '__main__':
+    # needed for the process pool in the pyinstaller executables
+    multiprocessing.freeze_support()
     start()
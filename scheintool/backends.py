@@ -0,0 +1,652 @@
+"""
+Rendering backends for the certificates.
+
+A backend turns the (sorted, passed) rows of the table given to
+`settings.fill_certificate` into a `PyPDF2.PdfWriter` with one page per
+certificate. All backends draw the same entries, see `certificate_entries`,
+at the same positions:
+
+- `merge`: the entries are drawn with ReportLab and every overlay is merged
+  onto its own copy of the template page with `merge_page`. This is the
+  reference implementation.
+- `form`: the entries are drawn with ReportLab, the template is stored once
+  as form XObject which every page shows below its overlay. The entries
+  that are the same for the whole course (`course_entries`) are drawn once
+  as another form XObject, so the overlay of a page only has the entries
+  of the student.
+- `direct`: the content stream of every page is written directly, without
+  ReportLab and without parsing overlays. Template and course entries are
+  shared as in `form`.
+
+`fastest` times the available backends on a sample of the data, it is used
+for `backend='auto'`. The benchmark in `benchmarks/bench_backends.py`
+compares them and checks that they place the same text at the same
+coordinates.
+"""
+import io
+import time
+from datetime import datetime
+
+import PyPDF2
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject, ArrayObject
+
+from scheintool import settings, model
+from scheintool.templates import template_cache
+
+# layout of the entries, lengths in points as in ReportLab
+
+cm = 72.0 / 2.54
+fontsize = 12
+x_off = 2.54 * cm          # left margin
+y_off = 0.761 * 29.7 * cm  # distance from bottom to first line (A4)
+xscale = cm                # scale for the horizontal direction
+yscale = 0.98 * cm         # scale for the vertical direction
+
+
+def certificate_entries(student, course, today):
+    """Returns the entries of one certificate.
+
+    `student` and `course` are a row of the table passed to
+    `fill_certificate` and its course, see `scheintool.model.rows`, `today`
+    is used if the course has no date. The entries of the student come
+    first, then those of the course, see `student_entries` and
+    `course_entries`.
+
+    Returns
+    -------
+    list
+        tuples `(x, y, text)`, the position in points relative to the
+        origin `(x_off, y_off)` and the text to print there
+    """
+    return student_entries(student) + course_entries(course, today)
+
+
+def student_entries(student):
+    "returns the entries of a certificate that differ between the students, see `certificate_entries`"
+    return [
+        _entry(6.75, 0, student.major),
+        _entry(2,    1, student.firstname + ' ' + student.lastname),  # noqa
+        _entry(11.3, 2, student.MNR),
+        _entry(2.5,  3, student.dob),  # noqa
+        _entry(7.0,  3, student.pob),  # noqa
+        _entry(8, 12.75, student.grade_text),
+    ]
+
+
+def course_entries(course, today):
+    """Returns the entries of a certificate that are the same for all students of a course.
+
+    These are rendered once per course by the backends that share them,
+    see `certificate_entries` for the arguments.
+    """
+    if course.semester == 'SS':
+        semester = _entry(1.425, 4.2, 'x')
+    elif course.semester == 'WS':
+        semester = _entry(3.75, 4.2, 'x')
+    else:
+        raise ValueError('semester needs to be SS or WS')
+
+    return [
+        _entry(1, 2, course.place),
+        semester,
+        _entry(7.5, 4.2, course.year),
+        _entry(3, 6.75, course.title_de),
+        _entry(3, 8.75, course.title_en),
+        _entry(1.5, 10.75, course.lecturer),
+        _entry(10, 11.75, course.SWS),
+        _entry(14, 11.75, course.ECTS),
+        _entry(5, 13.75, course.examdate),
+        _entry(5.05, 14.16 + course.type * 0.82, 'x'),
+        _entry(2.5, 19, course.date or today),
+    ]
+
+
+def _course_keys(rows, today):
+    "returns the course entries of every row of `rows` (see `scheintool.model.rows`) as tuple, computed once per course"
+    entries = {}
+    keys = []
+    for _, course in rows:
+        if course not in entries:
+            entries[course] = tuple(course_entries(course, today))
+        keys.append(entries[course])
+    return keys
+
+
+def _entry(x, y, text):
+    "returns an entry at `x`, `y` in the units of the layout"
+    return (x * xscale, - y * yscale, str(text))
+
+
+def today_text():
+    "returns the date printed on certificates without a date"
+    from babel.dates import format_date
+    return format_date(datetime.today(), format="long", locale='de_DE')
+
+
+def template_file(degree):
+    "returns the path of the certificate template for `degree`"
+    return str(settings.docs_dir / f'schein_{degree}.pdf')
+
+
+def _add_page(output, contents, resources, form, template, course=None):
+    """Adds a page to `output` that shows the template `form` below `contents`.
+
+    Parameters
+    ----------
+    output : PyPDF2.PdfWriter
+        the output document
+    contents : bytes
+        the (uncompressed) content stream drawn on top of the template
+    resources : DictionaryObject
+        resources used by `contents`, already added to `output`
+    form : IndirectObject
+        the template in `output`, see `TemplateCache.form`
+    template : PyPDF2.PageObject
+        the template page, for the page size and the form fields
+    course : IndirectObject, optional
+        the entries of the course, shown between template and `contents`,
+        see `_add_form`
+    """
+    page = PyPDF2.PageObject.create_blank_page(None, template.mediabox.width, template.mediabox.height)
+
+    resources = DictionaryObject(resources)
+    xobjects = DictionaryObject(resources.get('/XObject', {}))
+    xobjects[NameObject('/Tpl')] = form
+    prefix = b'q /Tpl Do Q\n'
+    if course is not None:
+        xobjects[NameObject('/Crs')] = course
+        prefix += b'q /Crs Do Q\n'
+    resources[NameObject('/XObject')] = xobjects
+
+    stream = DecodedStreamObject()
+    stream.set_data(prefix + contents)
+
+    page[NameObject('/Resources')] = resources
+    page[NameObject('/Contents')] = output._add_object(stream.flate_encode())
+    if '/Annots' in template:
+        # the (empty) form fields, shared by all pages as with `merge_page`.
+        # Clone the reference, cloning the array again would extend it
+        page[NameObject('/Annots')] = template.raw_get('/Annots').clone(output)
+
+    output.add_page(page)
+
+
+def _add_form(output, contents, resources, template):
+    """Adds `contents` to `output` as form XObject of the size of the template page.
+
+    Used for the entries of a course, which all pages of the course show.
+
+    Returns
+    -------
+    IndirectObject
+        reference to the form in `output`
+    """
+    stream = DecodedStreamObject()
+    stream.set_data(contents)
+
+    # `flate_encode` returns a new stream without the other entries
+    form = stream.flate_encode()
+    form.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): template.mediabox,
+        NameObject('/Resources'): resources,
+    })
+    return output._add_object(form)
+
+
+class Backend():
+    """Interface of the rendering backends.
+
+    Subclasses set `name` and implement `render`. They need to be picklable,
+    as they are sent to the worker processes of `fill_certificate`.
+    """
+
+    name = None
+
+    def available(self):
+        "returns True if the libraries needed by this backend are installed"
+        return True
+
+    def render(self, data, degree, progress=None, course=None):
+        """Renders a certificate for every row in `data`, in the order of the table.
+        See `settings.fill_certificate` for the required columns and the arguments.
+
+        Returns
+        -------
+        PyPDF2.PdfWriter
+            the writer containing one page per certificate
+        """
+        raise NotImplementedError
+
+    def render_files(self, data, degree, course=None):
+        """Yields one complete PDF per row of `data`, as bytes.
+
+        By default, every row is rendered with `render` and written on its
+        own. Backends can do this faster.
+        """
+        for i in range(len(data)):
+            buffer = io.BytesIO()
+            self.render(data.iloc[i:i + 1], degree, course=course).write(buffer)
+            yield buffer.getvalue()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.name!r})'
+
+
+class ReportlabBackend(Backend):
+    """Draws the entries with ReportLab and merges them with the template.
+
+    Parameters
+    ----------
+    shared_template : bool
+        if True, the template is stored once in the output as form XObject
+        which every certificate page shows below its (compressed) overlay.
+        Otherwise, every page contains its own copy of the template, which
+        makes the file about ten times larger.
+    single_canvas : bool
+        if True, the overlays of all certificates are drawn as pages of one
+        PDF, which is parsed once. Otherwise, every overlay is written and
+        parsed as separate PDF.
+    shared_course : bool
+        if True (and `shared_template`), the entries that are the same for
+        the whole course are drawn once, as form XObject that every page
+        shows, and the overlay of each page only has the entries of the
+        student, see `course_entries`.
+    """
+
+    def __init__(self, shared_template=True, single_canvas=True, shared_course=True):
+        self.shared_template = shared_template
+        self.single_canvas = single_canvas
+        self.shared_course = shared_course and shared_template
+        self.name = 'form' if shared_template else 'merge'
+
+    def available(self):
+        try:
+            import reportlab  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def render(self, data, degree, progress=None, course=None):
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.pagesizes import A4
+
+        today = today_text()
+        cert = template_file(degree)
+
+        # the entries of every page, and those of every course (usually one)
+
+        rows = list(model.rows(data, course))
+        if self.shared_course:
+            keys = _course_keys(rows, today)
+            courses = list(dict.fromkeys(keys))
+            entries = [student_entries(student) for student, _ in rows]
+        else:
+            keys = [None] * len(rows)
+            courses = []
+            entries = [certificate_entries(student, course, today) for student, course in rows]
+
+        # create the overlays with Reportlab, the courses after the students
+
+        if len(rows) == 0:
+            overlays = course_overlays = []
+        elif self.single_canvas:
+            # all overlays are pages of one document, which is parsed only once
+            packet = io.BytesIO()
+            can = canvas.Canvas(packet, pagesize=A4)
+            for page_entries in entries + courses:
+                _draw_entries(can, page_entries)
+                can.showPage()
+            can.save()
+            packet.seek(0)
+            pages = PyPDF2.PdfReader(packet).pages
+            overlays = (pages[i] for i in range(len(rows)))
+            course_overlays = [pages[len(rows) + i] for i in range(len(courses))]
+        else:
+            overlays = (_draw_overlay(page_entries) for page_entries in entries)
+            course_overlays = [_draw_overlay(course) for course in courses]
+
+        # create the output PDF file
+
+        output = PyPDF2.PdfWriter()
+
+        if self.shared_template:
+            form, template = template_cache.form(output, cert)
+
+        course_forms = {None: None}
+        for key, overlay in zip(courses, course_overlays):
+            resources = overlay['/Resources'].get_object().clone(output)
+            course_forms[key] = _add_form(output, overlay.get_contents().get_data(), resources, template)
+
+        for n, (overlay, key) in enumerate(zip(overlays, keys), start=1):
+
+            if self.shared_template:
+                resources = overlay['/Resources'].get_object().clone(output)
+                _add_page(output, overlay.get_contents().get_data(), resources, form, template, course_forms[key])
+            else:
+                # add the "watermark" (which is the new pdf) on a copy of the
+                # template page, the parsed template itself is cached and re-used
+                page = template_cache.page(cert)
+                page.merge_page(overlay)
+                output.add_page(page)
+
+            if progress is not None:
+                progress(n, len(data))
+
+        return output
+
+
+def _draw_overlay(entries):
+    "renders `entries` into their own PDF and returns its page"
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet, pagesize=A4)
+    _draw_entries(can, entries)
+    can.save()
+
+    # move to the beginning of the StringIO buffer
+    packet.seek(0)
+    return PyPDF2.PdfReader(packet).pages[0]
+
+
+def _draw_entries(can, entries):
+    "draws `entries` (see `certificate_entries`) on the current page of canvas `can`"
+
+    # font and offset need to be set for every page
+    can.setFont("Helvetica", fontsize)
+    can.translate(x_off, y_off)
+
+    for x, y, text in entries:
+        can.drawString(x, y, text)
+
+
+class DirectBackend(Backend):
+    """Writes the content stream of every certificate directly.
+
+    The entries are printed in Helvetica, one of the standard fonts every
+    PDF viewer has, with the WinAnsi encoding. As in ReportLab, characters
+    that cannot be encoded are taken from Symbol (e.g. Greek letters) or
+    ZapfDingbats, and otherwise shown as a black square from ZapfDingbats.
+    Without ReportLab, whose encodings of Symbol and ZapfDingbats are used,
+    all of them are shown as black square.
+
+    Parameters
+    ----------
+    shared_course : bool
+        if True, the entries that are the same for the whole course are
+        written once, as form XObject that every page shows, see
+        `course_entries`
+    """
+
+    name = 'direct'
+
+    def __init__(self, shared_course=True):
+        self.shared_course = shared_course
+
+    def render(self, data, degree, progress=None, course=None):
+        today = today_text()
+
+        output = PyPDF2.PdfWriter()
+        form, template = template_cache.form(output, template_file(degree))
+        resources = _direct_resources(output)
+        rows = list(model.rows(data, course))
+        keys = _course_keys(rows, today) if self.shared_course else [None] * len(rows)
+        courses = {}
+
+        for n, ((student, course), key) in enumerate(zip(rows, keys), start=1):
+            if self.shared_course:
+                if key not in courses:
+                    courses[key] = _add_form(output, _direct_contents(key), resources, template)
+                _add_page(output, _direct_contents(student_entries(student)), resources, form, template, courses[key])
+            else:
+                _add_page(output, _direct_contents(certificate_entries(student, course, today)), resources, form, template)
+
+            if progress is not None:
+                progress(n, len(data))
+
+        return output
+
+    def render_files(self, data, degree, course=None):
+        """Yields one complete PDF per row.
+
+        The objects of the template and the fonts are serialised once, every
+        file only adds its page, its content stream and the document
+        structure.
+        """
+        import zlib
+
+        today = today_text()
+        prefix, offsets, page_dict = _file_prefix(degree)
+        page_id = len(offsets) + 1
+
+        header = b'%PDF-1.3\n%\xe2\xe3\xcf\xd3\n'
+        tail = (b'1 0 obj\n<< /Type /Pages /Count 1 /Kids [ %d 0 R ] >>\nendobj\n' % page_id +
+                b'3 0 obj\n<< /Type /Catalog /Pages 1 0 R >>\nendobj\n')
+
+        for student, course in model.rows(data, course):
+            contents = zlib.compress(b'q /Tpl Do Q\n' + _direct_contents(certificate_entries(student, course, today)))
+            page = (b'%d 0 obj\n' % page_id + page_dict % (page_id + 1) + b'\nendobj\n' +
+                    b'%d 0 obj\n<< /Length %d /Filter /FlateDecode >>\nstream\n' % (page_id + 1, len(contents)) +
+                    contents + b'\nendstream\nendobj\n')
+
+            # byte offsets of all objects, 1 (pages) and 3 (catalog) are written last
+            start = len(header)
+            page_offset = start + len(prefix)
+            tail_offset = page_offset + len(page)
+            positions = [start + offset for offset in offsets] + [page_offset, page_offset + page.index(b'%d 0 obj' % (page_id + 1))]
+            positions[0] = tail_offset
+            positions[2] = tail_offset + tail.index(b'3 0 obj')
+
+            xref = [b'xref\n0 %d\n0000000000 65535 f \n' % (len(positions) + 1)]
+            xref += [b'%010d 00000 n \n' % position for position in positions]
+            trailer = (b'trailer\n<< /Size %d /Root 3 0 R /Info 2 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                       % (len(positions) + 1, tail_offset + len(tail)))
+
+            yield b''.join([header, prefix, page, tail] + xref + [trailer])
+
+
+def _direct_resources(output):
+    "adds the fonts of the direct backend to `output` and returns the resources of its pages"
+    fonts = DictionaryObject({
+        NameObject('/F1'): output._add_object(_font('/Helvetica', '/WinAnsiEncoding')),
+        NameObject('/F2'): output._add_object(_font('/ZapfDingbats')),
+        NameObject('/F3'): output._add_object(_font('/Symbol')),
+    })
+    return DictionaryObject({
+        NameObject('/Font'): fonts,
+        NameObject('/ProcSet'): ArrayObject([NameObject('/PDF'), NameObject('/Text')]),
+    })
+
+
+def _direct_contents(entries):
+    "returns the content stream that shows `entries`, see `certificate_entries`"
+    lines = [f'1 0 0 1 {_number(x_off)} {_number(y_off)} cm\n'.encode()]
+
+    # one text object per entry, as ReportLab writes them
+    for x, y, text in entries:
+        lines.append(f'BT 1 0 0 1 {_number(x)} {_number(y)} Tm '.encode())
+        lines.append(_show_text(text))
+        lines.append(b' ET\n')
+    return b''.join(lines)
+
+
+# serialised template objects of `DirectBackend.render_files`, by degree
+
+_file_prefixes = {}
+
+
+def _file_prefix(degree):
+    """Returns the template objects of a single certificate PDF, serialised.
+
+    Returns
+    -------
+    prefix : bytes
+        the objects, numbered from 1. Objects 1 (pages) and 3 (catalog) are
+        left out, they are written by `DirectBackend.render_files`
+    offsets : list
+        the position of every object in `prefix`, 0 for the left out ones
+    page_dict : bytes
+        the page dictionary, with `%d` for the number of the content stream
+    """
+    path = template_file(degree)
+    reader = template_cache.reader(path)
+    if degree in _file_prefixes and _file_prefixes[degree][0] is reader:
+        return _file_prefixes[degree][1]
+
+    # collect the objects in a writer, it numbers them and resolves references
+
+    output = PyPDF2.PdfWriter()
+    form, template = template_cache.form(output, path)
+    resources = _direct_resources(output)
+    resources[NameObject('/XObject')] = DictionaryObject({NameObject('/Tpl'): form})
+
+    page = DictionaryObject({
+        NameObject('/Type'): NameObject('/Page'),
+        NameObject('/Parent'): output._pages,
+        NameObject('/MediaBox'): template.mediabox,
+        NameObject('/Resources'): resources,
+    })
+    if '/Annots' in template:
+        page[NameObject('/Annots')] = template.raw_get('/Annots').clone(output)
+
+    buffer = io.BytesIO()
+    page.write_to_stream(buffer, None)
+    page_dict = buffer.getvalue()[:-2].replace(b'%', b'%%') + b'/Contents %d 0 R\n>>'
+
+    buffer = io.BytesIO()
+    offsets = []
+    for idnum, obj in enumerate(output._objects, start=1):
+        if idnum in (1, 3) or obj is None:
+            offsets.append(0)
+            continue
+        offsets.append(buffer.tell())
+        buffer.write(b'%d 0 obj\n' % idnum)
+        obj.write_to_stream(buffer, None)
+        buffer.write(b'\nendobj\n')
+
+    _file_prefixes[degree] = (reader, (buffer.getvalue(), offsets, page_dict))
+    return _file_prefixes[degree][1]
+
+
+def _font(name, encoding=None):
+    "returns the dictionary of a standard Type1 font"
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject(name),
+    })
+    if encoding is not None:
+        font[NameObject('/Encoding')] = NameObject(encoding)
+    return font
+
+
+def _number(x):
+    "formats a coordinate like ReportLab does"
+    return f'{x:.4f}'.rstrip('0').rstrip('.')
+
+
+# set by `_substitutes` on first use
+
+_substitute_fonts = None
+
+
+def _substitutes():
+    "returns the fonts and codecs tried, in this order, for characters that are not in WinAnsi, as ReportLab does"
+    global _substitute_fonts
+    if _substitute_fonts is None:
+        try:
+            from reportlab.pdfbase.rl_codecs import RL_Codecs
+            RL_Codecs.register()
+            _substitute_fonts = [(b'/F3', 'symbol'), (b'/F2', 'zapfdingbats')]
+        except ImportError:
+            _substitute_fonts = []
+    return _substitute_fonts
+
+
+def _encode(char):
+    "returns the font and the code of `char`, a black square if no font has it"
+    try:
+        return b'/F1', char.encode('cp1252')
+    except UnicodeEncodeError:
+        pass
+    for font, codec in _substitutes():
+        try:
+            return font, char.encode(codec)
+        except UnicodeEncodeError:
+            pass
+    return b'/F2', b'n'
+
+
+def _show_text(text):
+    "returns the operators that show `text` in /F1, or in the fonts of `_substitutes` where it cannot be encoded"
+    parts = []
+    font = None
+    for char in text:
+        char_font, code = _encode(char)
+        if char_font != font:
+            if font is not None:
+                parts.append(b') Tj ')
+            parts.append(char_font + b' %d Tf (' % fontsize)
+            font = char_font
+        parts.append(code.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'\\r'))
+    if font is not None:
+        parts.append(b') Tj')
+    return b''.join(parts)
+
+
+# the available backends, by name
+
+backends = {backend.name: backend for backend in [ReportlabBackend(shared_template=False), ReportlabBackend(), DirectBackend()]}
+
+# results of `fastest`, by degree
+
+_fastest = {}
+
+
+def get_backend(backend):
+    """Returns the backend called `backend`.
+
+    Parameters
+    ----------
+    backend : str | Backend
+        name of the backend, or a backend that is returned as is
+
+    Returns
+    -------
+    Backend
+        the backend
+    """
+    if isinstance(backend, Backend):
+        return backend
+    if backend not in backends:
+        raise ValueError(f'unknown backend {backend}, use one of {", ".join(backends)} or auto')
+    if not backends[backend].available():
+        raise ValueError(f'backend {backend} is not available')
+    return backends[backend]
+
+
+def fastest(data, degree, n=10, course=None):
+    """Returns the available backend that renders and writes the first `n` rows of `data` fastest.
+
+    The result is kept for the rest of the process, so only the first call
+    per degree runs the comparison.
+    """
+    if degree not in _fastest:
+        sample = data.iloc[:n]
+
+        # load the template before timing, so the first backend is not penalised
+        template_cache.reader(template_file(degree))
+
+        times = {}
+        for name, backend in backends.items():
+            if backend.available():
+                t0 = time.perf_counter()
+                backend.render(sample, degree, course=course).write(io.BytesIO())
+                times[name] = time.perf_counter() - t0
+
+        _fastest[degree] = backends[min(times, key=times.get)]
+
+    return _fastest[degree]
@@ -0,0 +1,261 @@
+"""
+Headless generation of certificates and grade tables for many courses.
+
+The courses are listed in a YAML manifest:
+
+    output: results          # optional, directory for all outputs
+    workers: 4               # optional, number of courses run in parallel
+    backend: direct          # optional, see scheintool/backends.py
+    incremental: true        # optional, only update changed outputs
+    files: zip               # optional, also one PDF per student, in
+                             # <name>.zip or (files: directory) in <name>/
+    courses:
+      - name: astro1         # used for the output file names
+        config: astro1.txt   # course settings as saved by the GUI
+        lsf: LSF.XLS
+        grades: grades.csv
+
+Relative paths are relative to the manifest. Every roster and grade file is
+read only once, even if several courses share it, and each worker process
+parses the certificate templates only once. The inputs of every course are
+checked before anything is written (see `scheintool.preflight`). Errors are
+collected per course and written, together with the results, to
+`summary.json` in the output directory.
+
+    schein batch manifest.yaml
+"""
+import sys
+import json
+import time
+import traceback
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from scheintool import settings, preflight
+
+
+def add_parser(subparsers):
+    "adds the `batch` command to the command line parser"
+    parser = subparsers.add_parser('batch', help='generate many courses without GUI, see scheintool/batch.py')
+    parser.add_argument('manifest', help='YAML file listing the courses')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of courses run in parallel (default: from manifest or 1)')
+    parser.add_argument('-o', '--output', default=None, help='output directory (default: from manifest or next to it)')
+    parser.add_argument('--summary', default=None, help='where to write the JSON summary (default: summary.json in the output directory)')
+    return parser
+
+
+def read_manifest(filename):
+    """Reads the manifest and resolves all paths.
+
+    Parameters
+    ----------
+    filename : str | path
+        the YAML manifest
+
+    Returns
+    -------
+    dict
+        the manifest with `output` and the course paths as absolute `Path`s
+    """
+    import yaml
+
+    filename = Path(filename)
+    base = filename.absolute().parent
+
+    with open(filename) as fh:
+        manifest = yaml.safe_load(fh) or {}
+
+    if not manifest.get('courses'):
+        raise ValueError(f'no courses given in {filename}')
+
+    manifest['output'] = base / manifest.get('output', '.')
+
+    for i, course in enumerate(manifest['courses']):
+        course.setdefault('name', f'course_{i}')
+        for key in ['config', 'lsf', 'grades']:
+            if key not in course:
+                raise ValueError(f'course {course["name"]}: no {key} file given')
+            course[key] = base / course[key]
+
+    return manifest
+
+
+def _init_worker():
+    "raise errors instead of opening dialogs in the worker processes"
+    settings.interactive = False
+
+
+def run_course(course, lsf, grades, output, backend='form', incremental=False, files=None):
+    """Generates certificates and grade table for one course.
+
+    Parameters
+    ----------
+    course : dict
+        entry of the manifest
+    lsf, grades : DataFrame
+        the roster and the grades of the course
+    output : path
+        output directory
+    backend : str, optional
+        how the certificates are rendered, see `settings.fill_certificate`
+    incremental : bool, optional
+        if True, only changed certificates are rendered and the grade table
+        is only written if it changed, see `scheintool.incremental`
+    files : str, optional
+        'zip' or 'directory' to also write one PDF per student, see
+        `settings.fill_certificate_files`
+
+    Returns
+    -------
+    dict
+        summary of the course: output files, number of students and
+        certificates, run time, the report of `preflight.check`, and the
+        error if it failed
+    """
+    t0 = time.perf_counter()
+    result = {'name': course['name'], 'status': 'ok', 'error': None}
+    try:
+        config = settings.read_course_config(course['config'], encoding=settings.encoding)
+        config.setdefault('type', 1)
+        config.setdefault('semester', 'SS' if settings.currentMonth < 10 else 'WS')
+        degree = config.get('mb', 'master')
+
+        # stop before anything is written if the inputs are not usable
+        report = preflight.check(lsf, grades, config)
+        result['preflight'] = report.to_dict()
+        report.raise_errors()
+
+        data, course_info = settings.merge_course_data(lsf, grades, config)
+
+        pdf_file = Path(output) / f'{course["name"]}.pdf'
+        table_file = pdf_file.with_suffix('.xlsx')
+
+        settings.fill_certificate(data, pdf_file, degree=degree, backend=backend, incremental=incremental, course=course_info)
+        settings.write_grade_table(table_file, data, course_info, incremental=incremental)
+
+        if files is not None:
+            if files not in ['zip', 'directory']:
+                raise ValueError(f'files needs to be zip or directory, not {files}')
+            target = pdf_file.with_suffix('.zip') if files == 'zip' else pdf_file.with_suffix('')
+            stats = settings.fill_certificate_files(data, target, degree=degree, course=course_info)
+            result.update({'files': str(target), 'files_per_s': stats['files_per_s']})
+
+        result.update({
+            'pdf': str(pdf_file),
+            'table': str(table_file),
+            'students': len(data),
+            'certificates': int((data['BENB'] == 'BE').sum()),
+        })
+    except preflight.PreflightError as err:
+        result['status'] = 'failed'
+        result['error'] = str(err)
+    except Exception as err:
+        result['status'] = 'failed'
+        result['error'] = f'{err}\n{traceback.format_exc()}'
+
+    result['time'] = time.perf_counter() - t0
+    return result
+
+
+def run(manifest, jobs=None, output=None):
+    """Runs all courses of a manifest.
+
+    Parameters
+    ----------
+    manifest : dict
+        as returned by `read_manifest`
+    jobs : int, optional
+        number of courses run in parallel, by default from the manifest or 1
+    output : str | path, optional
+        output directory, by default from the manifest
+
+    Returns
+    -------
+    list
+        one summary dict per course, see `run_course`
+    """
+    jobs = jobs or manifest.get('workers', 1)
+    output = Path(output or manifest['output'])
+    output.mkdir(parents=True, exist_ok=True)
+
+    interactive = settings.interactive
+    settings.interactive = False
+    try:
+        return _run(manifest, jobs, output)
+    finally:
+        settings.interactive = interactive
+
+
+def _run(manifest, jobs, output):
+    from scheintool import xls
+
+    # XLS rosters that are not BIFF8 need libreoffice: queue them all at
+    # once, they are converted while the other files are read
+
+    for course in manifest['courses']:
+        lsf = course['lsf']
+        if (lsf.suffix.lower() == '.xls' and lsf.is_file() and not xls.is_xls(lsf)
+                and settings.get_roster_cache().key(lsf) not in settings.get_roster_cache()):
+            try:
+                settings.get_conversion_pool().submit(lsf)
+            except Exception:
+                # reported by read_LSF below
+                pass
+
+    # read every roster and grade file once, errors are kept for the courses
+
+    inputs = {}
+    for course in manifest['courses']:
+        for key, reader in [('lsf', settings.read_LSF), ('grades', settings.read_grades)]:
+            if course[key] not in inputs:
+                try:
+                    inputs[course[key]] = reader(course[key])
+                except Exception as err:
+                    inputs[course[key]] = err
+
+    results = {}
+    futures = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+        for course in manifest['courses']:
+            lsf = inputs[course['lsf']]
+            grades = inputs[course['grades']]
+            failed = [(course[key], value) for key, value in [('lsf', lsf), ('grades', grades)] if isinstance(value, Exception)]
+            if failed:
+                results[course['name']] = {
+                    'name': course['name'],
+                    'status': 'failed',
+                    'error': '\n'.join(f'could not read {fname}: {err}' for fname, err in failed),
+                    'time': 0.0}
+            else:
+                futures[course['name']] = pool.submit(run_course, course, lsf, grades, output,
+                                                       manifest.get('backend', 'form'), manifest.get('incremental', False),
+                                                       manifest.get('files'))
+
+        for name, future in futures.items():
+            results[name] = future.result()
+
+    return [results[course['name']] for course in manifest['courses']]
+
+
+def main(args):
+    "runs the `batch` command, returns the exit code"
+    manifest = read_manifest(args.manifest)
+    t0 = time.perf_counter()
+    results = run(manifest, jobs=args.jobs, output=args.output)
+    total = time.perf_counter() - t0
+
+    output = Path(args.output or manifest['output'])
+    summary_file = Path(args.summary) if args.summary else output / 'summary.json'
+    with open(summary_file, 'w') as fh:
+        json.dump({'time': total, 'courses': results}, fh, indent=2)
+
+    for result in results:
+        if result['status'] == 'ok':
+            print(f'{result["name"]}: {result["certificates"]} certificates, {result["students"]} students ({result["time"]:.1f} s)')
+        else:
+            print(f'{result["name"]}: FAILED\n{result["error"]}', file=sys.stderr)
+
+    n_failed = sum(result['status'] != 'ok' for result in results)
+    print(f'{len(results) - n_failed} of {len(results)} courses done in {total:.1f} s, summary in {summary_file}')
+
+    return int(n_failed > 0)
@@ -0,0 +1,121 @@
+"""
+On-disk cache for parsed LSF rosters.
+
+Rosters are stored after normalisation, keyed by a hash of the content of the
+input file, so reading the same export again skips the conversion and the
+parsing entirely. If `pyarrow` is installed, the tables are stored as
+uncompressed feather files and memory-mapped when read, otherwise they are
+pickled.
+"""
+import os
+import hashlib
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# bump this if the normalisation in `read_LSF` changes, so old entries are not used
+
+CACHE_VERSION = 3
+
+
+class RosterCache():
+    """Stores normalised rosters in `directory`.
+
+    The total size of the cache is limited to `max_size` bytes. If it grows
+    larger, the least recently used entries are removed.
+
+    Parameters
+    ----------
+    directory : str | path
+        where to store the cache files
+    max_size : int, optional
+        maximum size of the cache in bytes, by default 200 MB
+    """
+
+    def __init__(self, directory, max_size=200 * 1024**2):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.suffix = '.feather' if feather is not None else '.pkl'
+
+    def key(self, filename):
+        "returns the cache key of a file: the hash of its content"
+        sha = hashlib.sha256(f'roster-{CACHE_VERSION}'.encode())
+        with open(filename, 'rb') as fh:
+            for block in iter(lambda: fh.read(1024**2), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def _path(self, key):
+        return self.directory / (key + self.suffix)
+
+    def __contains__(self, key):
+        return self._path(key).is_file()
+
+    def get(self, key):
+        """Returns the cached table for `key` or None if it is not cached."""
+        path = self._path(key)
+        if not path.is_file():
+            return None
+        try:
+            if feather is not None:
+                table = feather.read_table(path, memory_map=True).to_pandas()
+            else:
+                table = pd.read_pickle(path)
+        except Exception as err:
+            warnings.warn(f'removing unreadable cache entry {path.name}: {err}')
+            path.unlink(missing_ok=True)
+            return None
+
+        # mark as recently used
+        os.utime(path)
+        return table
+
+    def put(self, key, table):
+        """Stores `table` under `key` and evicts old entries if necessary."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        temp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+        try:
+            if feather is not None:
+                table.reset_index(drop=True).to_feather(temp, compression='uncompressed')
+            else:
+                table.to_pickle(temp)
+            os.replace(temp, path)
+        except Exception as err:
+            # e.g. columns of mixed type that feather cannot store
+            warnings.warn(f'could not cache roster: {err}')
+            temp.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def entries(self):
+        "returns the cache files, least recently used first"
+        if not self.directory.is_dir():
+            return []
+        files = [f for f in self.directory.iterdir() if f.suffix in ('.feather', '.pkl')]
+        return sorted(files, key=lambda f: f.stat().st_mtime)
+
+    def size(self):
+        "returns the total size of the cache in bytes"
+        return sum(f.stat().st_size for f in self.entries())
+
+    def evict(self):
+        "removes the least recently used entries until the cache fits into `max_size`"
+        files = self.entries()
+        total = sum(f.stat().st_size for f in files)
+        for f in files:
+            if total <= self.max_size:
+                break
+            total -= f.stat().st_size
+            f.unlink(missing_ok=True)
+
+    def clear(self):
+        "removes all entries"
+        for f in self.entries():
+            f.unlink(missing_ok=True)
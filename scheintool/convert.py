@@ -0,0 +1,346 @@
+"""
+Conversion of `.XLS` files to `.xlsx` with a pool of LibreOffice workers.
+
+Starting `soffice` takes seconds, most of it for setting up the user
+profile, and two instances that share a profile block or break each other.
+Every worker of a `ConversionPool` therefore has its own profile directory
+(`-env:UserInstallation`), and converts all files that are waiting in the
+queue with a single call of `soffice`. With `profiles`, the profiles are
+kept in that directory, so only the first conversion ever sets them up; a
+lock file next to every profile makes sure that two processes (e.g. two
+windows of the GUI) never use the same one at the same time.
+
+No LibreOffice instance is kept running between the calls: every call of
+`soffice` starts LibreOffice again, only the profile is re-used. Keeping an
+instance listening (`soffice --accept=...`) would need the UNO bridge of
+LibreOffice, which is not a dependency of the tool.
+
+Files are queued with `submit`, which returns a future, so roster files can
+be converted while other inputs are read:
+
+    pool = ConversionPool(settings.libreoffice_exec, size=2)
+    futures = [pool.submit(f) for f in files]
+    xlsx_files = [future.result() for future in futures]
+
+`settings.get_conversion_pool` returns the pool used by `read_LSF` and the
+batch runs, `benchmarks/bench_convert.py` compares it to converting every
+file on its own.
+
+Exports that are text (HTML or XML spreadsheets with an `.XLS` suffix) can
+contain non-breaking spaces and line breaks that LibreOffice does not read
+well. Before the conversion, every whitespace character in them is replaced
+by a space, see `sanitize`. Binary files (BIFF8 in a compound document, or
+zipped `.xlsx`) are passed on unchanged.
+"""
+import re
+import itertools
+import queue
+import codecs
+import shutil
+import tempfile
+import functools
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import Future
+
+from scheintool.instrument import tracer
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+CHUNK_SIZE = 1024**2
+
+# the first bytes of the binary formats: compound document (BIFF8) and zip (xlsx)
+
+binary_signatures = [b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', b'PK\x03\x04']
+
+whitespace = re.compile(r'\s')
+
+
+def is_binary(filename):
+    "returns True if `filename` is a binary spreadsheet, which must not be sanitized"
+    with open(filename, 'rb') as fh:
+        head = fh.read(8)
+    return any(head.startswith(signature) for signature in binary_signatures)
+
+
+@functools.lru_cache()
+def _byte_table(encoding):
+    "returns a `bytes.translate` table replacing whitespace with spaces, or None if `encoding` is not single-byte"
+    try:
+        characters = bytes(range(256)).decode(encoding)
+    except UnicodeDecodeError:
+        return None
+    if len(characters) != 256 or '\r\n'.encode(encoding) != b'\r\n':
+        return None
+    space = ' '.encode(encoding)
+    return bytes(space[0] if whitespace.match(char) else i for i, char in enumerate(characters))
+
+
+def sanitize(source, target, encoding='latin-1', chunk_size=CHUNK_SIZE):
+    """Copies `source` to `target` with every whitespace character replaced by a space.
+
+    The file is processed in chunks of `chunk_size` bytes, so the memory
+    needed does not grow with the file. For single-byte encodings such as
+    latin-1, the bytes are translated directly, otherwise the text is
+    decoded chunk by chunk. As when reading the file as text, a line break
+    `\\r\\n` counts as one character. Bytes that are invalid in `encoding` are
+    kept as they are.
+
+    Parameters
+    ----------
+    source, target : str | path
+        input and output file
+    encoding : str, optional
+        encoding of the text, by default latin-1 as in the LSF exports
+    chunk_size : int, optional
+        number of bytes read at once
+    """
+    table = _byte_table(codecs.lookup(encoding).name)
+
+    if table is None:
+        with open(source, 'r', encoding=encoding, errors='surrogateescape') as src, \
+                open(target, 'w', encoding=encoding, errors='surrogateescape', newline='') as dst:
+            for chunk in iter(lambda: src.read(chunk_size), ''):
+                dst.write(whitespace.sub(' ', chunk))
+        return
+
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        carry = b''
+        for chunk in iter(lambda: src.read(chunk_size), b''):
+            # a \r at the end of a chunk may be the start of \r\n
+            chunk = carry + chunk
+            carry = b'\r' if chunk.endswith(b'\r') else b''
+            chunk = chunk[:len(chunk) - len(carry)].replace(b'\r\n', b'\n')
+            dst.write(chunk.translate(table))
+        dst.write(carry.translate(table))
+
+
+def sanitized(filename, directory, encoding='latin-1'):
+    """Returns the file to convert instead of `filename`.
+
+    Text files are sanitized into `directory`, keeping their name, so that
+    the converted file is named like the original. Binary files are not
+    copied, their own path is returned.
+    """
+    filename = Path(filename)
+    if is_binary(filename):
+        return filename
+    target = Path(directory) / filename.name
+    with tracer.span('sanitize', bytes=filename.stat().st_size):
+        sanitize(filename, target, encoding)
+    return target
+
+
+def _try_lock(fh):
+    "locks the open file `fh` until it is closed, returns False if someone else holds the lock"
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class ConversionPool():
+    """Converts `.XLS` files to `.xlsx` with `size` LibreOffice workers.
+
+    The worker threads are started with the first file, each starts
+    `soffice` for every batch of files it takes from the queue. A file that
+    is submitted again while its conversion is pending or after it
+    succeeded is not converted a second time, unless it changed.
+
+    Parameters
+    ----------
+    executable : str | path
+        the `soffice` executable
+    size : int, optional
+        number of `soffice` processes that run at the same time, by default 1
+    max_batch : int, optional
+        maximum number of files converted by one call of `soffice`
+    timeout : float, optional
+        seconds after which a call of `soffice` is stopped and its files fail
+    encoding : str, optional
+        encoding of exports that are text, see `sanitize`
+    profiles : str | path, optional
+        directory in which the profiles of the workers are kept, as
+        `worker_<i>`, each worker takes the first one that is not in use. If
+        None, every pool sets up new profiles and removes them when it is
+        closed.
+    """
+
+    def __init__(self, executable, size=1, max_batch=50, timeout=300, encoding='latin-1', profiles=None):
+        self.executable = str(executable)
+        self.encoding = encoding
+        self.size = size
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.calls = 0
+        self.files = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._threads = []
+        self.profiles = Path(profiles) if profiles is not None else None
+        self._temporary = None
+        self._locks = []
+
+    def submit(self, filename, outdir=None):
+        """Queues `filename` for conversion.
+
+        Parameters
+        ----------
+        filename : str | path
+            the `.XLS` file
+        outdir : str | path, optional
+            where to write the `.xlsx` file, by default next to `filename`
+
+        Returns
+        -------
+        concurrent.futures.Future
+            its result is the path of the converted file as str. If the
+            conversion fails, it raises a RuntimeError.
+        """
+        filename = Path(filename).expanduser().resolve()
+        if not filename.is_file():
+            raise FileNotFoundError(f'input file {filename} does not exist')
+        outdir = Path(outdir).resolve() if outdir is not None else filename.parent
+
+        key = (filename, filename.stat().st_mtime_ns, outdir)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            future = self._futures[key] = Future()
+            self._start()
+
+        self._queue.put((key, future))
+        return future
+
+    def convert(self, filename, outdir=None):
+        "converts `filename`, see `submit`, and returns the path of the `.xlsx` file"
+        return self.submit(filename, outdir).result()
+
+    def convert_many(self, filenames, outdir=None):
+        "converts all `filenames` and returns the paths of the `.xlsx` files, in the same order"
+        futures = [self.submit(filename, outdir) for filename in filenames]
+        return [future.result() for future in futures]
+
+    def close(self):
+        "stops the workers after the queued files, and releases (or removes the temporary) profiles"
+        with self._lock:
+            threads, self._threads = self._threads, []
+            for _ in threads:
+                self._queue.put(None)
+        for thread in threads:
+            thread.join()
+        for fh in self._locks:
+            fh.close()
+        self._locks = []
+        if self._temporary is not None:
+            shutil.rmtree(self._temporary, ignore_errors=True)
+            self._temporary = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _start(self):
+        if self._threads:
+            return
+        for i in range(self.size):
+            thread = threading.Thread(target=self._work, args=(self._profile(i),), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _profile(self, i):
+        "returns the profile directory of worker `i`, the persistent ones are locked until `close`"
+        if self.profiles is None:
+            if self._temporary is None:
+                self._temporary = Path(tempfile.mkdtemp(prefix='scheintool-libreoffice-'))
+            return self._temporary / f'worker_{i}'
+
+        self.profiles.mkdir(parents=True, exist_ok=True)
+        for j in itertools.count():
+            fh = open(self.profiles / f'worker_{j}.lock', 'a')
+            if _try_lock(fh):
+                self._locks.append(fh)
+                return self.profiles / f'worker_{j}'
+            fh.close()
+
+    def _work(self, profile):
+        "takes all waiting files from the queue and converts them, until it gets None"
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            batch = [job]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+
+            # soffice has a single output directory per call
+            by_outdir = {}
+            for key, future in batch:
+                by_outdir.setdefault(key[2], []).append((key, future))
+            for outdir, jobs in by_outdir.items():
+                self._convert(jobs, outdir, profile)
+
+            if stop:
+                return
+
+    def _convert(self, jobs, outdir, profile):
+        "converts the files of `jobs` into `outdir` with one call of soffice"
+        targets = [outdir / (key[0].stem + '.xlsx') for key, _ in jobs]
+        before = [target.stat().st_mtime_ns if target.is_file() else None for target in targets]
+
+        with tempfile.TemporaryDirectory(prefix='scheintool-sanitized-') as tmp:
+            try:
+                # one directory per file, in case two files have the same name
+                sources = []
+                for i, (key, _) in enumerate(jobs):
+                    directory = Path(tmp) / str(i)
+                    directory.mkdir()
+                    sources.append(sanitized(key[0], directory, self.encoding))
+            except OSError as err:
+                sources = []
+                message = f'could not sanitize: {err}'
+
+            if sources:
+                with tracer.span('libreoffice', files=len(jobs)):
+                    command = [self.executable, f'-env:UserInstallation={profile.as_uri()}', '--headless', '--norestore',
+                               '--convert-to', 'xlsx', '--outdir', str(outdir)] + [str(source) for source in sources]
+                    try:
+                        result = subprocess.run(command, capture_output=True, timeout=self.timeout)
+                        message = result.stderr.decode(errors='replace').strip()
+                    except (OSError, subprocess.TimeoutExpired) as err:
+                        message = str(err)
+
+        with self._lock:
+            self.calls += 1
+            self.files += len(jobs)
+
+        for (key, future), target, mtime in zip(jobs, targets, before):
+            if target.is_file() and target.stat().st_mtime_ns != mtime:
+                future.set_result(str(target))
+            else:
+                # forget failed files, so that they can be submitted again
+                with self._lock:
+                    self._futures.pop(key, None)
+                future.set_exception(RuntimeError(f'XLS->XLSX conversion of {key[0]} failed. Message is: {message}'))
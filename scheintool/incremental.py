@@ -0,0 +1,183 @@
+"""
+Incremental regeneration of certificates and grade tables.
+
+In incremental mode, a manifest is stored next to every output file, e.g.
+`certificates.pdf.manifest.json`. For the certificates, it lists a hash of
+the entries of every page. When the certificates are generated again, only
+students whose entries changed (or who are new) are rendered, the pages of
+all others are copied from the existing PDF. Students that were removed or
+failed are dropped. For the grade table, the manifest holds a hash of the
+whole content, and the table is only written again if that changed.
+
+The manifest also records size and modification time of the output, so an
+output file that was changed or replaced by something else is regenerated
+completely.
+"""
+import io
+import json
+import hashlib
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(filename):
+    "returns the path of the manifest of output file `filename`"
+    filename = Path(filename)
+    return filename.with_name(filename.name + '.manifest.json')
+
+
+def _file_state(filename):
+    stat = Path(filename).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_hash(filename):
+    "returns the SHA-256 of the content of a file"
+    with open(filename, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def read_manifest(filename, **expected):
+    """Reads the manifest of output file `filename`.
+
+    Parameters
+    ----------
+    filename : str | path
+        the output file, not the manifest
+    expected : dict
+        entries the manifest needs to have, e.g. the degree of the certificates
+
+    Returns
+    -------
+    dict | None
+        the manifest, or None if there is none, if it belongs to a different
+        version of the output file, or if one of the `expected` entries differs
+    """
+    try:
+        with open(manifest_path(filename)) as fh:
+            manifest = json.load(fh)
+        state = _file_state(filename)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('file') != state:
+        return None
+    if any(manifest.get(key) != value for key, value in expected.items()):
+        return None
+    return manifest
+
+
+def write_manifest(filename, **entries):
+    "writes the manifest of the (already written) output file `filename`"
+    manifest = {'version': MANIFEST_VERSION, 'file': _file_state(filename), **entries}
+    path = manifest_path(filename)
+    temp = path.with_name(path.name + '.tmp')
+    with open(temp, 'w') as fh:
+        json.dump(manifest, fh)
+    temp.replace(path)
+
+
+def certificate_hashes(data, today, course=None):
+    """Returns a hash of the entries of every certificate in `data`.
+
+    The hash covers everything that is printed, so it changes with any
+    field of the row or of the `course` (see `scheintool.model.rows`), and
+    with `today` for certificates without a date.
+    """
+    from scheintool import model
+    from scheintool.backends import certificate_entries
+
+    return [hashlib.sha256(repr(certificate_entries(student, course, today)).encode()).hexdigest()[:32]
+            for student, course in model.rows(data, course)]
+
+
+def table_hash(*content):
+    "returns a hash of the content of a grade table"
+    return hashlib.sha256(json.dumps(content, default=str).encode()).hexdigest()
+
+
+def old_pages(filename, manifest, hashes):
+    """Finds the certificates in an existing output that can be re-used.
+
+    Parameters
+    ----------
+    filename : str | path
+        the existing certificate PDF
+    manifest : dict | None
+        its manifest, see `read_manifest`
+    hashes : list
+        the hashes of the certificates to generate, see `certificate_hashes`
+
+    Returns
+    -------
+    list
+        for every hash, the existing page with the same entries, or None
+    """
+    import PyPDF2
+
+    if manifest is None:
+        return [None] * len(hashes)
+
+    # read into memory, as the file is overwritten later
+    pages = PyPDF2.PdfReader(io.BytesIO(Path(filename).read_bytes())).pages
+
+    available = {}
+    for index, key in enumerate(manifest['certificates']):
+        available.setdefault(key, []).append(index)
+
+    # the same hash appears several times only for duplicated rows, use every page once
+    return [pages[available[key].pop(0)] if available.get(key) else None for key in hashes]
+
+
+def splice(pages, degree):
+    """Joins pages from different PDFs into one.
+
+    Pages that show the template as form XObject are pointed to a single
+    copy of the template, so that the template is not stored once for every
+    PDF the pages come from.
+
+    Parameters
+    ----------
+    pages : list
+        the pages, in order
+    degree : str
+        'master' or 'bachelor', the template of the pages
+
+    Returns
+    -------
+    PyPDF2.PdfWriter
+        the writer containing the pages
+    """
+    import PyPDF2
+    from PyPDF2.generic import DictionaryObject, NameObject
+    from scheintool.backends import template_file
+    from scheintool.templates import template_cache
+
+    output = PyPDF2.PdfWriter()
+    form = None
+
+    for original in pages:
+        resources = original['/Resources']
+        if '/Tpl' not in resources.get('/XObject', {}):
+            output.add_page(original)
+            continue
+
+        if form is None:
+            form, template = template_cache.form(output, template_file(degree))
+
+        # replace the references before adding the page, so that the old
+        # templates and form fields are never copied into `output`
+        xobjects = DictionaryObject(resources['/XObject'])
+        xobjects[NameObject('/Tpl')] = form
+        resources = DictionaryObject(resources)
+        resources[NameObject('/XObject')] = xobjects
+
+        page = PyPDF2.PageObject(original.pdf, original.indirect_reference)
+        page.update(original)
+        page[NameObject('/Resources')] = resources
+        if '/Annots' in template:
+            page[NameObject('/Annots')] = template.raw_get('/Annots').clone(output)
+        output.add_page(page)
+
+    return output
@@ -0,0 +1,268 @@
+"""
+Timing of the stages of a run, to find out where the time goes.
+
+Tracing is off by default. It is switched on with the environment variable
+`SCHEIN_TRACE` or the option `--trace` of `schein`, both take the file the
+trace is written to when the program exits:
+
+    SCHEIN_TRACE=trace.json schein
+    schein --trace trace.json batch courses.yaml
+
+For every call of a traced stage (`read_LSF`, `convert_xls_xsls`,
+`read_grades`, `preflight`, `merge_course_data`, `fill_certificate`,
+`fill_certificate_files`, `write_grade_table` and the GUI's `run` and
+`generate`), the wall and CPU time of the calling thread and the number of
+rows are recorded. The progress callbacks of the writers are used to record
+the latency of every certificate, file and table row, which is stored as
+histogram. With the ReportLab backends, the overlays of all certificates
+are drawn before the first page is added, so that time is part of the first
+sample. Work done in worker processes only shows up in the wall time of the
+stage that waits for it.
+
+The trace is a JSON file in the Chrome trace event format, which can be
+opened in `chrome://tracing` or https://ui.perfetto.dev. The same file holds
+a summary per stage under `stages` and the histograms under `histograms`.
+
+When tracing is off, a traced function only checks a flag before it runs,
+and the progress callbacks are passed on unchanged.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import bisect
+import functools
+import threading
+import contextlib
+import multiprocessing
+
+# upper edges of the histogram bins in ms, the last bin is open
+
+bins = [0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+class Tracer():
+    """Records the stages of a run and the latencies within them.
+
+    The attribute `enabled` switches the recording on and off, see `enable`.
+    Recording is thread-safe, the stages of every thread are nested on
+    their own.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.filename = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._t0 = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        "removes all recorded stages and latencies"
+        with self._lock:
+            self.events = []
+            self.samples = {}
+
+    def enable(self, filename=None):
+        """Starts recording.
+
+        Parameters
+        ----------
+        filename : str | path, optional
+            if given, the trace is written to this file when the program
+            exits, see `export`
+        """
+        self.enabled = True
+        if filename is not None:
+            if self.filename is None and multiprocessing.parent_process() is None:
+                # worker processes inherit the environment, but do not write the trace
+                atexit.register(self._export_at_exit)
+            self.filename = str(filename)
+
+    def disable(self):
+        "stops recording, what was recorded is kept"
+        self.enabled = False
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Context manager that records the time spent in the block as stage `name`.
+
+        `args` are stored with the stage, more can be added from within the
+        block with `annotate`. Does nothing if tracing is off.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        stack = self._stack()
+        args = dict(args)
+        stack.append(args)
+        start = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        except BaseException as err:
+            args['error'] = type(err).__name__
+            raise
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.thread_time() - cpu
+            stack.pop()
+            event = {
+                'name': name,
+                'start': start - self._t0,
+                'wall': wall,
+                'cpu': cpu,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def annotate(self, **args):
+        "adds `args`, e.g. the number of `rows`, to the innermost stage of this thread"
+        if self.enabled:
+            stack = self._stack()
+            if stack:
+                stack[-1].update(args)
+
+    def latencies(self, name, progress=None):
+        """Returns a progress callback that records the time per item as `name`.
+
+        The time between two calls of the callback is split evenly over the
+        items that were done in between, the first interval starts now.
+
+        Parameters
+        ----------
+        name : str
+            name of the histogram, e.g. 'certificate'
+        progress : callable, optional
+            the callback `progress(done, total)` that is wrapped
+
+        Returns
+        -------
+        callable
+            the wrapped callback, or `progress` itself if tracing is off
+        """
+        if not self.enabled:
+            return progress
+
+        last = [time.perf_counter(), 0]
+
+        def record(done, total):
+            now = time.perf_counter()
+            items = done - last[1]
+            if items > 0:
+                with self._lock:
+                    self.samples.setdefault(name, []).extend([(now - last[0]) / items] * items)
+            last[:] = [now, done]
+            if progress is not None:
+                progress(done, total)
+
+        return record
+
+    def summary(self):
+        """Returns the calls, total wall and CPU time in s, and rows of every stage."""
+        stages = {}
+        for event in self.events:
+            stage = stages.setdefault(event['name'], {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'rows': 0})
+            stage['calls'] += 1
+            stage['wall'] += event['wall']
+            stage['cpu'] += event['cpu']
+            stage['rows'] += event['args'].get('rows', 0)
+        return stages
+
+    def histograms(self):
+        "returns the `histogram` of every latency, in ms"
+        return {name: histogram(1e3 * sample for sample in samples) for name, samples in self.samples.items()}
+
+    def export(self, filename):
+        """Writes the trace to `filename`.
+
+        The file is in the Chrome trace event format, with the summary of
+        every stage under `stages` and the latency histograms under
+        `histograms`.
+        """
+        with self._lock:
+            events = list(self.events)
+
+        trace_events = [{
+            'name': event['name'],
+            'cat': 'scheintool',
+            'ph': 'X',
+            'ts': 1e6 * event['start'],
+            'dur': 1e6 * event['wall'],
+            'pid': event['pid'],
+            'tid': event['tid'],
+            'args': {'cpu_ms': 1e3 * event['cpu'], **event['args']},
+        } for event in events]
+
+        with open(filename, 'w') as fh:
+            json.dump({
+                'traceEvents': trace_events,
+                'displayTimeUnit': 'ms',
+                'stages': self.summary(),
+                'histograms': self.histograms(),
+            }, fh, indent=1, default=str)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _export_at_exit(self):
+        if self.filename is not None and (self.events or self.samples):
+            try:
+                self.export(self.filename)
+            except OSError as err:
+                print(f'could not write the trace to {self.filename}: {err}', file=sys.stderr)
+
+
+def histogram(ms):
+    """Returns count, mean, percentiles and bin counts of the samples `ms`, in ms.
+
+    `counts[i]` is the number of samples up to `bins[i]`, the last entry
+    counts those above `bins[-1]`. Used for the latencies of the trace and
+    of `schein serve`.
+    """
+    ms = sorted(ms)
+    counts = [0] * (len(bins) + 1)
+    for value in ms:
+        counts[bisect.bisect_left(bins, value)] += 1
+    if not ms:
+        return {'count': 0, 'bins': bins, 'counts': counts}
+    return {
+        'count': len(ms),
+        'mean': sum(ms) / len(ms),
+        'min': ms[0],
+        'p50': ms[len(ms) // 2],
+        'p90': ms[int(0.9 * (len(ms) - 1))],
+        'p99': ms[int(0.99 * (len(ms) - 1))],
+        'max': ms[-1],
+        'bins': bins,
+        'counts': counts,
+    }
+
+
+def traced(name):
+    """Decorator that records every call of the function as stage `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# the tracer used by `settings` and the GUI
+
+tracer = Tracer()
+
+if os.environ.get('SCHEIN_TRACE'):
+    tracer.enable(os.environ['SCHEIN_TRACE'])
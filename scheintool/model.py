@@ -0,0 +1,131 @@
+"""
+The data of a course: one `Course` record with the entries that are the same
+for all students, and a table with one row per student.
+
+`settings.merge_course_data` returns the students with only their own
+columns, the course is not copied into every row. The writers get the
+course separately (`course=` of `settings.fill_certificate`, `course_info`
+of `settings.write_grade_table`) and iterate the students as tuples of
+the columns they print, see `rows`.
+
+All writers list the students in the same order, by last name, first name
+and matrikel number as in a German dictionary (DIN 5007-1): case and
+accents are ignored, so umlauts sort as their vowel and ß as ss. The order
+is computed once, when the table is merged, and stored as column `order`,
+see `sorted_students`.
+"""
+from collections import namedtuple
+
+Course = namedtuple('Course', ['place', 'semester', 'year', 'title_en', 'title_de', 'lecturer', 'ECTS', 'SWS', 'examdate',
+                               'type', 'date'])
+Course.__new__.__defaults__ = ('München',) + (None,) * (len(Course._fields) - 1)
+
+Student = namedtuple('Student', ['MNR', 'lastname', 'firstname', 'major', 'dob', 'pob', 'grade_text'])
+
+
+def course_record(course):
+    """Returns the `Course` of `course`.
+
+    Parameters
+    ----------
+    course : dict | Course
+        the course information as returned by `settings.merge_course_data`,
+        other keys (e.g. `beisitzer`) are ignored
+    """
+    if isinstance(course, Course):
+        return course
+    return Course(**{name: course[name] for name in Course._fields if name in course})
+
+
+def collation_key(names):
+    """Returns the keys by which the strings `names` are sorted.
+
+    The names are compared without case and accents (DIN 5007-1), e.g.
+    Müller, Muller and muller get the same key, which sorts before Mutter.
+
+    Parameters
+    ----------
+    names : Series
+        the strings
+
+    Returns
+    -------
+    Series
+        the keys, with the same index
+    """
+    return (names.astype(str).str.casefold()
+            .str.normalize('NFKD').str.replace('[\u0300-\u036f]', '', regex=True))
+
+
+def sort_order(data):
+    "returns the positions of the rows of `data` in German order by `lastname`, `firstname` and `MNR`"
+    import pandas as pd
+
+    keys = pd.DataFrame({
+        'lastname': collation_key(data['lastname']).to_numpy(),
+        'firstname': collation_key(data['firstname']).to_numpy() if 'firstname' in data else '',
+        'MNR': data['MNR'].to_numpy() if 'MNR' in data else 0,
+    })
+    return keys.sort_values(['lastname', 'firstname', 'MNR'], kind='stable').index.to_numpy()
+
+
+def sorted_students(data):
+    """Returns `data` sorted in German order, see `sort_order`.
+
+    The position of every row in the order is stored in the column `order`.
+    Tables that have it are not sorted again: if it is increasing, e.g.
+    after selecting some of the rows, `data` is returned as it is.
+    """
+    import numpy as np
+
+    if 'order' in data:
+        if data['order'].is_monotonic_increasing:
+            return data
+        return data.sort_values('order', kind='stable')
+
+    data = data.iloc[sort_order(data)]
+    return data.assign(order=np.arange(len(data), dtype='int32'))
+
+
+def rows(data, course=None):
+    """Yields a `Student` and its `Course` for every row of `data`.
+
+    Parameters
+    ----------
+    data : DataFrame
+        the students, with the columns of `Student`
+    course : dict | Course, optional
+        the course of all students. Without it, `data` needs a column for
+        every field of `Course`. If both are given, the values in `data`
+        are used where they are not empty.
+
+    Yields
+    ------
+    Student, Course
+        if `data` has no columns of the course, it is the same `Course`
+        object for all rows
+    """
+    students = map(Student._make, zip(*(data[name].tolist() for name in Student._fields)))
+    own = [name for name in Course._fields if name in data]
+
+    if course is None:
+        missing = [name for name in Course._fields if name not in own and name != 'place']
+        if missing:
+            raise ValueError('course is needed for the missing columns: ' + ', '.join(missing))
+        course = Course()
+    else:
+        course = course_record(course)
+
+    if not own:
+        for student in students:
+            yield student, course
+        return
+
+    for student, values in zip(students, zip(*(data[name].tolist() for name in own))):
+        yield student, course._replace(**{name: value for name, value in zip(own, values) if not _empty(value)})
+
+
+def _empty(value):
+    "returns True for values that are not set: None, NaN or ''"
+    import pandas as pd
+    return value is None or value is pd.NA or value != value or value == ''
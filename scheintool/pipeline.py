@@ -0,0 +1,211 @@
+"""
+The stages of the GUI's Generate run, overlapped where they do not depend on
+each other:
+
+    read_LSF ──────┐
+    read_grades ───┼── preflight, merge ──┬── fill_certificate (+ single PDFs)
+    warm_up ───────┘                      └── write_grade_table
+
+Roster and grades are read at the same time, while the libraries of the
+writers are imported and the certificate template is parsed (`warm_up`).
+Once the data is merged, the grade table is written while the certificates
+are rendered. The stages run in threads: much of their time is spent
+outside the interpreter (waiting for LibreOffice or the worker processes
+of `fill_certificate`, parsing with pyarrow or calamine, writing files), so
+they overlap even though only one thread runs Python at a time.
+
+Every stage records its start and end time and its error, so errors are
+still reported per stage, see `generate`. `benchmarks/bench_generate.py`
+compares the overlapped run to running the stages one after the other.
+
+With more than one worker, the worker processes of `fill_certificate` are
+started before any of these threads: forking while another thread runs
+(e.g. one that imports a module or writes a file) can copy the locks it
+holds into the new process, which then hangs on them.
+
+The overlap is off by default (`concurrent=False`): on one core, with and
+without a slow LibreOffice conversion, it did not shorten the run (see the
+benchmark). It is turned on with `schein --concurrent` or in the GUI.
+"""
+import time
+import traceback
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+from scheintool import settings, preflight
+
+
+def warm_up(degree, backend='form'):
+    "imports the libraries of the writers and parses the certificate template, see `generate`"
+    import xlsxwriter  # noqa: F401
+    from scheintool import backends
+
+    backends.template_cache.reader(backends.template_file(degree))
+    backends.today_text()
+    if backend != 'auto' and isinstance(backends.get_backend(backend), backends.ReportlabBackend):
+        from reportlab.pdfgen import canvas  # noqa: F401
+
+
+def generate(lsf_file, grade_file, filename, course, degree='master', workers=1, backend='form', incremental=False,
+             single_files=False, progress=None, concurrent=False):
+    """Reads the inputs and writes the certificates and the grade table.
+
+    Parameters
+    ----------
+    lsf_file, grade_file : str | path
+        the roster and the grades, see `settings.read_LSF` and
+        `settings.read_grades`
+    filename : str | path
+        the PDF with the certificates, the grade table is written next to
+        it with suffix `.xlsx`, the single PDFs into a `.zip`
+    course : dict
+        the course settings, see `settings.merge_course_data`
+    degree, workers, backend, incremental
+        see `settings.fill_certificate`
+    single_files : bool, optional
+        if True, also write one PDF per student, see
+        `settings.fill_certificate_files`
+    progress : callable, optional
+        called as `progress(stage)`, returns the progress callback of the
+        stage. If a callback raises `settings.Cancelled`, the run stops.
+    concurrent : bool, optional
+        if True, the stages are overlapped as shown in the module
+        description, by default they are run one after the other
+
+    Returns
+    -------
+    dict
+        - stages: for every stage that was started, its `start` and `end`
+          in s since the start of the run, its `error` message (or None),
+          the `traceback` of the error, and `shown`: True if the error was
+          already passed to `settings.error_handler`
+        - report: the `preflight.Report`, if the check was run
+        - certificates, table: True if the file was written
+        - files: the paths of the files that were written, in the order
+          they were finished
+        - cancelled: True if a progress callback raised `settings.Cancelled`
+        - time: the wall time of the run in s
+    """
+    t0 = time.perf_counter()
+    result = {'stages': {}, 'report': None, 'certificates': False, 'table': False, 'cancelled': False, 'files': []}
+
+    def stage(name, function, *args, **kwargs):
+        "runs `function` as stage `name` and records its time and error"
+        entry = result['stages'][name] = {'start': time.perf_counter() - t0, 'end': None, 'error': None, 'traceback': None,
+                                          'shown': False}
+        try:
+            return function(*args, **kwargs)
+        except settings.Cancelled:
+            result['cancelled'] = True
+            raise
+        except Exception as err:
+            entry['error'] = str(err)
+            entry['traceback'] = traceback.format_exc()
+            entry['shown'] = isinstance(err, settings.ErrorShown)
+            raise
+        finally:
+            entry['end'] = time.perf_counter() - t0
+
+    def callback(name):
+        return progress(name) if progress is not None else None
+
+    # the processes are forked before the threads are started, see the module description
+    processes = _start_processes(workers) if concurrent and workers > 1 else None
+    pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix='generate') if concurrent else None
+    try:
+        # the inputs are read while the writers get ready
+
+        lsf = _submit(pool, stage, 'read_LSF', settings.read_LSF, lsf_file)
+        grades = _submit(pool, stage, 'read_grades', settings.read_grades, grade_file)
+        warm = _submit(pool, stage, 'warm_up', warm_up, degree, backend)
+
+        try:
+            lsf, grades = lsf.result(), grades.result()
+            result['report'] = stage('preflight', _check, lsf, grades, course)
+            data, course_info = stage('merge', settings.merge_course_data, lsf, grades, course)
+        except preflight.PreflightError as err:
+            result['report'] = err.report
+            return result
+        except Exception:
+            return result
+        finally:
+            # a failed warm-up only costs time later
+            warm.exception()
+
+        # the grade table is written while the certificates are rendered
+
+        def write_table():
+            stage('write_grade_table', settings.write_grade_table, Path(filename).with_suffix('.xlsx'), data,
+                  course_info, progress=callback('grade table'), incremental=incremental)
+            result['files'].append(str(Path(filename).with_suffix('.xlsx')))
+
+        table = _submit(pool, write_table) if pool is not None else None
+
+        try:
+            stage('fill_certificate', settings.fill_certificate, data, filename, degree=degree, workers=workers,
+                  progress=callback('certificates'), backend=backend, incremental=incremental, course=course_info,
+                  pool=processes)
+            result['files'].append(str(filename))
+            if single_files:
+                stage('fill_certificate_files', settings.fill_certificate_files, data, Path(filename).with_suffix('.zip'),
+                      degree=degree, workers=workers, progress=callback('single PDFs'), course=course_info,
+                      pool=processes)
+                result['files'].append(str(Path(filename).with_suffix('.zip')))
+            result['certificates'] = True
+        except Exception:
+            pass
+
+        if table is None and not result['cancelled']:
+            table = _submit(None, write_table)
+        if table is not None and table.exception() is None:
+            result['table'] = True
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if processes is not None:
+            processes.shutdown()
+        result['time'] = time.perf_counter() - t0
+
+    return result
+
+
+def _check(lsf, grades, course):
+    "returns the report of `preflight.check`, raises a `preflight.PreflightError` if it has errors"
+    report = preflight.check(lsf, grades, course)
+    report.raise_errors()
+    return report
+
+
+def _start_processes(workers):
+    "returns a process pool whose `workers` processes are running"
+    processes = ProcessPoolExecutor(max_workers=workers)
+    for future in [processes.submit(_ready) for _ in range(workers)]:
+        future.result()
+    return processes
+
+
+def _ready():
+    "returns once the worker process is started"
+    return True
+
+
+def _submit(pool, function, *args, **kwargs):
+    "runs `function` in `pool`, or right away if `pool` is None, and returns its future"
+    if pool is not None:
+        return pool.submit(function, *args, **kwargs)
+    future = Future()
+    try:
+        future.set_result(function(*args, **kwargs))
+    except BaseException as err:
+        future.set_exception(err)
+    return future
+
+
+def timings(result):
+    "returns the start, end and duration of the stages of `result` (see `generate`) as text"
+    lines = [f'{"stage":24s} {"start [s]":>10s} {"end [s]":>8s} {"time [s]":>9s}  error']
+    for name, entry in sorted(result['stages'].items(), key=lambda item: item[1]['start']):
+        lines.append(f'{name:24s} {entry["start"]:10.3f} {entry["end"]:8.3f} {entry["end"] - entry["start"]:9.3f}  '
+                     f'{entry["error"] or ""}'.rstrip())
+    lines.append(f'{"total":24s} {"":10s} {result["time"]:8.3f}')
+    return '\n'.join(lines)
@@ -0,0 +1,304 @@
+"""
+Checks of roster, grades and course settings before anything is rendered.
+
+`check` looks at whole columns at once, so it takes milliseconds even for
+100000 students, and returns a `Report` with every problem it finds:
+
+- errors, which stop the GUI and the batch runs before any file is
+  written: missing columns, invalid or duplicate matrikel numbers (a
+  student listed twice gets two certificates), grades that cannot be read
+  or are not between 1.0 and 5.0, students with a grade but an empty name,
+  major or date/place of birth, and an invalid semester or lecture type
+- warnings: grades of students that are not in the roster, grades that are
+  not on the grading scale, and empty course settings
+- infos: students in the roster without a grade, and matrikel numbers
+  that have different types in roster and grades (`merge_course_data`
+  converts them, see `align_keys`)
+
+Every issue lists the matrikel numbers of the rows it concerns. Rows that
+`settings.read_LSF` and `settings.read_grades` removed because their
+matrikel number or grade could not be read (listed in `attrs['dropped']`
+of the tables) are reported as errors as well.
+
+    report = preflight.check(lsf, grades, course)
+    print(report)
+    report.raise_errors()
+"""
+from collections import namedtuple
+
+from scheintool import settings, schema
+from scheintool.instrument import traced
+
+Issue = namedtuple('Issue', ['severity', 'check', 'message', 'keys'])
+
+severities = ['error', 'warning', 'info']
+
+# the grades of the German grading scale
+
+scale = [1.0, 1.3, 1.7, 2.0, 2.3, 2.7, 3.0, 3.3, 3.7, 4.0, 5.0]
+
+# the columns needed to print a certificate and the grade table
+
+roster_columns = ['MNR', 'lastname', 'firstname', 'major', 'dob', 'pob']
+grade_columns = ['MNR', 'grade']
+
+# converts the matrikel numbers to int64 and drops the rows without one
+
+keys = schema.Schema([schema.Column('MNR', [], 'int', True)])
+
+
+class PreflightError(ValueError):
+    "raised by `Report.raise_errors`, the report is in `report`"
+
+    def __init__(self, report):
+        super().__init__(f'preflight check failed, nothing was written:\n{report}')
+        self.report = report
+
+
+class Report():
+    """The issues found by `check`.
+
+    Attributes
+    ----------
+    issues : list
+        an `Issue` (`severity`, name of the `check`, `message`, matrikel
+        numbers in `keys`) for every problem
+    counts : dict
+        number of rows in the `roster`, the `grades` and of students in
+        both (`matched`)
+    """
+
+    def __init__(self):
+        self.issues = []
+        self.counts = {}
+
+    def add(self, severity, check, message, keys=()):
+        "adds an issue, `keys` are the matrikel numbers concerned"
+        self.issues.append(Issue(severity, check, message, sorted({int(key) for key in keys})))
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue.severity == 'error']
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if issue.severity == 'warning']
+
+    @property
+    def ok(self):
+        "True if there are no errors"
+        return not self.errors
+
+    def raise_errors(self):
+        "raises a `PreflightError` if there are errors"
+        if not self.ok:
+            raise PreflightError(self)
+
+    def summary(self, include=('error', 'warning'), max_keys=10):
+        "returns the issues with a severity in `include` as text, with at most `max_keys` matrikel numbers each"
+        lines = []
+        for issue in sorted(self.issues, key=lambda issue: severities.index(issue.severity)):
+            if issue.severity not in include:
+                continue
+            line = f'{issue.severity}: {issue.message}'
+            if issue.keys:
+                shown = ', '.join(str(key) for key in issue.keys[:max_keys])
+                more = len(issue.keys) - max_keys
+                line += f' ({shown}{f" and {more} more" if more > 0 else ""})'
+            lines.append(line)
+        return '\n'.join(lines) if lines else 'no problems found'
+
+    def to_dict(self):
+        "returns the report as dict, e.g. for JSON"
+        return {
+            'ok': self.ok,
+            'counts': self.counts,
+            'issues': [issue._asdict() for issue in self.issues],
+        }
+
+    def __str__(self):
+        return self.summary()
+
+    def __repr__(self):
+        counts = {severity: sum(issue.severity == severity for issue in self.issues) for severity in severities}
+        return f'Report({", ".join(f"{n} {severity}s" for severity, n in counts.items())})'
+
+
+def align_keys(lsf, grades):
+    """Returns `lsf` and `grades` with the matrikel numbers as int64 in both.
+
+    Tables as returned by `read_LSF` and `read_grades` already have them
+    and are returned unchanged. Otherwise, the numbers are parsed, e.g.
+    from text with spaces, and rows without a valid number are dropped, see
+    `check` for the report.
+    """
+    if lsf['MNR'].dtype == 'int64' and grades['MNR'].dtype == 'int64':
+        return lsf, grades
+    return keys.convert(lsf), keys.convert(grades)
+
+
+@traced('preflight')
+def check(lsf, grades, course=None):
+    """Checks roster, grades and course settings, see the module description.
+
+    Parameters
+    ----------
+    lsf : DataFrame
+        the roster as returned by `settings.read_LSF`
+    grades : DataFrame
+        the grades as returned by `settings.read_grades`, or with the grades
+        as text
+    course : dict, optional
+        the course settings passed to `settings.merge_course_data`
+
+    Returns
+    -------
+    Report
+        all issues that were found
+    """
+    report = Report()
+    report.counts = {'roster': len(lsf), 'grades': len(grades)}
+
+    if course is not None:
+        _check_course(report, course)
+
+    missing = False
+    for name, table, columns in [('roster', lsf, roster_columns), ('grades', grades, grade_columns)]:
+        for column in columns:
+            if column not in table:
+                report.add('error', 'columns', f'the {name} has no column {column}')
+                missing = missing or column == 'MNR'
+        _check_dropped(report, table, name)
+    if missing:
+        return report
+
+    # matrikel numbers: valid, unique, in both tables
+
+    roster_keys = _keys(report, lsf, 'roster')
+    grade_keys = _keys(report, grades, 'grades')
+    if lsf['MNR'].dtype != grades['MNR'].dtype:
+        report.add('info', 'keys', f'the matrikel numbers are {lsf["MNR"].dtype} in the roster and {grades["MNR"].dtype} '
+                   'in the grades, both are converted to integers')
+
+    for name, values in [('roster', roster_keys), ('grades', grade_keys)]:
+        duplicated = values[values.duplicated(keep=False)]
+        if len(duplicated):
+            report.add('error', 'duplicates', f'{duplicated.nunique()} matrikel numbers are listed more than once in the {name}',
+                       duplicated)
+
+    has_grade = roster_keys.isin(grade_keys)
+    in_roster = grade_keys.isin(roster_keys)
+    report.counts['matched'] = int(has_grade.sum())
+
+    if not in_roster.all():
+        report.add('warning', 'unmatched', f'{int((~in_roster).sum())} students with a grade are not in the roster',
+                   grade_keys[~in_roster])
+    if not has_grade.all():
+        report.add('info', 'unmatched', f'{int((~has_grade).sum())} students in the roster have no grade',
+                   roster_keys[~has_grade])
+
+    if 'grade' in grades:
+        _check_grades(report, grades, grade_keys)
+
+    # the entries printed for every student with a grade
+
+    graded = roster_keys[has_grade]
+    for column in roster_columns[1:]:
+        if column in lsf:
+            empty = _empty(_select(lsf[column], roster_keys.index)[has_grade])
+            if empty.any():
+                report.add('error', 'empty', f'{int(empty.sum())} students have no {column}', graded[empty])
+
+    return report
+
+
+def _empty(values):
+    "returns True for the values that are missing or only spaces"
+    import pandas as pd
+
+    empty = values.isna()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # only the few categories need to be checked
+        categories = values.cat.categories
+        return empty | values.isin(categories[categories.astype(str).str.strip() == ''])
+    if pd.api.types.is_numeric_dtype(values):
+        return empty
+    return empty | (values.astype(str).str.strip() == '')
+
+
+def _select(values, index):
+    "returns the rows of `values` in `index`, which is the index of `values` or a part of it"
+    return values if len(values) == len(index) else values.loc[index]
+
+
+def _keys(report, table, name):
+    "returns the valid matrikel numbers of `table`, and reports the others"
+    import pandas as pd
+
+    if table['MNR'].dtype == 'int64':
+        return table['MNR']
+
+    values = pd.to_numeric(table['MNR'].astype(str).str.strip(), errors='coerce')
+    valid = values.notna() & (values % 1 == 0)
+    if not valid.all():
+        report.add('error', 'keys', f'{int((~valid).sum())} rows of the {name} have no valid matrikel number: '
+                   + ', '.join(map(repr, table['MNR'][~valid].head(10).tolist())))
+    return values[valid].astype('int64')
+
+
+def _check_dropped(report, table, name):
+    "reports the rows that were removed from `table` when it was read, because a value could not be parsed"
+    dropped = table.attrs.get('dropped', [])
+
+    keys = [value for column, key, value in dropped if column == 'MNR']
+    if keys:
+        report.add('error', 'keys', f'{len(keys)} rows of the {name} have no valid matrikel number: '
+                   + ', '.join(map(repr, keys[:10])))
+
+    grades = [(key, value) for column, key, value in dropped if column == 'grade']
+    if grades:
+        report.add('error', 'grade format', f'{len(grades)} grades cannot be read: '
+                   + ', '.join(repr(value) for key, value in grades[:10]), [key for key, value in grades])
+
+
+def _check_grades(report, grades, grade_keys):
+    "checks that all grades can be read and are on the grading scale"
+    import numpy as np
+
+    given = grades['grade'].notna()
+    if 'BENB' not in grades:
+        grades = settings.normalize_grades(grades[['grade']])
+    grade = _select(grades['grade'].astype(float), grade_keys.index)
+    given = _select(given, grade_keys.index)
+
+    unreadable = given & grade.isna()
+    if unreadable.any():
+        report.add('error', 'grade format', f'{int(unreadable.sum())} grades cannot be read', grade_keys[unreadable])
+
+    outside = (grade < 1.0) | (grade > 5.0)
+    if outside.any():
+        report.add('error', 'grade range', f'{int(outside.sum())} grades are not between 1.0 and 5.0', grade_keys[outside])
+
+    # there are only a few different grades
+    values = grade.dropna().unique()
+    off_scale = grade.isin(values[~np.isclose(values[:, None], scale).any(axis=1)]) & ~outside
+    if off_scale.any():
+        report.add('warning', 'grade scale', f'{int(off_scale.sum())} grades are not one of {", ".join(map(str, scale))}',
+                   grade_keys[off_scale])
+
+
+def _check_course(report, course):
+    "checks the semester, the lecture type and that the course settings are not empty"
+    if course.get('semester') not in ['SS', 'WS']:
+        report.add('error', 'course', f'the semester needs to be SS or WS, not {course.get("semester")!r}')
+
+    try:
+        valid_type = int(course.get('type')) in [1, 2, 3, 4]
+    except (TypeError, ValueError):
+        valid_type = False
+    if not valid_type:
+        report.add('error', 'course', f'the lecture type needs to be 1, 2, 3 or 4, not {course.get("type")!r}')
+
+    for name, title, default in settings.fields:
+        if name != 'date' and str(course.get(name, default)).strip() == '':
+            report.add('warning', 'course', f'{title} is empty')
@@ -0,0 +1,163 @@
+"""
+The columns that are read from the grade files and the LSF exports.
+
+A `Schema` lists for every column the headers it may have in the input
+(compared without case and surrounding spaces) and its type. Only these
+columns are parsed, all of them as text, so pandas does not have to guess
+the type of every cell. They are then renamed and converted:
+
+- `int`: rows without a valid number are dropped, e.g. empty lines. The
+  values that are not empty are kept in `attrs['dropped']` of the result,
+  so that `scheintool.preflight` can report them.
+- `category`: for columns with few different values, such as the major
+- `str`: kept as text
+
+`.xlsx` files are read with `python-calamine` if it is installed, which is
+several times faster than `openpyxl`.
+"""
+from collections import namedtuple
+from pathlib import Path
+
+Column = namedtuple('Column', ['name', 'aliases', 'dtype', 'required'])
+
+
+class Schema():
+    """Reads and converts the columns of a table.
+
+    Parameters
+    ----------
+    columns : list
+        a `Column` for every column to read: its `name` in the result, the
+        `aliases` (headers) it can have in the input, its `dtype` and if it
+        is `required`
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._targets = {alias.strip().lower(): column.name for column in columns for alias in [column.name] + column.aliases}
+
+    def target(self, header):
+        "returns the name of the column with input header `header`, or None if it is not read"
+        return self._targets.get(str(header).strip().lower())
+
+    def usecols(self, header):
+        "returns True if the column with input header `header` is read, used as `usecols` for pandas"
+        return self.target(header) is not None
+
+    def read(self, filename, **kwargs):
+        """Reads the columns of the schema from a `.csv`, `.xlsx` or `.xls` file.
+
+        Parameters
+        ----------
+        filename : str | path
+            the input file
+        kwargs : dict
+            passed to the pandas reader, e.g. `skiprows`
+
+        Returns
+        -------
+        DataFrame
+            the renamed columns, all as text, see `rename`
+        """
+        return self.rename(self.read_table(filename, **kwargs))
+
+    def read_table(self, filename, **kwargs):
+        """Reads the columns of the schema like `read`, but does not rename
+        them, so that errors of the file and of the columns can be told apart."""
+        import pandas as pd
+        from scheintool import xls
+
+        filename = Path(filename)
+        suffix = filename.suffix.lower()
+        kwargs.update(usecols=self.usecols, dtype=str)
+
+        if suffix == '.csv':
+            table = pd.read_csv(filename, **kwargs)
+        elif suffix == '.xlsx':
+            table = pd.read_excel(filename, engine=excel_engine(), **kwargs)
+        elif suffix == '.xls':
+            table = xls.read_xls(filename, **kwargs)
+        else:
+            raise ValueError(f"File type needs to be 'csv', 'xlsx' or 'xls', not '{filename.suffix}'.")
+
+        return table
+
+    def rename(self, table):
+        """Renames the columns of `table` to the names of the schema.
+
+        If several columns have headers of the same schema column, the first
+        one is used and the others are dropped, as are columns that are not
+        in the schema.
+
+        Raises
+        ------
+        ValueError
+            if a required column is missing
+        """
+        renaming = {}
+        for header in table.columns:
+            name = self.target(header)
+            if name is not None and name not in renaming.values():
+                renaming[header] = name
+
+        missing = [column for column in self.columns if column.required and column.name not in renaming.values()]
+        if missing:
+            raise ValueError('Missing columns: ' + '; '.join(
+                f'{column.name} (one of: {", ".join(column.aliases)})' for column in missing))
+
+        return table[list(renaming)].rename(columns=renaming)
+
+    def convert(self, table):
+        """Converts the columns of `table` to the types of the schema.
+
+        Rows without a valid `int` are dropped. For those that were not
+        empty, `[column, None, value]` is added to the list
+        `attrs['dropped']` of the result.
+        """
+        import pandas as pd
+
+        for column in self.columns:
+            if column.name not in table:
+                continue
+            if column.dtype == 'int':
+                values = pd.to_numeric(table[column.name], errors='coerce')
+                valid = values.notna() & (values % 1 == 0)
+                invalid = table[column.name][~valid].dropna().astype(str)
+                dropped = [[column.name, None, value] for value in invalid if value.strip() != '']
+                table = table[valid].assign(**{column.name: values[valid].astype('int64')})
+                if dropped:
+                    table.attrs['dropped'] = table.attrs.get('dropped', []) + dropped
+            elif column.dtype == 'category':
+                table = table.assign(**{column.name: table[column.name].astype('category')})
+        return table
+
+
+def excel_engine():
+    "returns the fastest installed engine for reading `.xlsx` files"
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return 'openpyxl'
+    return 'calamine'
+
+
+# the grades: matrikel number and grade, which is parsed by `normalize_grades`
+
+grades = Schema([
+    Column('MNR', ['MNR', 'Matrikelnummer', 'Matrikelnumber', 'Mtknr'], 'int', True),
+    Column('grade', ['Note', 'Noten', 'Grade', 'Grades'], 'str', True),
+])
+
+# the LSF exports, only the columns used for the certificates and the grade
+# table are read
+
+lsf = Schema([
+    Column('MNR', ['Mtknr', 'Matrikelnummer'], 'int', True),
+    Column('lastname', ['Nachname'], 'str', True),
+    Column('firstname', ['Vorname'], 'str', True),
+    Column('gender', ['Geschlecht'], 'str', False),
+    Column('address', ['Anschrift'], 'str', False),
+    Column('dob', ['Geburtstag/-ort'], 'str', True),
+    Column('email', ['E-Mail'], 'str', False),
+    Column('major', ['Studiengänge'], 'category', True),
+])
@@ -0,0 +1,523 @@
+"""
+A local HTTP service that generates certificates and grade tables, for
+offices that generate them many times a day.
+
+    schein serve --port 8765 --jobs 2
+
+Starting `schein` costs the imports, reading the config and parsing the
+certificate templates every time. The service pays this once: the
+certificates are rendered by a pool of `jobs` worker processes that are
+started, and warmed up (see `pipeline.warm_up`), when the service starts.
+The last rosters that were uploaded are kept in memory, parsed, so that a
+roster uploaded again (e.g. after correcting a grade) is neither converted
+nor read again.
+
+The service only listens on 127.0.0.1 and has no authentication. Requests
+whose `Host` or `Origin` is not this computer are answered with 403, so
+that web pages cannot send requests to it through the browser. It has
+three endpoints:
+
+- `POST /generate`: a `multipart/form-data` upload with the course settings
+  as saved by the GUI (`config`), the LSF export (`lsf`) and the grades
+  (`grades`). The response is a ZIP with `<name>.pdf`, `<name>.xlsx` and the
+  report of `preflight.check` as `preflight.json`, or only one of the files
+  with `?format=pdf` or `?format=xlsx`. `?name=` sets the names of the
+  downloaded files, see `file_stem`.
+  Inputs that cannot be read are answered with 400, inputs that fail the
+  check with 422 and the report as JSON. If `jobs + queue` requests are
+  already being handled, the request is answered with 503 right away.
+- `GET /metrics`: the number of requests per endpoint and status, the
+  histogram of the latency of the requests and of their stages in ms (see
+  `instrument.histogram`), the hits of the roster cache and the requests
+  that are running or were rejected, as JSON.
+- `GET /health`: 'ok'.
+
+`post` is a client for `/generate` that needs only the standard library;
+`benchmarks/bench_serve.py` runs the service and the client in one process,
+without network access.
+"""
+import io
+import re
+import sys
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+import zipfile
+import traceback
+import collections
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from scheintool import settings, preflight
+from scheintool.instrument import histogram
+
+# uploads larger than this are rejected
+
+max_upload = 64 * 1024**2
+
+# the host names under which the service may be addressed
+
+local_hosts = ['127.0.0.1', 'localhost', '[::1]']
+
+
+def add_parser(subparsers):
+    "adds the `serve` command to the command line parser"
+    parser = subparsers.add_parser('serve', help='generate certificates through a local HTTP service, see scheintool/serve.py')
+    parser.add_argument('-p', '--port', type=int, default=8765, help='port on 127.0.0.1 (default: 8765)')
+    parser.add_argument('-j', '--jobs', type=int, default=2, help='number of worker processes rendering the certificates (default: 2)')
+    parser.add_argument('-q', '--queue', type=int, default=8,
+                        help='number of requests that wait for a worker, more are rejected (default: 8)')
+    parser.add_argument('--rosters', type=int, default=16, help='number of parsed rosters kept in memory (default: 16)')
+    parser.add_argument('--backend', default='form', choices=['merge', 'form', 'direct', 'auto'],
+                        help='how the certificates are rendered, see scheintool/backends.py (default: form)')
+    return parser
+
+
+def file_stem(name, default='certificates'):
+    """Returns `name` as a file name without directory: path separators,
+    characters that are not allowed in file names and control characters
+    become `_`, leading dots are removed, and at most 100 characters are
+    kept. Returns `default` if nothing is left."""
+    stem = re.sub(r'[\\/:*?"<>|\s\x00-\x1f\x7f]+', '_', name).strip('._')[:100]
+    return stem or default
+
+
+class Metrics():
+    """Counts the requests and records their latencies, thread-safe.
+
+    Only the last `max_samples` latencies of every endpoint and stage are
+    kept.
+    """
+
+    def __init__(self, max_samples=10000):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = collections.Counter()
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=max_samples))
+        self.stages = collections.defaultdict(lambda: collections.deque(maxlen=max_samples))
+        self.running = 0
+        self.rejected = 0
+
+    def start(self):
+        "counts a request that is being handled"
+        with self._lock:
+            self.running += 1
+
+    def finish(self):
+        "counts a request that is done"
+        with self._lock:
+            self.running -= 1
+
+    def reject(self):
+        "counts a request that was rejected because all workers were busy"
+        with self._lock:
+            self.rejected += 1
+
+    def record(self, endpoint, status, seconds, stages=None):
+        "records a request to `endpoint` that took `seconds`, `stages` maps stage names to their time in s"
+        with self._lock:
+            self.requests[f'{endpoint} {status}'] += 1
+            self.latencies[endpoint].append(1e3 * seconds)
+            for name, value in (stages or {}).items():
+                self.stages[name].append(1e3 * value)
+
+    def to_dict(self):
+        "returns the metrics as dict, for JSON"
+        with self._lock:
+            return {
+                'uptime': time.time() - self.started,
+                'requests': dict(self.requests),
+                'running': self.running,
+                'rejected': self.rejected,
+                'latency': {name: histogram(samples) for name, samples in self.latencies.items()},
+                'stages': {name: histogram(samples) for name, samples in self.stages.items()},
+            }
+
+
+class RosterMemo():
+    """The last `size` rosters read by `read`, parsed, keyed by the hash of the upload."""
+
+    def __init__(self, size=16):
+        self.size = size
+        self._tables = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, content, suffix):
+        """Returns the roster in the uploaded `content`, see `settings.read_LSF`.
+
+        The table is shared between requests, do not modify it.
+        """
+        key = hashlib.sha256(suffix.lower().encode() + b'\0' + content).hexdigest()
+        with self._lock:
+            if key in self._tables:
+                self._tables.move_to_end(key)
+                self.hits += 1
+                return self._tables[key]
+            self.misses += 1
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = Path(tmp) / f'lsf{suffix}'
+            filename.write_bytes(content)
+            table = settings.read_LSF(filename)
+
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > self.size:
+                self._tables.popitem(last=False)
+        return table
+
+    def info(self):
+        "returns a dict with the number of hits, misses and rosters in memory"
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._tables)}
+
+
+class ServiceError(Exception):
+    "an error answered with HTTP status `status`, `body` is sent as JSON"
+
+    def __init__(self, status, message, **body):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': message, **body}
+
+
+class Server(ThreadingHTTPServer):
+    """The service, see the module description.
+
+    Parameters
+    ----------
+    address : tuple
+        (host, port), port 0 picks a free port, see `url`
+    jobs : int, optional
+        number of worker processes
+    queue : int, optional
+        number of requests that may wait for a worker
+    rosters : int, optional
+        number of parsed rosters kept in memory
+    backend : str, optional
+        how the certificates are rendered, see `settings.fill_certificate`
+    quiet : bool, optional
+        if True, requests are not logged to stderr
+
+    Errors are answered instead of shown in a dialog, so
+    `settings.interactive` is set to False.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 8765), jobs=2, queue=8, rosters=16, backend='form', quiet=False):
+        settings.interactive = False
+        self.backend = backend
+        self.quiet = quiet
+        self.metrics = Metrics()
+        self.rosters = RosterMemo(rosters)
+        self.slots = threading.BoundedSemaphore(jobs + queue)
+
+        # start and warm up the workers before any request is accepted
+        self.pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(backend,))
+        for future in [self.pool.submit(_ready) for _ in range(jobs)]:
+            future.result()
+
+        super().__init__(address, Handler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+    def generate(self, fields):
+        """Handles the uploads of `/generate`.
+
+        Parameters
+        ----------
+        fields : dict
+            the uploaded `config`, `lsf` and `grades` as (file name, content)
+
+        Returns
+        -------
+        dict
+            `pdf` and `xlsx` (bytes), the `report` of `preflight.check`,
+            the number of `students` and `certificates`, and the time of
+            every stage in s in `stages`
+        """
+        for key in ['config', 'lsf', 'grades']:
+            if key not in fields:
+                raise ServiceError(400, f'no {key} uploaded')
+
+        stages = {}
+        t0 = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            try:
+                config_file = tmp / 'config.txt'
+                config_file.write_bytes(fields['config'][1])
+                config = settings.read_course_config(config_file, encoding=settings.encoding)
+                config.setdefault('type', 1)
+                config.setdefault('semester', 'SS' if settings.currentMonth < 10 else 'WS')
+
+                grade_file = tmp / f'grades{Path(fields["grades"][0]).suffix}'
+                grade_file.write_bytes(fields['grades'][1])
+                grades = settings.read_grades(grade_file)
+                stages['read_grades'] = time.perf_counter() - t0
+
+                lsf = self.rosters.read(fields['lsf'][1], Path(fields['lsf'][0]).suffix)
+                stages['read_LSF'] = time.perf_counter() - t0 - stages['read_grades']
+            except Exception as err:
+                raise ServiceError(400, f'could not read the uploads: {err}')
+
+        t0 = time.perf_counter()
+        report = preflight.check(lsf, grades, config)
+        stages['preflight'] = time.perf_counter() - t0
+        if not report.ok:
+            raise ServiceError(422, str(preflight.PreflightError(report)), report=report.to_dict())
+
+        result = self.pool.submit(_generate, lsf, grades, config, self.backend).result()
+        result['stages'] = {**stages, **result['stages']}
+        result['report'] = report
+        return result
+
+
+class Handler(BaseHTTPRequestHandler):
+    "answers the requests of a `Server`"
+
+    def do_GET(self):
+        t0 = time.perf_counter()
+        path = urllib.parse.urlsplit(self.path).path
+        if not self._local():
+            status = self._send_json(403, {'error': 'only requests from this computer are answered'})
+        elif path == '/metrics':
+            metrics = self.server.metrics.to_dict()
+            metrics['rosters'] = self.server.rosters.info()
+            status = self._send(200, json.dumps(metrics, indent=1).encode(), 'application/json')
+        elif path == '/health':
+            status = self._send(200, b'ok', 'text/plain')
+        else:
+            status = self._send_json(404, {'error': f'unknown path {path}'})
+        self.server.metrics.record(f'GET {path}', status, time.perf_counter() - t0)
+
+    def do_POST(self):
+        t0 = time.perf_counter()
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        metrics = self.server.metrics
+        stages = None
+
+        # the upload is read in any case, so the client gets the answer
+        length = self.headers.get('Content-Length')
+        error = None
+        if not self._local():
+            error = 403, 'only requests from this computer are answered'
+        elif length is None:
+            error = 411, 'the request has no Content-Length'
+        elif not length.strip().isdigit():
+            error = 400, f'invalid Content-Length {length!r}'
+        elif int(length) > max_upload:
+            error = 413, f'the uploads are larger than {max_upload} bytes'
+        if error is not None:
+            # the body was not read, the connection cannot be used again
+            self.close_connection = True
+            status = self._send_json(error[0], {'error': error[1]})
+            metrics.record(f'POST {url.path}', status, time.perf_counter() - t0)
+            return
+        body = self.rfile.read(int(length))
+
+        if url.path != '/generate':
+            status = self._send_json(404, {'error': f'unknown path {url.path}'})
+        elif not self.server.slots.acquire(blocking=False):
+            metrics.reject()
+            self.send_response(503)
+            self.send_header('Retry-After', '1')
+            status = self._send_json(503, {'error': 'too many requests, try again later'}, started=True)
+        else:
+            metrics.start()
+            try:
+                fields = self._read_form(body)
+                name = file_stem(query.get('name', 'certificates'))
+                result = self.server.generate(fields)
+                stages = result['stages']
+                status = self._send_result(result, name, query.get('format', 'zip'))
+            except ServiceError as err:
+                status = self._send_json(err.status, err.body)
+            except Exception as err:
+                status = self._send_json(500, {'error': str(err), 'traceback': traceback.format_exc()})
+            finally:
+                metrics.finish()
+                self.server.slots.release()
+
+        metrics.record(f'POST {url.path}', status, time.perf_counter() - t0, stages)
+
+    def _local(self):
+        "True if `Host` and, if given, `Origin` of the request name this computer"
+        port = self.server.server_address[1]
+        allowed = {f'{host}:{port}' for host in local_hosts}
+        origin = self.headers.get('Origin')
+        return (self.headers.get('Host', '').lower() in allowed
+                and (origin is None or urllib.parse.urlsplit(origin.lower()).netloc in allowed))
+
+    def _read_form(self, body):
+        "returns the files of the multipart/form-data `body` as {name: (file name, content)}"
+        import email.parser
+        import email.policy
+
+        content_type = self.headers.get('Content-Type', '')
+        if not content_type.startswith('multipart/form-data'):
+            raise ServiceError(400, 'the uploads need to be sent as multipart/form-data')
+
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if name is not None:
+                fields[name] = (part.get_filename() or name, part.get_payload(decode=True) or b'')
+        return fields
+
+    def _send_result(self, result, name, format):
+        "sends the outputs of `Server.generate` as ZIP, or one of them"
+        if format == 'pdf':
+            return self._send(200, result['pdf'], 'application/pdf', f'{name}.pdf')
+        elif format == 'xlsx':
+            return self._send(200, result['xlsx'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                              f'{name}.xlsx')
+        elif format != 'zip':
+            raise ServiceError(400, f'format needs to be zip, pdf or xlsx, not {format}')
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            # the PDF and the workbook are compressed already
+            archive.writestr(f'{name}.pdf', result['pdf'])
+            archive.writestr(f'{name}.xlsx', result['xlsx'])
+            archive.writestr('preflight.json', json.dumps(result['report'].to_dict(), indent=1),
+                             compress_type=zipfile.ZIP_DEFLATED)
+        return self._send(200, buffer.getvalue(), 'application/zip', f'{name}.zip')
+
+    def _send_json(self, status, body, started=False):
+        return self._send(status, json.dumps(body, indent=1).encode(), 'application/json', started=started)
+
+    def _send(self, status, content, content_type, filename=None, started=False):
+        "sends `content` with `status` and returns the status"
+        if not started:
+            self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        if filename is not None:
+            # plain ASCII for old clients, the name itself as RFC 5987 parameter
+            fallback = filename.encode('ascii', 'replace').decode().replace('?', '_').replace('"', '_')
+            self.send_header('Content-Disposition',
+                             f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{urllib.parse.quote(filename)}')
+        self.end_headers()
+        self.wfile.write(content)
+        return status
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def _init_worker(backend):
+    "raise errors instead of opening dialogs, and parse the templates of both degrees"
+    from scheintool import pipeline
+
+    settings.interactive = False
+    for degree in ['bachelor', 'master']:
+        pipeline.warm_up(degree, backend)
+
+
+def _ready():
+    "returns once the worker process is started"
+    return True
+
+
+def _generate(lsf, grades, config, backend):
+    "writes certificates and grade table in a worker process, see `Server.generate`"
+    stages = {}
+    t0 = time.perf_counter()
+    data, course_info = settings.merge_course_data(lsf, grades, config)
+    stages['merge'] = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_file = Path(tmp) / 'certificates.pdf'
+
+        t0 = time.perf_counter()
+        settings.fill_certificate(data, pdf_file, degree=config.get('mb', 'master'), backend=backend, course=course_info)
+        stages['fill_certificate'] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        settings.write_grade_table(pdf_file.with_suffix('.xlsx'), data, course_info)
+        stages['write_grade_table'] = time.perf_counter() - t0
+
+        return {
+            'pdf': pdf_file.read_bytes(),
+            'xlsx': pdf_file.with_suffix('.xlsx').read_bytes(),
+            'students': len(data),
+            'certificates': int((data['BENB'] == 'BE').sum()),
+            'stages': stages,
+        }
+
+
+def post(url, config, lsf, grades, name='certificates', format='zip', timeout=600):
+    """Sends a course to a running service and returns the response.
+
+    Parameters
+    ----------
+    url : str
+        the address of the service, e.g. 'http://127.0.0.1:8765'
+    config, lsf, grades : str | path
+        the course settings as saved by the GUI, the LSF export and the
+        grades
+    name : str, optional
+        the name of the outputs
+    format : str, optional
+        'zip' for certificates, grade table and report, or 'pdf' or 'xlsx'
+    timeout : float, optional
+        in s
+
+    Returns
+    -------
+    int, bytes
+        the HTTP status and the content of the response, a JSON error for
+        status codes other than 200
+    """
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for key, filename in [('config', config), ('lsf', lsf), ('grades', grades)]:
+        filename = Path(filename)
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"; filename="{filename.name}"\r\n'
+                   'Content-Type: application/octet-stream\r\n\r\n'.encode())
+        body.write(filename.read_bytes())
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+
+    query = urllib.parse.urlencode({'name': name, 'format': format})
+    request = urllib.request.Request(f'{url}/generate?{query}', data=body.getvalue(), method='POST',
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as err:
+        return err.code, err.read()
+
+
+def main(args):
+    "runs the `serve` command until it is interrupted, returns the exit code"
+    server = Server(('127.0.0.1', args.port), jobs=args.jobs, queue=args.queue, rosters=args.rosters, backend=args.backend)
+    print(f'serving on {server.url} with {args.jobs} workers, metrics on {server.url}/metrics', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
@@ -1,25 +1,20 @@
 import platform as ptf
-import tkinter as tk
-from tkinter import messagebox
 from datetime import datetime
 from pathlib import Path
 import sys
 import os
 import re
-import yaml
+import csv
 import io
 import warnings
+import threading
+import contextlib
 import subprocess
 
-import xlsxwriter
-import pandas as pd
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import cm
+from scheintool.instrument import tracer, traced
 
-import PyPDF2
-
-from babel.dates import format_date
+# pandas, reportlab, PyPDF2, xlsxwriter, babel, yaml and tkinter are imported
+# where they are needed, so that the GUI can start without loading them
 
 # determine the system we are on
 
@@ -46,10 +41,60 @@ fields = [
     ['examdate', 'Date of exam', f'{currentDay}.{currentMonth}.{currentYear}'],
 ]
 
+# date and place of birth are given as "01.02.2003 in München"
+
+dob_pattern = re.compile(r'(?P<dob>.*?)\sin\s(?P<pob>.*?)(?:\sin\s.*)?\Z', re.DOTALL)
+
+# if False, errors are raised instead of shown in a dialog, e.g. for batch runs
+
+interactive = True
+
+# if set, `show_error` calls this with title and message instead of opening a
+# dialog, e.g. to pass the errors of a background thread to the GUI
+
+error_handler = None
+
+# if set, `get_libreoffice_exec` calls this (without arguments) to ask for the
+# libreoffice executable instead of opening a window, e.g. to ask from a
+# background thread through the GUI
+
+path_handler = None
+
 # define helper functions
 
 
+class Cancelled(Exception):
+    "raised by a progress callback to stop `fill_certificate` or `write_grade_table`"
+
+
+class ErrorShown(RuntimeError):
+    "raised by `show_error` after the error was passed to `error_handler`, so it is not shown again"
+
+
+def show_error(title, message, fatal=True):
+    """Shows an error dialog, or raises a RuntimeError if not `interactive`.
+
+    If `error_handler` is set, the error is passed to it, and an
+    `ErrorShown` is raised to stop the calling thread. Errors that are not
+    `fatal` (the caller can go on, e.g. by skipping some rows) do not stop
+    it, if not `interactive` they are only warned about.
+    """
+    if not interactive:
+        if not fatal:
+            warnings.warn(f'{title}: {message}')
+            return
+        raise RuntimeError(f'{title}: {message}')
+    if error_handler is not None:
+        error_handler(title, message)
+        if fatal:
+            raise ErrorShown(f'{title}: {message}')
+        return
+    from tkinter import messagebox
+    messagebox.showerror(title=title, message=message)
+
+
 def read_config(config_file):
+    import yaml
     with open(config_file) as fh:
         config = yaml.safe_load(fh)
     return config
@@ -57,6 +102,7 @@ def read_config(config_file):
 
 def write_config(config):
     "for windows systems, we avoid the newline at the end"
+    import yaml
     with open(config_file, 'w') as f:
         dump = yaml.dump(config)
         if dump.endswith('\n'):
@@ -83,6 +129,7 @@ def guess_path(platform):
 
 
 def ask_for_path():
+    import tkinter as tk
     window = tk.Tk(className='Schein Tool')
     label = tk.Label(text="enter executable of libreoffice (soffice.bin, soffice.exe, ...)")
     entry = tk.Entry()
@@ -102,37 +149,157 @@ def ask_for_path():
     return exec
 
 
+def read_course_config(filename, encoding='utf8'):
+    """Reads the course settings as stored by the GUI.
+
+    Parameters
+    ----------
+    filename : str | path
+        CSV file with one `name,value` pair per line, where the names are
+        the ones in `fields` or `type`, `mb` (the degree) and `semester`
+
+    Returns
+    -------
+    dict
+        the settings, `type` converted to int
+    """
+    known = [field[0] for field in fields] + ['type', 'mb', 'semester']
+    course = {}
+    with open(filename, 'r', encoding=encoding) as fh:
+        for row in csv.reader(fh):
+            if not row:
+                continue
+            if row[0] not in known:
+                raise ValueError(f'unknown entry: {row[0]}')
+            course[row[0]] = row[1]
+
+    if 'type' in course:
+        course['type'] = int(course['type'])
+
+    return course
+
+
+@traced('merge_course_data')
+def merge_course_data(lsf, grades, course):
+    """Combines roster and grades into the table of students, and the course settings into one record.
+
+    The students are sorted in German order (see `scheintool.model`), which
+    all writers use. The course is not copied into the table, it is passed
+    to the writers separately. Check the inputs first with
+    `scheintool.preflight.check`.
+
+    Parameters
+    ----------
+    lsf : DataFrame
+        the roster as returned by `read_LSF`
+    grades : DataFrame
+        the grades as returned by `read_grades`
+    course : dict
+        the values of `fields` (defaults are used for missing ones), the
+        lecture `type` (1-4) and the `semester` ('SS' or 'WS')
+
+    Returns
+    -------
+    data : DataFrame
+        students that have a grade, with their columns needed for
+        `fill_certificate` and `write_grade_table`
+    course_info : dict
+        the course information, passed as `course` to `fill_certificate`
+        and as `course_info` to `write_grade_table`
+    """
+    from scheintool import model, preflight
+
+    lsf, grades = preflight.align_keys(lsf, grades)
+    data = model.sorted_students(lsf.merge(grades[['MNR', 'grade', 'grade_text', 'BENB']], on='MNR'))
+
+    course_info = {name: course.get(name, default) for name, title, default in fields}
+    course_info.update(place='München', type=course['type'], semester=course['semester'], beisitzer='')
+
+    tracer.annotate(rows=len(data))
+    return data, course_info
+
+
+@traced('read_grades')
 def read_grades(filename):
     """Read grades from csv or xlsx file.
 
     Parameters
     ----------
     filename : string | path
-        Try to read "matrikelnumer" or MNR and "grade"|"grades"|"note" from file
+        Try to read "matrikelnumer" or MNR and "grade"|"grades"|"note" from
+        file, in any case, see `scheintool.schema.grades`. Other columns are
+        not read.
 
+    Returns
+    -------
+    DataFrame
+        the grades, with the columns added by `normalize_grades`. Rows
+        without matrikel number or grade are removed, rows with matrikel
+        numbers or grades that cannot be parsed are shown (see `show_error`)
+        and removed. These are listed in `attrs['dropped']`, as
+        `[column, MNR, value]`, and reported by `scheintool.preflight.check`.
 
     """
+    from scheintool import schema
+
     filename = Path(filename)
-    if filename.suffix.lower() == '.csv':
-        grades = pd.read_csv(filename)
-    elif filename.suffix.lower() == '.xlsx':
-        grades = pd.read_excel(filename)
-    else:
-        messagebox.showerror(title="Unknown file type", message="File type needs to be 'csv' or 'xlsx'.")
+    if filename.suffix.lower() not in ['.csv', '.xlsx']:
+        show_error(title="Unknown file type", message="File type needs to be 'csv' or 'xlsx'.")
+
+    grades = schema.grades.read(filename)
+    grades = schema.grades.convert(grades.dropna())
 
-    # now normalize column names
+    # parse the grades once, for all writers
 
-    for col in grades.columns:
-        col = str(col)
-        if col.lower() in ['note', 'noten', 'grade', 'grades'] and 'grade' not in grades.columns:
-            grades.rename(columns={col.lower(): 'grade'}, inplace=True)
-        elif col.lower() in ['mnr', 'matrikelnummer', 'matrikelnumber']:
-            grades.rename(columns={col.lower(): 'MNR'}, inplace=True)
+    raw = grades['grade']
+    grades = normalize_grades(grades)
+    invalid = grades['grade'].isna()
+    if invalid.any():
+        grades.attrs['dropped'] = grades.attrs.get('dropped', []) + [
+            ['grade', int(mnr), grade] for mnr, grade in zip(grades['MNR'][invalid], raw[invalid])]
+        report = '\n'.join(f'{mnr}: "{grade}"' for mnr, grade in zip(grades['MNR'][invalid], raw[invalid]))
+        show_error(title="Invalid grades", message=f"Could not read these grades:\n{report}", fatal=False)
 
-    return grades.dropna()
+    tracer.annotate(rows=int((~invalid).sum()))
+    return grades[~invalid]
 
 
-def read_LSF(filename):
+def normalize_grades(grades):
+    """Parses the grades once, so that all writers can use the result.
+
+    The column `grade` is converted to float (a decimal comma is accepted),
+    `grade_text` is the grade formatted for printing, and `BENB` is 'BE'
+    (passed, 4.0 or better) or 'NB' (failed). Grades that cannot be parsed
+    become NaN and count as failed.
+
+    Parameters
+    ----------
+    grades : DataFrame
+        table with a column `grade`
+
+    Returns
+    -------
+    DataFrame
+        a copy of `grades` with the three columns set
+    """
+    import numpy as np
+    import pandas as pd
+
+    # there are only a few different grades: parse and format each of them once
+    codes, uniques = pd.factorize(grades['grade'])
+    parsed = pd.to_numeric(pd.Series(uniques, dtype=object).astype(str).str.strip().str.replace(',', '.', regex=False), errors='coerce')
+    texts = {code: f'{value:.1f}' for code, value in enumerate(parsed) if not np.isnan(value)}
+
+    grade = pd.Series(np.append(parsed.to_numpy(dtype=float), np.nan)[codes], index=grades.index)
+    return grades.assign(
+        grade=grade,
+        grade_text=pd.Series(codes, index=grades.index).map(texts).astype('category'),
+        BENB=grade.le(4.0).map({True: 'BE', False: 'NB'}).astype('category'),
+    )
+
+
+@traced('read_LSF')
+def read_LSF(filename, use_cache=True):
     """Read grades from csv or xlsx file.
 
     Parameters
@@ -140,56 +307,116 @@ def read_LSF(filename):
     filename : string | path
         data file to read from
 
+    use_cache : bool
+        if True, the normalized table is taken from the roster cache if the
+        same file was read before, and stored there otherwise
+
 
     """
+    from scheintool import schema
+
+    filename = Path(filename)
+
+    key = None
+    if use_cache and filename.is_file():
+        key = get_roster_cache().key(filename)
+        LSF = get_roster_cache().get(key)
+        if LSF is not None:
+            tracer.annotate(rows=len(LSF), cached=True)
+            return LSF
+
+    # only the columns of `schema.lsf` are read, and renamed
+
     try:
-        filename = Path(filename)
         if filename.suffix.lower() == '.csv':
-            LSF = pd.read_csv(filename)
+            LSF = schema.lsf.read(filename)
         elif filename.suffix.lower() == '.xlsx':
-            LSF = pd.read_excel(filename, skiprows=[0, 1])  # , usecols=range(8), dtype=str)
+            LSF = schema.lsf.read(filename, skiprows=[0, 1])
         elif filename.suffix.lower() == '.xls':
-            LSF = read_LSF(convert_xls_xsls(filename, libreoffice_executable=libreoffice_exec))
-            return LSF
+            try:
+                table = schema.lsf.read_table(filename, skiprows=[0, 1])
+            except ValueError as err:
+                # not a BIFF8 file the native reader can handle (text, BIFF5, encrypted, ...): let libreoffice convert it
+                warnings.warn(f'could not read XLS file directly ({err}), converting it with libreoffice')
+                table = schema.lsf.read_table(get_conversion_pool().convert(filename), skiprows=[0, 1])
+            # missing columns are reported, not converted again
+            LSF = schema.lsf.rename(table)
         else:
-            messagebox.showerror(title="Unknown file type", message="File type needs to be 'csv' or 'xlsx'.")
+            show_error(title="Unknown file type", message="File type needs to be 'csv' or 'xlsx'.")
+    except ErrorShown:
+        raise
     except Exception as err:
-        messagebox.showerror(title="Could not load LSF file", message=f"Filename: {filename}\nError:\n {err}")
+        key = None
+        show_error(title="Could not load LSF file", message=f"Filename: {filename}\nError:\n {err}")
 
-    # now normalize column names
-
-    renaming = {
-        'Mtknr': 'MNR',
-        'Nachname': 'lastname',
-        'Vorname': 'firstname',
-        'Geschlecht': 'gender',
-        'Anschrift': 'address',
-        'Geburtstag/-ort': 'dob',
-        'E-Mail': 'email',
-        'Studiengänge': 'major'}
+    # reformat the major (get rid of stuff behind the brackets), split dob in place and date
 
     try:
-        LSF.rename(columns=renaming, inplace=True)
+        LSF, errors = normalize_LSF(LSF)
+        LSF = schema.lsf.convert(LSF)
     except Exception as err:
-        messagebox.showerror(title="Could not rename entries", message=f"Error:\n {err}")
+        key = None
+        show_error(title="Error", message=f"Could not set major or date/place of birth:\n {err}")
+    else:
+        if errors:
+            key = None
+            report = '\n'.join(errors[:20]) + (f'\n... and {len(errors) - 20} more' if len(errors) > 20 else '')
+            show_error(title="Error", message=f"Could not set major or date/place of birth for {len(errors)} entries:\n{report}",
+                       fatal=False)
 
-    # reformat the major (get rid of stuff behind the brackets), split dob in place and date
+    # only store tables that were read without errors
 
-    try:
-        LSF['major'] = LSF.apply(lambda row: row['major'].split('(')[0], axis=1)
-        LSF['pob'] = LSF.apply(lambda row: re.split(r'\sin\s', row.dob)[1], axis=1)
-        LSF['dob'] = LSF.apply(lambda row: re.split(r'\sin\s', row.dob)[0], axis=1)
-    except Exception as err:
-        messagebox.showerror(title="Error", message=f"Could not set major or date/place of birth:\n {err}")
+    if key is not None:
+        get_roster_cache().put(key, LSF)
 
+    tracer.annotate(rows=len(LSF), cached=False)
     return LSF
 
 
+def normalize_LSF(LSF):
+    """Strips the details from the major and splits the date and place of birth.
+
+    `major` keeps everything before the first bracket, `dob` ("01.02.2003 in
+    München") is split into `dob` and `pob`. All rows are processed at once.
+
+    Parameters
+    ----------
+    LSF : DataFrame
+        LSF table with renamed columns, needs `major` and `dob`
+
+    Returns
+    -------
+    DataFrame, list
+        the normalized table, and a list with an error message for every row
+        that could not be normalized. In those rows, `major` or `pob` are NaN.
+    """
+    import pandas as pd
+
+    major = LSF['major'].str.partition('(')[0]
+    birth = LSF['dob'].str.extract(dob_pattern)
+
+    errors = []
+    label = LSF['MNR'] if 'MNR' in LSF else pd.Series(LSF.index, index=LSF.index)
+    for i in LSF.index[major.isna()]:
+        errors.append(f'{label[i]}: no major given')
+    for i in LSF.index[birth['pob'].isna()]:
+        errors.append(f'{label[i]}: cannot split date/place of birth "{LSF.at[i, "dob"]}"')
+
+    LSF['major'] = major
+    LSF['pob'] = birth['pob']
+    LSF['dob'] = birth['dob'].fillna(LSF['dob'])
+
+    return LSF, errors
+
+
+@traced('convert_xls_xsls')
 def convert_xls_xsls(filename, libreoffice_executable=None, encoding='latin-1'):
     """Converts a LSF-generated XLS table to a modern XLSX format.
 
     Conversion uses `soffice` by libreoffice, by default located in the `LibreOffice.app` on mac.
-    Specify the executable as keyword otherwise.
+    Specify the executable as keyword otherwise. Exports that are text are
+    sanitized first, see `scheintool.convert.sanitize`, binary files are
+    converted as they are. To convert many files, use `get_conversion_pool`.
 
     Parameters
     ----------
@@ -197,12 +424,17 @@ def convert_xls_xsls(filename, libreoffice_executable=None, encoding='latin-1'):
         path to the XLS file to be converted
     libreoffice_executable : str, optional
         path to the libreoffice executable used for the conversion, by default None
+    encoding : str, optional
+        encoding of exports that are text, by default latin-1
 
     Returns
     -------
     str
         The filename of the converted file. Returns `None` if there was an error.
     """
+    import tempfile
+    from scheintool.convert import sanitized
+
     if not Path(filename).is_file():
         raise FileNotFoundError('input file does not exist')
     if libreoffice_executable is None:
@@ -210,18 +442,16 @@ def convert_xls_xsls(filename, libreoffice_executable=None, encoding='latin-1'):
 
     outdir = str(Path(filename).expanduser().parent)
 
-    # non-breaking spaces can cause issues: remove them
-    tempfile = Path(filename)
-    tempfile = tempfile.with_name(tempfile.stem + '_' + tempfile.suffix)
+    # non-breaking spaces can cause issues: convert a copy without them,
+    # which has the same name, so the output is named like the input
     res = None
-    try:
-        with open(filename, 'r', encoding=encoding) as fh:
-            content = fh.read()
-            content = re.sub(r'\s', ' ', content)
-        with open(tempfile, mode='w', encoding=encoding) as fh:
-            fh.write(content)
-
-        result = subprocess.run([libreoffice_executable, '--convert-to', 'xlsx', '--headless', filename, '--outdir', outdir], capture_output=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            source = sanitized(filename, tmp, encoding=encoding)
+            result = subprocess.run([libreoffice_executable, '--convert-to', 'xlsx', '--headless', str(source), '--outdir', outdir], capture_output=True)
+        except OSError as err:
+            warnings.warn(f'XLS->XLSX conversion failed. Message is : {err}')
+            return None
 
         if result.returncode == 0:
             # return the output filename:
@@ -232,17 +462,17 @@ def convert_xls_xsls(filename, libreoffice_executable=None, encoding='latin-1'):
                     res = res.decode()
             else:
                 # if there is no output, we construct the result name
-                res = Path(outdir) / filename
+                res = Path(outdir) / Path(filename).name
                 res = str(res.with_suffix('.xlsx').absolute())
         else:
-            warnings.warn('XLS->XLSX conversion failed. Message is : ' + result.stderr)
-    finally:
-        if tempfile.is_file():
-            tempfile.unlink()
-        return res
+            warnings.warn('XLS->XLSX conversion failed. Message is : ' + result.stderr.decode(errors='replace'))
+
+    return res
 
 
-def fill_certificate(data, filename, degree='master'):
+@traced('fill_certificate')
+def fill_certificate(data, filename, degree='master', workers=1, progress=None, backend='form',
+                     incremental=False, course=None, pool=None):
     """Fills out an LMU master or bachelor certificate.
 
     For every row in the table `data`, a certificate is created and this is
@@ -253,10 +483,15 @@ def fill_certificate(data, filename, degree='master'):
         - major: the subject in which the student is enrolled
         - firstname: first name
         - lastname: last name
-        - place: current city
         - MNR: matrikel number
-        - DOB: date of birth
-        - POB: place of birth
+        - dob: date of birth
+        - pob: place of birth
+        - grade: the grade
+        - grade_text, BENB: formatted grade and pass/fail, see
+          `normalize_grades`. Computed from `grade` if missing.
+
+        and, if `course` is not given, those of the course:
+        - place: current city, by default München
         - semester: WS or SS
         - year
         - title_en : english name of lecture
@@ -264,7 +499,6 @@ def fill_certificate(data, filename, degree='master'):
         - lecturer : lecturers name
         - ECTS: number of ECTS
         - SWS: number of semester hours
-        - grade: the grade
         - examdate: date of the exam
         - type: 1: "Vorlesung mit Übung"
                 2: "Vorlesung"
@@ -278,107 +512,266 @@ def fill_certificate(data, filename, degree='master'):
     degree : str
         'master', or 'bachelor'
 
+    workers : int
+        number of processes used to render the certificates. For more than
+        one worker, the sorted table is split into chunks which are rendered
+        in parallel and then joined in the same order.
+
+    progress : callable
+        if given, it is called as `progress(done, total)` with the number of
+        rendered certificates. If it raises an exception (e.g. `Cancelled`),
+        rendering stops and no file is written.
+
+    backend : str | Backend
+        how the certificates are rendered: 'merge', 'form', 'direct' (see
+        `scheintool.backends`), or 'auto' to use the backend that is fastest
+        on the first rows of `data`. A `Backend` instance can also be passed.
+
+    incremental : bool
+        if True, a manifest is stored next to `filename`, and if `filename`
+        was written like this before, only new or changed certificates are
+        rendered, see `scheintool.incremental`. `progress` then counts only
+        the rendered certificates.
+
+    course : dict | scheintool.model.Course
+        the course of all students, e.g. the `course_info` returned by
+        `merge_course_data`. Columns of the course in `data` are used where
+        they are not empty.
+
+    pool : concurrent.futures.ProcessPoolExecutor
+        if given and `workers` > 1, the chunks are rendered by its processes
+        instead of new ones, e.g. by processes that were started before any
+        other thread, see `scheintool.pipeline`. It is not shut down.
+
     """
-    # define sizes: we use a fixed font size and an x and y offset in cm. Then
-    # we scale all lengths with the factor `scale` such that we can rescale
-    # things easily.
+    import PyPDF2
+    from scheintool import backends
 
-    today = format_date(datetime.today(), format="long", locale='de_DE')
+    data, backend = _prepare_certificates(data, degree, backend, course)
+    tracer.annotate(rows=len(data), backend=backend.name, workers=workers)
+    progress = tracer.latencies('certificate', progress)
 
-    fontsize = 12
-    x_off = 2.54 * cm      # left margin
-    y_off = 0.761 * A4[1]  # distance from bottom to first line
-    xscale = cm             # scale for the horizontal direction
-    yscale = 0.98 * cm      # scale for the vertical direction
+    if incremental:
+        from scheintool import incremental as inc
 
-    if degree not in ['bachelor', 'master']:
-        raise ValueError('degree must be bachelor or master')
+        # re-use the pages of certificates whose entries did not change
 
-    def print(x, y, text):
-        can.drawString(x * xscale, - y * yscale, str(text))
+        hashes = inc.certificate_hashes(data, backends.today_text(), course)
+        template = inc.file_hash(backends.template_file(degree))
+        manifest = inc.read_manifest(filename, degree=degree, template=template)
+        if manifest is not None and manifest['certificates'] == hashes:
+            return
 
-    # get the schein
+        pages = inc.old_pages(filename, manifest, hashes)
+        todo = [page is None for page in pages]
+        tracer.annotate(rendered=sum(todo))
 
-    cert = str(docs_dir / f'schein_{degree}.pdf')
+        if any(todo):
+            buffer = io.BytesIO()
+            _render_certificates(data[todo], degree, backend, workers, progress, course, pool).write(buffer)
+            new_pages = iter(PyPDF2.PdfReader(buffer).pages)
+            pages = [next(new_pages) if page is None else page for page in pages]
 
-    # create the output PDF file
+        output = inc.splice(pages, degree)
+    else:
+        output = _render_certificates(data, degree, backend, workers, progress, course, pool)
 
-    output = PyPDF2.PdfWriter()
+    # finally, write "output" to a real file
+    outputStream = open(filename, "wb")
+    output.write(outputStream)
+    outputStream.close()
 
-    # we loop over each dictionary
+    if incremental:
+        inc.write_manifest(filename, degree=degree, template=template, certificates=hashes)
 
-    for i, row in data.sort_values('lastname').iterrows():
 
-        # skip failed (worse than 4.0)
+def _prepare_certificates(data, degree, backend, course=None):
+    "returns the sorted rows of `data` that get a certificate, and the backend to render them"
+    from scheintool import backends, model
 
-        if float(str(row.grade).replace(',', '.')) > 4.0:
-            continue
+    if degree not in ['bachelor', 'master']:
+        raise ValueError('degree must be bachelor or master')
 
-        packet = io.BytesIO()
+    if 'BENB' not in data:
+        data = normalize_grades(data)
 
-        # create a new PDF with Reportlab
+    # skip failed (worse than 4.0)
 
-        can = canvas.Canvas(packet, pagesize=A4)
-        can.setFont("Helvetica", fontsize)
+    data = model.sorted_students(data)
+    data = data[data['BENB'] == 'BE']
 
-        can.translate(x_off, y_off)
+    if backend == 'auto':
+        backend = backends.fastest(data, degree, course=course)
+    else:
+        backend = backends.get_backend(backend)
 
-        print(6.75, 0, row.major)  # noqa
-        print(2,    1, row.firstname + ' ' + row.lastname)  # noqa
-        print(1,    2, row.place)  # noqa
-        print(11.3, 2, row.MNR)  # noqa
-        print(2.5,  3, row.dob)  # noqa
-        print(7.0,  3, row.pob)  # noqa
+    return data, backend
 
-        if row.semester == 'SS':
-            print(1.425, 4.2, 'x')
-        elif row.semester == 'WS':
-            print(3.75, 4.2, 'x')
-        else:
-            raise ValueError('semester needs to be SS or WS')
 
-        print(7.5, 4.2, row.year)
+@traced('fill_certificate_files')
+def fill_certificate_files(data, target, degree='master', workers=1, progress=None, backend='direct', threads=4,
+                           course=None, pool=None):
+    """Writes the certificate of every student into its own PDF file.
 
-        print(3, 6.75, row.title_de)
-        print(3, 8.75, row.title_en)
+    The files are called `<MNR>_<lastname>.pdf`. They are written into the
+    directory `target`, or, if `target` ends in `.zip`, directly into a ZIP
+    archive without being stored on disk first. Every file contains the
+    template, which is parsed only once per process.
 
-        print(1.5, 10.75, row.lecturer)
+    Parameters
+    ----------
+    data : DataFrame
+        the table of students, see `fill_certificate`
+    target : str | path
+        output directory (created if needed) or ZIP file
+    degree, workers, progress, course, pool
+        see `fill_certificate`
+    backend : str | Backend
+        see `fill_certificate`. The default `direct` backend writes the files
+        without building a PDF object tree for each of them, which is about
+        40 times faster than the others.
+    threads : int
+        number of threads that write the files into a directory
 
-        print(10, 11.75, row.SWS)
-        print(14, 11.75, row.ECTS)
-        print(8, 12.75, row.grade)
+    Returns
+    -------
+    dict
+        number of `files`, the `time` it took in seconds and the throughput
+        in `files_per_s`
+    """
+    import time
+    import zipfile
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+    t0 = time.perf_counter()
+    data, backend = _prepare_certificates(data, degree, backend, course)
+
+    names = _certificate_file_names(data)
+    total = len(names)
+    tracer.annotate(rows=total, backend=backend.name, workers=workers)
+    progress = tracer.latencies('certificate file', progress)
+
+    if workers > 1 and total > 1:
+        # render chunks in worker processes, the files of a chunk arrive together
+
+        n_chunks = min(4 * workers, total)
+        bounds = [total * i // n_chunks for i in range(n_chunks + 1)]
+        executor = pool if pool is not None else ProcessPoolExecutor(max_workers=workers)
+        futures = [executor.submit(_render_files, data.iloc[start:stop], degree, backend, course)
+                   for start, stop in zip(bounds[:-1], bounds[1:])]
+        files = (pdf for future in futures for pdf in future.result())
+    else:
+        executor = None
+        futures = []
+        files = backend.render_files(data, degree, course=course)
 
-        print(5, 13.75, row.examdate)
+    try:
+        if Path(target).suffix.lower() == '.zip':
+            # PDFs are compressed already, so the files are only stored
+            with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_STORED) as archive:
+                for n, (name, pdf) in enumerate(zip(names, files), start=1):
+                    archive.writestr(name, pdf)
+                    if progress is not None:
+                        progress(n, total)
+        else:
+            target = Path(target)
+            target.mkdir(parents=True, exist_ok=True)
+            with ThreadPoolExecutor(max_workers=threads) as writers:
+                writes = []
+                for n, (name, pdf) in enumerate(zip(names, files), start=1):
+                    writes.append(writers.submit((target / name).write_bytes, pdf))
+                    if progress is not None:
+                        progress(n, total)
+                for write in writes:
+                    write.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        if executor is not None and executor is not pool:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - t0
+    return {'files': total, 'time': elapsed, 'files_per_s': total / elapsed if elapsed > 0 else float('inf')}
+
+
+def _certificate_file_names(data):
+    "returns the file names `<MNR>_<lastname>.pdf` of the rows of `data`, made unique if needed"
+    names = []
+    seen = set()
+    for mnr, lastname in zip(data['MNR'], data['lastname']):
+        stem = re.sub(r'[\\/:*?"<>|\s]+', '_', f'{mnr}_{lastname}'.strip())
+        name = f'{stem}.pdf'
+        i = 1
+        while name in seen:
+            i += 1
+            name = f'{stem}_{i}.pdf'
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _render_files(data, degree, backend, course):
+    "renders the single certificate PDFs of `data` in a worker process"
+    return list(backend.render_files(data, degree, course=course))
+
+
+def _render_certificates(data, degree, backend, workers, progress, course=None, pool=None):
+    "renders the certificates of `data` with `backend`, in parallel (in `pool`, if given) if `workers` > 1"
+    import PyPDF2
+
+    if workers > 1 and len(data) > 1:
+        # split into contiguous chunks, so joining them keeps the order
+
+        # use more chunks than workers, so that progress can be reported
+
+        n_chunks = min(4 * workers, len(data))
+        bounds = [len(data) * i // n_chunks for i in range(n_chunks + 1)]
+        chunks = [data.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+        from concurrent.futures import ProcessPoolExecutor
+        from scheintool import incremental
+
+        pages = []
+        with contextlib.nullcontext(pool) if pool is not None else ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_fill_chunk, chunk, degree, backend, course) for chunk in chunks]
+            try:
+                for future, stop in zip(futures, bounds[1:]):
+                    pages.extend(PyPDF2.PdfReader(io.BytesIO(future.result())).pages)
+                    if progress is not None:
+                        progress(stop, len(data))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        # every chunk has its own copy of the template, the pages are
+        # pointed to a single one
+        output = incremental.splice(pages, degree)
+    else:
+        output = backend.render(data, degree, progress=progress, course=course)
 
-        print(5.05, 14.16 + row.type * 0.82, 'x')
+    return output
 
-        print(2.5, 19, row.date or today)
 
-        can.save()
+def _fill_chunk(data, degree, backend, course):
+    "renders the certificates of `data` in a worker process and returns the PDF as bytes"
+    buffer = io.BytesIO()
+    backend.render(data, degree, course=course).write(buffer)
+    return buffer.getvalue()
 
-        # move to the beginning of the StringIO buffer
-        packet.seek(0)
-        new_pdf = PyPDF2.PdfReader(packet)
 
-        # add the "watermark" (which is the new pdf) on the existing page
-        # we need to re-open the schein otherwise, we will overwrite all data
-        # on all the pdfs
-        schein = PyPDF2.PdfReader(open(cert, 'rb'))
-        page = schein.pages[0]
-        page.merge_page(new_pdf.pages[0])
-        output.add_page(page)
+# larger grade tables are written in the constant memory mode of xlsxwriter
 
-    # finally, write "output" to a real file
-    outputStream = open(filename, "wb")
-    output.write(outputStream)
-    outputStream.close()
+constant_memory_rows = 10000
 
 
-def write_grade_table(fname, data, course_info):
+@traced('write_grade_table')
+def write_grade_table(fname, data, course_info, constant_memory=None, progress=None, incremental=False):
     """Writes the grades to Excel file following the LMU physics template.
 
     fname : str
-        file name to write to
+        file name to write to. If it ends in `.csv`, the same table is
+        written as plain CSV file instead.
 
     data : DataFrame
         needs to contain:
@@ -387,6 +780,7 @@ def write_grade_table(fname, data, course_info):
         - firstname
         - major
         - grade
+        - grade_text, BENB (see `normalize_grades`, computed if missing)
         - examdate
 
         if it does not contain `beisitzer` or `examdate`, those are
@@ -401,11 +795,83 @@ def write_grade_table(fname, data, course_info):
         - lecturer: lecturer
         - beisitzer: beisitzer
 
+    constant_memory : bool
+        if True, xlsxwriter writes every row to disk as soon as the next one
+        is started, instead of keeping the whole sheet in memory. The empty
+        grey area next to the course info is then not a merged cell, unlike
+        in the template. By default, it is only used for tables with more
+        than `constant_memory_rows` students.
+
+    progress : callable
+        if given, it is called as `progress(done, total)` with the number of
+        written students, every 100 students and at the end. If it raises an
+        exception (e.g. `Cancelled`), writing stops and an existing `fname`
+        is left as it was.
+
+    incremental : bool
+        if True, a manifest is stored next to `fname`, and the file is only
+        written if its content changed since the last time, see
+        `scheintool.incremental`.
+
+    Returns
+    -------
+    bool
+        False if the table was unchanged and not written again, else True
+
     """
+    info, header, columns = _grade_table_content(data, course_info)
+    if constant_memory is None:
+        constant_memory = len(columns[0]) > constant_memory_rows
+    tracer.annotate(rows=len(columns[0]))
+    progress = tracer.latencies('grade table row', progress)
+
+    if incremental:
+        from scheintool import incremental as inc
+
+        content = inc.table_hash(info, header, columns, Path(fname).suffix.lower(), constant_memory)
+        if inc.read_manifest(fname, content=content) is not None:
+            return False
+
+    _write_grade_table(fname, info, header, columns, constant_memory=constant_memory, progress=progress)
+
+    if incremental:
+        inc.write_manifest(fname, content=content)
+
+    return True
 
-    # Create a workbook and add a worksheet.
 
-    with xlsxwriter.Workbook(fname) as workbook:
+@contextlib.contextmanager
+def _replacing(fname):
+    """Yields a temporary file next to `fname`, which replaces `fname` only if
+    the block finishes. Otherwise, e.g. if it is cancelled, it is removed and
+    the old `fname` is kept."""
+    fname = Path(fname)
+    temp = fname.with_name(fname.name + '.tmp')
+    try:
+        yield temp
+        os.replace(temp, fname)
+    finally:
+        if temp.exists():
+            temp.unlink()
+
+
+def _write_grade_table(fname, info, header, columns, constant_memory=False, progress=None):
+    "writes the content returned by `_grade_table_content` to `fname`, which is only replaced once the table is complete"
+    with _replacing(fname) as temp:
+        if Path(fname).suffix.lower() == '.csv':
+            _write_grade_csv(temp, info, header, columns, progress=progress)
+        else:
+            _write_grade_xlsx(temp, info, header, columns, constant_memory=constant_memory, progress=progress)
+
+
+def _write_grade_xlsx(fname, info, header, columns, constant_memory=False, progress=None):
+    "writes the grade table as Excel file, see `_write_grade_table`"
+    import xlsxwriter
+
+    # Create a workbook and add a worksheet. Everything is written in order
+    # of the rows, as needed for the constant memory mode.
+
+    with xlsxwriter.Workbook(fname, {'constant_memory': constant_memory}) as workbook:
         worksheet = workbook.add_worksheet()
 
         # Add a bold format to use to highlight cells.
@@ -420,110 +886,201 @@ def write_grade_table(fname, data, course_info):
         worksheet.set_column(4, 5, 10)
         worksheet.set_column(6, 6, 20)
 
-        worksheet.merge_range('C1:G5', '', greyboldnoborder)
-
-        # write course info
+        # write course info, next to it is a grey area
 
-        worksheet.write(0, 0, 'Name der Veranstaltung:', greyboldborder)
-        worksheet.write(1, 0, 'Semester:', greyboldborder)
-        worksheet.write(2, 0, 'Datum der Prüfung:', greyboldborder)
-        worksheet.write(3, 0, '1. Prüfer:', greyboldborder)
-        worksheet.write(4, 0, '2.Prüfer:', greyboldborder)
-
-        worksheet.write(0, 1, course_info['title_de'], greyboldnoborder)
-        worksheet.write(1, 1, course_info['semester'] + course_info['year'], greyboldnoborder)
-        if 'examdate' in course_info:
-            worksheet.write(2, 1, course_info['examdate'], greyboldnoborder)
-        else:
-            worksheet.write(2, 1, 's.u.', greyboldnoborder)
-        worksheet.write(3, 1, course_info['lecturer'], greyboldnoborder)
-
-        if 'beisitzer' in course_info:
-            worksheet.write(4, 1, course_info['beisitzer'], greyboldnoborder)
-        else:
-            worksheet.write(4, 1, 's.u.', greyboldnoborder)
-
-        # Write headers
-
-        worksheet.write(11, 0, 'Matrikelnumber', greyboldborder)
-        worksheet.write(11, 1, 'Nachname', greyboldborder)
-        worksheet.write(11, 2, 'Vorname', greyboldborder)
-        worksheet.write(11, 3, 'Studiengang', greyboldborder)
-        worksheet.write(11, 4, 'Note', greyboldborder)
-        worksheet.write(11, 5, 'BE/NB', greyboldborder)
-        if 'examdate' not in course_info:
-            worksheet.write(11, 6, 'Datum der Prüfung', greyboldborder)
-        if 'beisitzer' not in course_info:
-            worksheet.write(11, 7, 'Beisitzer', greyboldborder)
+        for row, (label, value) in enumerate(info[:5]):
+            worksheet.write(row, 0, label, greyboldborder)
+            worksheet.write(row, 1, value, greyboldnoborder)
+            for col in range(2, 7):
+                worksheet.write_blank(row, col, None, greyboldnoborder)
 
         # mimic template
 
-        worksheet.write('A7', 'Bitte schicken Sie die Liste via Email an')
-        worksheet.write('B8', 'notenlisten@physik.uni-muenchen.de')
-        worksheet.write('A9', 'und eine unterschrieben Liste an')
-        worksheet.write('B10', 'Fakultät für Physik\nPrüfungsamt\nSchellingstr. 4\nD-80799 München', wrap)
-
-        # Start from the first cell. Rows and columns are zero indexed.
-        row = 12
-        col = 0
+        worksheet.write('A7', info[6][0])
+        worksheet.write('B8', info[7][1])
+        worksheet.write('A9', info[8][0])
+        worksheet.write('B10', info[9][1], wrap)
 
-        # Iterate over the data and write it out row by row.
-        for i, pdrow in data.sort_values('lastname').iterrows():
+        # Write headers
 
-            if isinstance(pdrow.grade, str):
-                float_grade = float(pdrow.grade.replace(',', '.'))
-            else:
-                float_grade = pdrow.grade
+        worksheet.write_row(11, 0, header, greyboldborder)
 
-            BENB = float_grade <= 4.0
-            BENB = int(BENB) * 'BE' + int(not BENB) * 'NB'
+        # write the students as whole rows, starting below the header
+        total = len(columns[0])
+        for row, values in enumerate(zip(*columns), start=12):
+            worksheet.write_row(row, 0, values)
+            if progress is not None and ((row - 11) % 100 == 0 or row - 11 == total):
+                progress(row - 11, total)
 
-            worksheet.write(row, col, pdrow.MNR)
-            worksheet.write(row, col + 1, pdrow.lastname)
-            worksheet.write(row, col + 2, pdrow.firstname)
-            worksheet.write(row, col + 3, pdrow.major)
-            worksheet.write(row, col + 4, f'{float_grade:.1f}')
-            worksheet.write(row, col + 5, BENB)
-            if 'examdate' not in course_info:
-                worksheet.write(row, col + 6, pdrow.examdate)
-            if 'beisitzer' not in course_info:
-                worksheet.write(row, col + 7, pdrow.beisitzer)
-            row += 1
+        # in constant memory mode, the earlier rows cannot be changed anymore
+        # and the grey area stays as separate cells, otherwise it is merged
+        if not constant_memory:
+            worksheet.merge_range('C1:G5', '', greyboldnoborder)
 
 
-# continue configuration
+def _grade_table_content(data, course_info):
+    """Returns the content of the grade table.
 
-# set config file name and create if it doesn't exist
+    Returns
+    -------
+    info : list
+        the rows above the header: course info and the instructions
+    header : list
+        the column titles
+    columns : list
+        one list of values per column, the students in German order, see
+        `scheintool.model`
+    """
+    from scheintool import model
+
+    info = [
+        ['Name der Veranstaltung:', course_info['title_de']],
+        ['Semester:', course_info['semester'] + course_info['year']],
+        ['Datum der Prüfung:', course_info.get('examdate', 's.u.')],
+        ['1. Prüfer:', course_info['lecturer']],
+        ['2.Prüfer:', course_info.get('beisitzer', 's.u.')],
+        [],
+        ['Bitte schicken Sie die Liste via Email an'],
+        ['', 'notenlisten@physik.uni-muenchen.de'],
+        ['und eine unterschrieben Liste an'],
+        ['', 'Fakultät für Physik\nPrüfungsamt\nSchellingstr. 4\nD-80799 München'],
+        [],
+    ]
+
+    header = ['Matrikelnumber', 'Nachname', 'Vorname', 'Studiengang', 'Note', 'BE/NB']
+    keys = ['MNR', 'lastname', 'firstname', 'major', 'grade_text', 'BENB']
+    if 'examdate' not in course_info:
+        header.append('Datum der Prüfung')
+        keys.append('examdate')
+    if 'beisitzer' not in course_info:
+        header.append('Beisitzer')
+        keys.append('beisitzer')
+
+    if 'BENB' not in data:
+        data = normalize_grades(data)
+
+    data = model.sorted_students(data)
+    columns = [data[key].tolist() for key in keys]
+
+    return info, header, columns
+
+
+def _write_grade_csv(fname, info, header, columns, progress=None):
+    "streams the grade table row by row into a CSV file"
+    total = len(columns[0])
+    with open(fname, 'w', newline='', encoding='utf-8') as fh:
+        writer = csv.writer(fh)
+        writer.writerows(info)
+        writer.writerow(header)
+        for done, values in enumerate(zip(*columns), start=1):
+            writer.writerow(values)
+            if progress is not None and (done % 100 == 0 or done == total):
+                progress(done, total)
+
+
+# configuration: the config file is only read when it is needed, use
+# `get_config` or the module attributes `config` and `encoding`
 
 
 if platform in ['macos', 'linux']:
     config_file = Path('~').expanduser() / '.config' / 'scheintool.yaml'
-    encoding = 'utf8'
+    cache_dir = Path('~').expanduser() / '.config' / 'scheintool' / 'cache'
+    default_encoding = 'utf8'
 elif platform == 'windows':
-    encoding = 'latin-1'
+    default_encoding = 'latin-1'
     config_file = Path(os.environ['APPDATA']) / 'scheintool' / 'scheintool.yaml'
-    if not config_file.parent.is_dir():
-        config_file.parent.mkdir()
+    cache_dir = config_file.parent / 'cache'
 else:
     raise ValueError('unknown architecture')
 
-if not config_file.is_file():
-    config_file.touch()
+_config = None
+_roster_cache = None
+_conversion_pool = None
+
+
+def get_config():
+    """Returns the configuration, the config file is read (and created) on first use."""
+    global _config
+    if _config is None:
+        if not config_file.is_file():
+            config_file.parent.mkdir(parents=True, exist_ok=True)
+            config_file.touch()
 
-config = read_config(config_file)
+        config = read_config(config_file) or {}
+        if 'encoding' not in config:
+            config['encoding'] = default_encoding
+            write_config(config)
+        _config = config
 
-if config is None or 'libreoffice_exec' not in config or 'encoding' not in config:
-    guess = guess_path(platform)
-    if guess is None:
-        guess = ask_for_path()
-    write_config({
-        'libreoffice_exec': str(guess),
-        'encoding': encoding
-    })
+    return _config
+
+
+def get_libreoffice_exec():
+    """Returns the libreoffice executable.
+
+    It is only looked for (and asked for, if it cannot be found) when
+    it is needed for the first time, and then stored in the config file.
+    From a background thread, it can only be asked for through `path_handler`.
+    """
+    config = get_config()
+    if 'libreoffice_exec' not in config:
+        guess = guess_path(platform)
+        if guess is None:
+            if interactive and path_handler is not None:
+                guess = path_handler()
+            # dialogs can only be opened from the main thread
+            elif interactive and threading.current_thread() is threading.main_thread():
+                guess = ask_for_path()
+            if not guess:
+                raise RuntimeError(f'libreoffice not found, set libreoffice_exec in {config_file}')
+        config['libreoffice_exec'] = str(guess)
+        write_config(config)
+
+    return config['libreoffice_exec']
+
+
+def get_roster_cache():
+    "returns the cache for the normalized LSF rosters"
+    global _roster_cache
+    if _roster_cache is None:
+        from scheintool.cache import RosterCache
+        _roster_cache = RosterCache(cache_dir)
+    return _roster_cache
+
+
+def get_conversion_pool():
+    """Returns the pool of LibreOffice workers that convert `.XLS` files.
+
+    It is created on first use, with `libreoffice_workers` workers (by
+    default 1) as set in the config file, and stopped when the program exits.
+    The profiles of the workers are kept next to the roster cache, so
+    LibreOffice sets them up only once. It is still started for every
+    conversion, see `scheintool.convert`.
+    """
+    global _conversion_pool
+    if _conversion_pool is None:
+        import atexit
+        from scheintool.convert import ConversionPool
+        _conversion_pool = ConversionPool(get_libreoffice_exec(), size=int(get_config().get('libreoffice_workers', 1)),
+                                          profiles=Path(cache_dir).parent / 'libreoffice')
+        atexit.register(_conversion_pool.close)
+    return _conversion_pool
+
+
+def __getattr__(name):
+    "module attributes that are only set up when they are used"
+    if name == 'config':
+        return get_config()
+    elif name == 'encoding':
+        return get_config()['encoding']
+    elif name == 'libreoffice_exec':
+        return get_libreoffice_exec()
+    elif name == 'roster_cache':
+        return get_roster_cache()
+    elif name == 'conversion_pool':
+        return get_conversion_pool()
+    raise AttributeError(f'module {__name__} has no attribute {name}')
 
-config = read_config(config_file)
-libreoffice_exec = config['libreoffice_exec']
-encoding = config['encoding']
 
 # data files
 
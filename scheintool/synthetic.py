@@ -0,0 +1,189 @@
+"""
+Synthetic input data for the tests and the benchmarks: merged tables as
+passed to `fill_certificate`, LSF exports and grade files as read by
+`read_LSF` and `read_grades`, and course settings as saved by the GUI.
+`placed_text` returns the text of the certificates with its positions, to
+compare the outputs of different backends.
+"""
+import random
+
+import pandas as pd
+
+lastnames = ['Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner', 'Becker', 'Schulz', 'Hoffmann',
+             'Özdemir', 'Ängström', 'Zimmermann', 'Braun', 'Krüger', 'Hofmann', 'Hartmann', 'Lange', 'Schmitt', 'Werner']
+firstnames = ['Anna', 'Max', 'Lena', 'Paul', 'Marie', 'Felix', 'Sophie', 'Jonas', 'Laura', 'Lukas', 'Michaela Stephanie']
+places = ['München', 'Berlin', 'Hamburg', 'Köln', 'Minga', 'Frankfurt am Main', 'Wien', 'Zürich']
+streets = ['Hauptstraße', 'Schellingstraße', 'Leopoldstraße', 'Amalienstraße', 'Türkenstraße', 'Bahnhofstraße']
+majors = ['Bachelor Physik (PO 2021)', 'Master Physik (PO 2015)', 'Master Astrophysik (PO 2015)',
+          'Bachelor Physik Plus Meteorologie (PO 2021)']
+
+course = {
+    'year': '2022',
+    'title_en': 'English Title',
+    'title_de': 'Deutscher Titel',
+    'lecturer': 'Prof. Dr. T. Est',
+    'ECTS': '6',
+    'SWS': '4',
+    'date': '21.4.2022',
+    'examdate': '01.01.2022',
+    'place': 'München',
+    'type': 3,
+    'semester': 'WS',
+    'beisitzer': '',
+}
+
+
+def certificate_data(n, seed=0):
+    """Returns a merged table of `n` students as it is passed to `fill_certificate`.
+
+    Parameters
+    ----------
+    n : int
+        number of students
+    seed : int, optional
+        seed of the random number generator, by default 0
+
+    Returns
+    -------
+    DataFrame
+        one row per student with all columns needed by `fill_certificate`
+        and `write_grade_table`
+    """
+    rng = random.Random(seed)
+    grades = ['1.0', '1.3', '1.7', '2.0', '2.3', '2.7', '3.0', '3.3', '3.7', '4.0', '5.0']
+
+    data = pd.DataFrame({
+        'MNR': rng.sample(range(10000000, 99999999), n),
+        'lastname': [rng.choice(lastnames) for i in range(n)],
+        'firstname': [rng.choice(firstnames) for i in range(n)],
+        'major': [rng.choice(majors).split('(')[0] for i in range(n)],
+        'dob': [f'{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1990, 2005)}' for i in range(n)],
+        'pob': [rng.choice(places) for i in range(n)],
+        'grade': [rng.choice(grades) for i in range(n)],
+    })
+
+    for key, value in course.items():
+        data[key] = value
+
+    return data
+
+
+# the columns of an LSF participant export, the ones used by `read_LSF` first
+
+lsf_columns = ['Mtknr', 'Nachname', 'Vorname', 'Geschlecht', 'Anschrift', 'Geburtstag/-ort', 'E-Mail', 'Studiengänge',
+               'Gruppe', 'Modulpriorität', 'Gruppenpriorität', 'Status', 'Belegstudiengang', 'konkr. Titel', 'Belegweg',
+               'Bemerkung', 'Zeitstempel']
+
+
+def lsf_roster(n, seed=0):
+    """Returns a synthetic LSF participant list of `n` students.
+
+    Parameters
+    ----------
+    n : int
+        number of students
+    seed : int, optional
+        seed of the random number generator, by default 0
+
+    Returns
+    -------
+    DataFrame
+        one row per student with the columns `lsf_columns`, as strings
+        except for `Mtknr`
+    """
+    rng = random.Random(seed)
+    lastname = [rng.choice(lastnames) for i in range(n)]
+    firstname = [rng.choice(firstnames) for i in range(n)]
+
+    return pd.DataFrame({
+        'Mtknr': rng.sample(range(10000000, 99999999), n),
+        'Nachname': lastname,
+        'Vorname': firstname,
+        'Geschlecht': [rng.choice('MW') for i in range(n)],
+        'Anschrift': [f'{rng.choice(streets)} {rng.randint(1, 200)}, {rng.randint(10000, 99999)} {rng.choice(places)}' for i in range(n)],
+        'Geburtstag/-ort': [f'{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1990, 2005)} in {rng.choice(places)}'
+                            for i in range(n)],
+        'E-Mail': [f'{first.split()[0][0]}.{last}@campus.lmu.de' for first, last in zip(firstname, lastname)],
+        'Studiengänge': [rng.choice(majors) for i in range(n)],
+        'Gruppe': '',
+        'Modulpriorität': '',
+        'Gruppenpriorität': '',
+        'Status': 'ZU',
+        'Belegstudiengang': '',
+        'konkr. Titel': '',
+        'Belegweg': '',
+        'Bemerkung': '',
+        'Zeitstempel': [f'{rng.randint(1, 28):02d}.04.2022 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00' for i in range(n)],
+    }, columns=lsf_columns)
+
+
+def write_lsf(roster, filename):
+    """Writes a roster like LSF does, as `.xlsx` (with a title above the table) or `.csv`."""
+    if str(filename).lower().endswith('.csv'):
+        roster.to_csv(filename, index=False)
+        return
+
+    import xlsxwriter
+
+    with xlsxwriter.Workbook(filename, {'constant_memory': True}) as workbook:
+        sheet = workbook.add_worksheet()
+        sheet.write(0, 0, "Belegungen für die Veranstaltung '17053 Astrophysik I' im SoSe 2022")
+        sheet.write_row(2, 0, roster.columns)
+        for row, values in enumerate(roster.itertuples(index=False), start=3):
+            sheet.write_row(row, 0, values)
+
+
+def grade_file(roster, fraction=0.9, seed=0):
+    """Returns grades for a random `fraction` of the students in `roster`.
+
+    The columns are named as in `example/grades.csv`, about a third of the
+    grades have a decimal comma.
+    """
+    rng = random.Random(seed)
+    grades = ['1.0', '1.3', '1.7', '2.0', '2.3', '2.7', '3.0', '3.3', '3.7', '4.0', '5.0']
+    mnr = rng.sample(list(roster['Mtknr']), int(round(fraction * len(roster))))
+    note = [rng.choice(grades) for i in mnr]
+    note = [grade.replace('.', ',') if rng.random() < 1 / 3 else grade for grade in note]
+    return pd.DataFrame({'matrikelnummer': mnr, 'note': note})
+
+
+def write_grades(grades, filename):
+    "writes a grade table as `.csv` or `.xlsx`"
+    if str(filename).lower().endswith('.csv'):
+        grades.to_csv(filename, index=False)
+    else:
+        grades.to_excel(filename, index=False, engine='xlsxwriter')
+
+
+def write_config(filename, encoding='utf8'):
+    "writes the settings of `course` like the GUI saves them"
+    from scheintool import settings
+
+    with open(filename, 'w', encoding=encoding) as fh:
+        for name, _, _ in settings.fields:
+            fh.write(f'{name},{course[name]}\n')
+        fh.write(f'type,{course["type"]}\nmb,master\nsemester,{course["semester"]}\n')
+
+
+def placed_text(filename):
+    "returns, for every page, the sorted list of shown strings with their position rounded to 0.1 pt"
+    import PyPDF2
+
+    pages = []
+    for page in PyPDF2.PdfReader(str(filename)).pages:
+        entries = []
+
+        def visitor(operator, operands, cm, tm):
+            if operator == b'Tj':
+                text = str(operands[0])
+            elif operator == b'TJ':
+                text = ''.join(str(op) for op in operands[0] if isinstance(op, str))
+            else:
+                return
+            x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+            y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+            entries.append((text, round(x, 1), round(y, 1)))
+
+        page.extract_text(visitor_operand_before=visitor)
+        pages.append(sorted(entries))
+    return pages
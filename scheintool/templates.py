@@ -0,0 +1,142 @@
+"""
+Cache for the parsed certificate templates in `pdfs/`.
+
+Every certificate is the template page with an overlay merged on top. Parsing
+the template once per certificate is by far the most expensive part of this,
+so the parsed templates are kept here for the lifetime of the process.
+"""
+import io
+import threading
+from pathlib import Path
+
+import PyPDF2
+from PyPDF2.generic import DecodedStreamObject, NameObject
+
+
+class TemplateCache():
+    """Keeps parsed PDF templates in memory.
+
+    Templates are keyed by their resolved path and modification time, so an
+    edited template is re-read automatically. Use `invalidate` to drop
+    entries explicitly.
+
+    The attributes `hits` and `misses` count how often a template could be
+    served from memory and how often it had to be parsed.
+    """
+
+    def __init__(self):
+        self._readers = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def reader(self, path):
+        """Returns the parsed template at `path`.
+
+        The returned reader is shared, do not modify its pages. Use `page`
+        to get a copy that can be merged with an overlay.
+
+        Parameters
+        ----------
+        path : str | path
+            path to the template PDF
+
+        Returns
+        -------
+        PyPDF2.PdfReader
+            the parsed template
+        """
+        path = Path(path).resolve()
+        mtime = path.stat().st_mtime_ns
+
+        with self._lock:
+            entry = self._readers.get(path)
+            if entry is not None and entry[0] == mtime:
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+
+            # read the whole file so that no file handle is kept open
+            reader = PyPDF2.PdfReader(io.BytesIO(path.read_bytes()))
+            self._readers[path] = (mtime, reader)
+            return reader
+
+    def page(self, path, index=0):
+        """Returns a copy of a template page that can be merged onto.
+
+        `merge_page` replaces the contents and resources of the page it is
+        called on instead of changing the objects they point to, so a shallow
+        copy of the page dictionary is enough to leave the cached template
+        untouched.
+
+        Parameters
+        ----------
+        path : str | path
+            path to the template PDF
+        index : int, optional
+            page number within the template, by default 0
+
+        Returns
+        -------
+        PyPDF2.PageObject
+            the copy of the page
+        """
+        original = self.reader(path).pages[index]
+        page = PyPDF2.PageObject(original.pdf, original.indirect_reference)
+        page.update(original)
+        return page
+
+    def form(self, writer, path, index=0):
+        """Adds a template page to `writer` as a form XObject.
+
+        Pages of `writer` can then show the template by referencing the
+        form, instead of containing a copy of its content stream.
+
+        Parameters
+        ----------
+        writer : PyPDF2.PdfWriter
+            the output document
+        path : str | path
+            path to the template PDF
+        index : int, optional
+            page number within the template, by default 0
+
+        Returns
+        -------
+        IndirectObject, PyPDF2.PageObject
+            reference to the form in `writer`, and the (shared) template page
+        """
+        template = self.reader(path).pages[index]
+
+        contents = DecodedStreamObject()
+        contents.set_data(template.get_contents().get_data())
+
+        # `flate_encode` returns a new stream without the other entries
+        form = contents.flate_encode()
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): template.mediabox,
+            NameObject('/Resources'): template['/Resources'].clone(writer),
+        })
+
+        # PyPDF2 has no public method to add an object that is not a page
+        return writer._add_object(form), template
+
+    def invalidate(self, path=None):
+        """Removes `path` from the cache, or every template if `path` is None."""
+        with self._lock:
+            if path is None:
+                self._readers.clear()
+            else:
+                self._readers.pop(Path(path).resolve(), None)
+
+    def info(self):
+        "returns a dict with the number of hits, misses and cached templates"
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._readers)}
+
+
+# the cache used by `settings.fill_certificate`
+
+template_cache = TemplateCache()
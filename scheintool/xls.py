@@ -0,0 +1,392 @@
+"""
+Reader for the legacy Excel `.XLS` files (BIFF8 in a compound document) as
+they are exported by the LSF.
+
+Only what is needed to get the cell values of a worksheet is implemented:
+the compound document container, the shared string table and the cell
+records. Formatting is only used to tell dates from plain numbers.
+"""
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pandas.io.parsers import TextParser
+
+CFB_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ENDOFCHAIN = 0xFFFFFFFE
+
+# BIFF record types
+
+BOF = 0x0809
+EOF = 0x000A
+BOUNDSHEET = 0x0085
+SST = 0x00FC
+CONTINUE = 0x003C
+DATEMODE = 0x0022
+FORMAT = 0x041E
+XF = 0x00E0
+LABELSST = 0x00FD
+LABEL = 0x0204
+NUMBER = 0x0203
+RK = 0x027E
+MULRK = 0x00BD
+FORMULA = 0x0006
+STRING = 0x0207
+BOOLERR = 0x0205
+
+# built-in number formats that are dates or times
+
+DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+
+
+def is_xls(filename):
+    "returns True if `filename` is a compound document (the container of BIFF8 files)"
+    with open(filename, 'rb') as fh:
+        return fh.read(8) == CFB_SIGNATURE
+
+
+def read_cfb_stream(data, name):
+    """Returns the content of stream `name` from a compound document.
+
+    Parameters
+    ----------
+    data : bytes
+        the content of the compound document file
+    name : str
+        name of the stream, e.g. 'Workbook'
+
+    Returns
+    -------
+    bytes
+        the content of the stream
+    """
+    if data[:8] != CFB_SIGNATURE:
+        raise ValueError('not a compound document file')
+
+    sector_size = 1 << struct.unpack_from('<H', data, 0x1E)[0]
+    mini_sector_size = 1 << struct.unpack_from('<H', data, 0x20)[0]
+    first_dir_sector, = struct.unpack_from('<I', data, 0x30)
+    mini_cutoff, first_minifat_sector = struct.unpack_from('<II', data, 0x38)
+    first_difat_sector, n_difat_sectors = struct.unpack_from('<II', data, 0x44)
+
+    def sector(i):
+        start = (i + 1) * sector_size
+        return data[start:start + sector_size]
+
+    # the sectors of the FAT are listed in the header and the DIFAT sectors
+
+    fat_sectors = list(struct.unpack_from('<109I', data, 0x4C))
+    difat_sector = first_difat_sector
+    for _ in range(n_difat_sectors):
+        entries = struct.unpack(f'<{sector_size // 4}I', sector(difat_sector))
+        fat_sectors += entries[:-1]
+        difat_sector = entries[-1]
+
+    fat = []
+    for i in fat_sectors:
+        if i < ENDOFCHAIN:
+            fat += struct.unpack(f'<{sector_size // 4}I', sector(i))
+
+    def chain(start, table):
+        "follows a sector chain, guarding against loops in corrupt files"
+        sectors = []
+        while start < ENDOFCHAIN:
+            if start >= len(table) or len(sectors) > len(table):
+                raise ValueError('corrupt sector chain in compound document')
+            sectors.append(start)
+            start = table[start]
+        return sectors
+
+    def read(start):
+        return b''.join(sector(i) for i in chain(start, fat))
+
+    # find the stream in the directory
+
+    directory = read(first_dir_sector)
+    entries = {}
+    for pos in range(0, len(directory), 128):
+        entry = directory[pos:pos + 128]
+        name_len, entry_type = struct.unpack_from('<HB', entry, 64)
+        if entry_type not in (2, 5):
+            continue
+        entry_name = entry[:max(name_len - 2, 0)].decode('utf-16-le')
+        start, size = struct.unpack_from('<IQ', entry, 116)
+        entries[entry_type if entry_type == 5 else entry_name] = (start, size & 0xFFFFFFFF)
+
+    if name not in entries:
+        raise ValueError(f'stream {name} not found in compound document')
+
+    start, size = entries[name]
+
+    if size >= mini_cutoff:
+        return read(start)[:size]
+
+    # small streams are stored in the mini stream of the root entry
+
+    minifat_data = read(first_minifat_sector) if first_minifat_sector < ENDOFCHAIN else b''
+    minifat = struct.unpack(f'<{len(minifat_data) // 4}I', minifat_data)
+    ministream = read(entries[5][0])
+    return b''.join(
+        ministream[i * mini_sector_size:(i + 1) * mini_sector_size]
+        for i in chain(start, minifat))[:size]
+
+
+def records(stream, offset=0):
+    "iterates over the BIFF records in `stream` and yields type, data and position"
+    while offset + 4 <= len(stream):
+        rtype, length = struct.unpack_from('<HH', stream, offset)
+        yield rtype, stream[offset + 4:offset + 4 + length], offset
+        offset += 4 + length
+
+
+class StringReader():
+    """Reads BIFF8 unicode strings that may be spread over several records.
+
+    If the characters of a string continue in the next record, that record
+    starts with a new option byte that tells if the rest is compressed.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.chunk = 0
+        self.pos = 0
+
+    def _next_chunk(self):
+        self.chunk += 1
+        self.pos = 0
+
+    def read(self, n):
+        out = b''
+        while len(out) < n:
+            if self.pos >= len(self.chunks[self.chunk]):
+                self._next_chunk()
+            data = self.chunks[self.chunk][self.pos:self.pos + n - len(out)]
+            self.pos += len(data)
+            out += data
+        return out
+
+    def unpack(self, fmt):
+        return struct.unpack('<' + fmt, self.read(struct.calcsize('<' + fmt)))
+
+    def string(self, length_format='H'):
+        if self.pos >= len(self.chunks[self.chunk]):
+            self._next_chunk()
+        n_chars, = self.unpack(length_format)
+        options, = self.unpack('B')
+        n_runs = self.unpack('H')[0] if options & 0x08 else 0
+        n_ext = self.unpack('I')[0] if options & 0x04 else 0
+
+        parts = []
+        while n_chars > 0:
+            if self.pos >= len(self.chunks[self.chunk]):
+                self._next_chunk()
+                options, = self.unpack('B')
+            width = 2 if options & 0x01 else 1
+            available = (len(self.chunks[self.chunk]) - self.pos) // width
+            n = min(n_chars, available)
+            data = self.read(n * width)
+            parts.append(data.decode('utf-16-le' if width == 2 else 'latin-1'))
+            n_chars -= n
+
+        # skip the formatting runs and the phonetic data
+        self.read(4 * n_runs + n_ext)
+        return ''.join(parts)
+
+
+def decode_rk(rk):
+    "decodes a number stored in the RK format"
+    if rk & 0x02:
+        value = rk >> 2
+        if value & 0x20000000:
+            value -= 0x40000000
+    else:
+        value, = struct.unpack('<d', struct.pack('<II', 0, rk & 0xFFFFFFFC))
+    if rk & 0x01:
+        value /= 100
+    return value
+
+
+def is_date_format(fmt):
+    "returns True if a number format string contains date or time placeholders"
+    in_quotes = False
+    in_brackets = False
+    for char in fmt.lower():
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == '[':
+            in_brackets = True
+        elif char == ']':
+            in_brackets = False
+        elif not in_quotes and not in_brackets and char in 'dmyhs':
+            return True
+    return False
+
+
+def read_sheet(filename, sheet=0):
+    """Reads the cell values of one worksheet of a BIFF8 `.XLS` file.
+
+    Values are converted like `pandas.read_excel` does: integral numbers
+    become `int`, date formatted numbers `datetime` and empty cells ''.
+
+    Parameters
+    ----------
+    filename : str | path
+        the XLS file
+    sheet : int, optional
+        index of the worksheet, by default 0
+
+    Returns
+    -------
+    list
+        list of rows, each row is a list of cell values. Trailing empty rows
+        are removed.
+    """
+    data = Path(filename).read_bytes()
+    try:
+        stream = read_cfb_stream(data, 'Workbook')
+    except ValueError:
+        if data[:8] == CFB_SIGNATURE:
+            raise ValueError('only BIFF8 files (Excel 97 and later) are supported')
+        raise
+    except (struct.error, IndexError) as err:
+        raise ValueError(f'corrupt compound document: {err}')
+
+    try:
+        return _read_sheet(stream, sheet)
+    except (struct.error, IndexError, UnicodeDecodeError) as err:
+        raise ValueError(f'corrupt BIFF8 workbook: {err}')
+
+
+def _read_sheet(stream, sheet):
+
+    # read the workbook globals
+
+    sheets = []
+    sst_chunks = []
+    n_unique = 0
+    formats = {}
+    xf_formats = []
+    datemode = 0
+    in_sst = False
+
+    for i, (rtype, rdata, pos) in enumerate(records(stream)):
+        if i == 0 and (rtype != BOF or struct.unpack_from('<H', rdata)[0] != 0x0600):
+            raise ValueError('only BIFF8 files (Excel 97 and later) are supported')
+        if rtype == EOF:
+            break
+        elif rtype == BOUNDSHEET:
+            offset, visibility, sheet_type = struct.unpack_from('<IBB', rdata)
+            if sheet_type == 0:
+                sheets.append(offset)
+        elif rtype == DATEMODE:
+            datemode, = struct.unpack_from('<H', rdata)
+        elif rtype == FORMAT:
+            index, = struct.unpack_from('<H', rdata)
+            formats[index] = StringReader([rdata[2:]]).string()
+        elif rtype == XF:
+            xf_formats.append(struct.unpack_from('<H', rdata, 2)[0])
+        elif rtype == SST:
+            n_unique, = struct.unpack_from('<I', rdata, 4)
+            sst_chunks = [rdata[8:]]
+        elif rtype == CONTINUE and in_sst:
+            sst_chunks.append(rdata)
+        in_sst = rtype == SST or (rtype == CONTINUE and in_sst)
+
+    reader = StringReader(sst_chunks)
+    sst = [reader.string() for _ in range(n_unique)]
+
+    if sheet >= len(sheets):
+        raise ValueError(f'workbook has no worksheet number {sheet}')
+
+    date_xf = set(
+        i for i, fmt in enumerate(xf_formats)
+        if fmt in DATE_FORMATS or (fmt in formats and is_date_format(formats[fmt])))
+    epoch = datetime(1904, 1, 1) if datemode else datetime(1899, 12, 30)
+
+    def number(value, xf):
+        if xf in date_xf:
+            return epoch + timedelta(days=value)
+        if float(value).is_integer():
+            return int(value)
+        return value
+
+    # read the cells of the sheet
+
+    cells = {}
+    formula_cell = None
+
+    for rtype, rdata, pos in records(stream, sheets[sheet]):
+        if rtype == EOF:
+            break
+        elif rtype == LABELSST:
+            row, col, xf, index = struct.unpack_from('<HHHI', rdata)
+            cells[row, col] = sst[index]
+        elif rtype == LABEL:
+            row, col, xf = struct.unpack_from('<HHH', rdata)
+            cells[row, col] = StringReader([rdata[6:]]).string()
+        elif rtype == NUMBER:
+            row, col, xf, value = struct.unpack_from('<HHHd', rdata)
+            cells[row, col] = number(value, xf)
+        elif rtype == RK:
+            row, col, xf, rk = struct.unpack_from('<HHHI', rdata)
+            cells[row, col] = number(decode_rk(rk), xf)
+        elif rtype == MULRK:
+            row, first = struct.unpack_from('<HH', rdata)
+            for i in range((len(rdata) - 6) // 6):
+                xf, rk = struct.unpack_from('<HI', rdata, 4 + 6 * i)
+                cells[row, first + i] = number(decode_rk(rk), xf)
+        elif rtype == BOOLERR:
+            row, col, xf, value, is_error = struct.unpack_from('<HHHBB', rdata)
+            cells[row, col] = '' if is_error else bool(value)
+        elif rtype == FORMULA:
+            row, col, xf = struct.unpack_from('<HHH', rdata)
+            result = rdata[6:14]
+            if result[6:8] != b'\xff\xff':
+                cells[row, col] = number(struct.unpack('<d', result)[0], xf)
+            elif result[0] == 0:
+                # the string result follows in a STRING record
+                formula_cell = (row, col)
+            elif result[0] == 1:
+                cells[row, col] = bool(result[2])
+        elif rtype == STRING and formula_cell is not None:
+            cells[formula_cell] = StringReader([rdata]).string()
+            formula_cell = None
+
+    # pandas drops trailing empty rows and cells
+
+    cells = {key: value for key, value in cells.items() if value != ''}
+    if not cells:
+        return []
+
+    n_rows = max(row for row, col in cells) + 1
+    n_cols = max(col for row, col in cells) + 1
+    rows = [[''] * n_cols for _ in range(n_rows)]
+    for (row, col), value in cells.items():
+        rows[row][col] = value
+
+    return rows
+
+
+def read_xls(filename, sheet=0, **kwargs):
+    """Reads a worksheet of a BIFF8 `.XLS` file into a DataFrame.
+
+    The values are parsed the same way as by `pandas.read_excel`, so the
+    result is the same as when reading the file converted to `.xlsx`.
+
+    Parameters
+    ----------
+    filename : str | path
+        the XLS file
+    sheet : int, optional
+        index of the worksheet, by default 0
+    kwargs : dict
+        passed to the pandas parser, e.g. `skiprows` or `header`
+
+    Returns
+    -------
+    DataFrame
+        the content of the worksheet
+    """
+    kwargs.setdefault('header', 0)
+    parser = TextParser(read_sheet(filename, sheet=sheet), skip_blank_lines=False, **kwargs)
+    return parser.read()
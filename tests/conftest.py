@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the tests run from the repository without installing it
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from scheintool import settings  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def non_interactive(tmp_path, monkeypatch):
+    "errors are raised instead of shown, and rosters are cached in a temporary directory"
+    monkeypatch.setattr(settings, 'interactive', False)
+    monkeypatch.setattr(settings, 'error_handler', None)
+    monkeypatch.setattr(settings, '_roster_cache', None)
+    monkeypatch.setattr(settings, 'cache_dir', tmp_path / 'cache')
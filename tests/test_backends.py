@@ -0,0 +1,47 @@
+"""
+All backends place the same text at the same coordinates as `merge`, the
+reference backend, see `benchmarks/bench_backends.py`.
+"""
+import pytest
+
+from scheintool import settings, backends
+from scheintool.synthetic import certificate_data, placed_text
+
+available = [name for name, backend in backends.backends.items() if backend.available()]
+
+# names that are not in WinAnsi: from Symbol, from ZapfDingbats, and in no standard font
+
+names = [
+    ('lastname', 'Dvořák'),
+    ('firstname', 'Łukasz'),
+    ('pob', 'Θεσσαλονίκη'),
+    ('lastname', 'Häkkinen ✓'),
+    ('firstname', '王 (Wang) \\'),
+]
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = certificate_data(20)
+    for row, (column, value) in zip(data.index, names):
+        data.loc[row, column] = value
+        data.loc[row, 'grade'] = '1.0'
+    return settings.normalize_grades(data)
+
+
+@pytest.mark.skipif('merge' not in available, reason='needs reportlab')
+@pytest.mark.parametrize('degree', ['master', 'bachelor'])
+@pytest.mark.parametrize('backend', [name for name in available if name != 'merge'])
+def test_same_text(data, backend, degree, tmp_path):
+    settings.fill_certificate(data, tmp_path / 'merge.pdf', degree=degree, backend='merge')
+    settings.fill_certificate(data, tmp_path / f'{backend}.pdf', degree=degree, backend=backend)
+
+    reference = placed_text(tmp_path / 'merge.pdf')
+    assert len(reference) == (data['BENB'] == 'BE').sum()
+    assert placed_text(tmp_path / f'{backend}.pdf') == reference
+
+
+def test_black_square():
+    "characters that no standard font has are shown as black square, as in ReportLab"
+    assert backends._encode('王') == (b'/F2', b'n')
+    assert backends._encode('ä') == (b'/F1', 'ä'.encode('cp1252'))
@@ -0,0 +1,63 @@
+"""
+`scheintool.convert.sanitize` gives the same bytes as the regular expression
+used before, and binary exports are passed on unchanged.
+"""
+import re
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from scheintool import xls
+from scheintool.convert import is_binary, sanitize, sanitized
+
+example = Path(__file__).parents[1] / 'example' / 'LSF.XLS'
+
+
+def whole_file(source, target, encoding):
+    "the sanitization as it was done before: read all, replace, write all"
+    with open(source, 'r', encoding=encoding) as fh:
+        content = re.sub(r'\s', ' ', fh.read())
+    with open(target, 'w', encoding=encoding) as fh:
+        fh.write(content)
+
+
+# whitespace of every kind, line breaks in all conventions and non-ASCII names
+
+text = ('<html><body><table>\r\n<tr>\t<td>M\xfcller</td>\t<td>J\xfcrgen\xa0Maria</td></tr>\r\n'
+        '<tr><td>Stra\xdfe\x0b1</td>\r<td>\x0c</td></tr>\n\r\n\r\r\n</table></body></html>\r\n')
+
+extra = {'latin-1': '', 'utf-8': '<td>Ł\xf3dź 　 </td>\r\n'}
+
+
+def test_binary_unchanged(tmp_path):
+    assert is_binary(example)
+    assert sanitized(example, tmp_path) == example
+    assert len(xls.read_xls(example)) > 0
+
+    workbook = tmp_path / 'roster.xlsx'
+    with zipfile.ZipFile(workbook, 'w') as archive:
+        archive.writestr('content.xml', 'a\r\nb\xa0c')
+    assert is_binary(workbook)
+    assert sanitized(workbook, tmp_path / 'out') == workbook
+
+
+@pytest.mark.parametrize('encoding', ['latin-1', 'utf-8'])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 16, 1024**2])
+def test_same_as_regex(tmp_path, encoding, chunk_size):
+    source = tmp_path / 'export.xls'
+    source.write_bytes((text + extra[encoding]).encode(encoding) * 3)
+
+    whole_file(source, tmp_path / 'regex.xls', encoding)
+    sanitize(source, tmp_path / 'stream.xls', encoding, chunk_size=chunk_size)
+    assert (tmp_path / 'stream.xls').read_bytes() == (tmp_path / 'regex.xls').read_bytes()
+
+
+@pytest.mark.parametrize('encoding', ['latin-1', 'utf-8'])
+def test_line_break_at_chunk_boundary(tmp_path, encoding):
+    "a \\r\\n split between two chunks is one line break, as when reading the whole file"
+    source = tmp_path / 'export.xls'
+    source.write_bytes('abc\r\ndef\r\r\n'.encode(encoding))
+    for chunk_size in range(1, 12):
+        sanitize(source, tmp_path / 'stream.xls', encoding, chunk_size=chunk_size)
+        assert (tmp_path / 'stream.xls').read_bytes() == b'abc def  '
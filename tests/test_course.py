@@ -0,0 +1,29 @@
+"""
+The entries of the course are drawn once as shared form XObject (`/Crs`),
+and the certificates show the same text as when they are drawn on every
+page, see `benchmarks/bench_course.py`.
+"""
+import PyPDF2
+import pytest
+
+from scheintool import settings, backends
+from scheintool.synthetic import certificate_data, placed_text
+
+variants = {
+    'form': backends.ReportlabBackend,
+    'direct': backends.DirectBackend,
+}
+
+
+@pytest.mark.parametrize('name', [name for name in variants if backends.get_backend(name).available()])
+def test_shared_course(name, tmp_path):
+    data = certificate_data(30)
+    for shared in [False, True]:
+        settings.fill_certificate(data, tmp_path / f'{shared}.pdf', backend=variants[name](shared_course=shared))
+
+    assert placed_text(tmp_path / 'False.pdf') == placed_text(tmp_path / 'True.pdf')
+
+    pages = PyPDF2.PdfReader(str(tmp_path / 'True.pdf')).pages
+    forms = {page['/Resources']['/XObject'].raw_get('/Crs').idnum for page in pages}
+    assert len(pages) > 1 and len(forms) == 1
+    assert all('/Crs' not in page['/Resources']['/XObject'] for page in PyPDF2.PdfReader(str(tmp_path / 'False.pdf')).pages)
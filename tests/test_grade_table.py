@@ -0,0 +1,37 @@
+"""
+A grade table that is cancelled while it is written does not replace the
+previous one.
+"""
+import pytest
+
+from scheintool import settings
+from scheintool.synthetic import certificate_data, course
+
+
+@pytest.mark.parametrize('suffix', ['.xlsx', '.csv'])
+def test_cancel_keeps_old_table(tmp_path, suffix):
+    fname = tmp_path / f'grades{suffix}'
+    settings.write_grade_table(fname, certificate_data(50), course)
+    before = fname.read_bytes()
+
+    def cancel(done, total):
+        if done > 100:
+            raise settings.Cancelled()
+
+    with pytest.raises(settings.Cancelled):
+        settings.write_grade_table(fname, certificate_data(512, seed=1), course, progress=cancel)
+
+    assert fname.read_bytes() == before
+    assert [path.name for path in tmp_path.iterdir()] == [fname.name]
+
+
+@pytest.mark.parametrize('constant_memory', [False, True])
+def test_complete_table_replaces_old_one(tmp_path, constant_memory):
+    import pandas as pd
+
+    fname = tmp_path / 'grades.xlsx'
+    settings.write_grade_table(fname, certificate_data(50), course)
+    settings.write_grade_table(fname, certificate_data(512, seed=1), course, constant_memory=constant_memory)
+
+    assert len(pd.read_excel(fname, skiprows=11)) == 512
+    assert [path.name for path in tmp_path.iterdir()] == [fname.name]
@@ -0,0 +1,82 @@
+"""
+The Generate run of the GUI writes the same outputs with and without the
+overlap of its stages, see `benchmarks/bench_generate.py`.
+"""
+import threading
+import concurrent.futures
+
+import pandas as pd
+import pytest
+
+from scheintool import pipeline
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, placed_text, course
+
+
+@pytest.fixture(scope='module')
+def inputs(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('inputs')
+    roster = lsf_roster(40)
+    write_lsf(roster, tmp / 'lsf.xlsx')
+    write_grades(grade_file(roster), tmp / 'grades.csv')
+    return tmp / 'lsf.xlsx', tmp / 'grades.csv'
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_concurrent(inputs, tmp_path, workers):
+    outputs = {}
+    for concurrent in [False, True]:
+        filename = tmp_path / f'{concurrent}.pdf'
+        result = pipeline.generate(*inputs, filename, course, workers=workers, concurrent=concurrent)
+        assert result['certificates'] and result['table']
+        assert all(stage['error'] is None for stage in result['stages'].values())
+        assert sorted(result['files']) == [str(filename), str(filename.with_suffix('.xlsx'))]
+        outputs[concurrent] = filename
+
+    assert placed_text(outputs[True]) == placed_text(outputs[False])
+    pd.testing.assert_frame_equal(pd.read_excel(outputs[True].with_suffix('.xlsx')),
+                                  pd.read_excel(outputs[False].with_suffix('.xlsx')))
+
+
+
+def test_processes_start_before_threads(inputs, tmp_path, monkeypatch):
+    "with the overlap, the worker processes are forked while no other thread of the run exists"
+    threads = []
+    start = pipeline._start_processes
+
+    def count_threads(workers):
+        threads.append(threading.active_count())
+        return start(workers)
+
+    monkeypatch.setattr(pipeline, '_start_processes', count_threads)
+
+    # the renderers use the processes of the pipeline instead of starting new ones
+    new_pools = []
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', lambda *args, **kwargs: new_pools.append(args))
+    before = threading.active_count()
+    result = pipeline.generate(*inputs, tmp_path / 'out.pdf', course, workers=2, concurrent=True, single_files=True)
+    assert result['certificates'] and result['table']
+    assert threads == [before]
+    assert new_pools == []
+
+
+def test_gui_messages(inputs, tmp_path):
+    "the GUI names the stage that failed and lists the files that were written"
+    pytest.importorskip('tkinter')
+    from scheintool import Scheintool
+
+    gui = Scheintool.main()
+    gui.lsf_file, gui.grade_file = inputs
+    gui.generate(tmp_path / 'out.pdf', dict(course), 'master', 1)
+    messages = []
+    while not gui.messages.empty():
+        messages.append(gui.messages.get())
+    assert messages[-1] == ('done', False, False, False, [str(tmp_path / 'out.pdf'), str(tmp_path / 'out.xlsx')])
+
+    gui.grade_file = tmp_path / 'grades.txt'
+    gui.grade_file.write_text('')
+    gui.generate(tmp_path / 'failed.pdf', dict(course), 'master', 1)
+    messages = []
+    while not gui.messages.empty():
+        messages.append(gui.messages.get())
+    assert 'Error in read_grades' in [message[1] for message in messages if message[0] == 'error']
+    assert messages[-1] == ('done', True, True, False, [])
@@ -0,0 +1,54 @@
+"""
+Rows that cannot be read do not stop `read_grades` and `read_LSF` in batch
+and service runs, they are reported by `preflight.check`, see
+`benchmarks/bench_preflight.py`.
+"""
+import pytest
+
+from scheintool import settings, preflight, batch
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, write_config, course
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    roster = lsf_roster(20)
+    roster.loc[0, 'Geburtstag/-ort'] = '01.02.2003'
+    write_lsf(roster, tmp_path / 'lsf.csv')
+
+    grades = grade_file(roster, fraction=1).astype(str)
+    grades.loc[grades['matrikelnummer'] == str(roster.loc[0, 'Mtknr']), 'note'] = '1.0'
+    grades.loc[1, 'note'] = 'sehr gut'
+    grades.loc[2, 'matrikelnummer'] = 'x123'
+    write_grades(grades, tmp_path / 'grades.csv')
+    write_config(tmp_path / 'config.txt')
+    return roster, grades, tmp_path
+
+
+def test_reported_by_preflight(inputs):
+    roster, grades, tmp = inputs
+    with pytest.warns(UserWarning, match='Invalid grades'):
+        read = settings.read_grades(tmp / 'grades.csv')
+    with pytest.warns(UserWarning, match='date/place of birth for 1 entries'):
+        lsf = settings.read_LSF(tmp / 'lsf.csv', use_cache=False)
+    assert len(read) == len(grades) - 2
+
+    report = preflight.check(lsf, read, course)
+    errors = {issue.check: issue for issue in report.errors}
+    assert sorted(errors) == ['empty', 'grade format', 'keys']
+    assert errors['grade format'].keys == [int(grades.loc[1, 'matrikelnummer'])]
+    assert "'x123'" in errors['keys'].message
+    assert errors['empty'].keys == [int(roster.loc[0, 'Mtknr'])]
+
+
+def test_batch_course_fails_with_report(inputs):
+    _, _, tmp = inputs
+    manifest = tmp / 'manifest.yaml'
+    manifest.write_text('courses:\n  - name: astro\n    config: config.txt\n    lsf: lsf.csv\n    grades: grades.csv\n')
+
+    with pytest.warns(UserWarning):
+        [result] = batch.run(batch.read_manifest(manifest), output=tmp / 'out')
+
+    assert result['status'] == 'failed'
+    assert {issue['check'] for issue in result['preflight']['issues'] if issue['severity'] == 'error'} == \
+        {'empty', 'grade format', 'keys'}
+    assert not (tmp / 'out' / 'astro.pdf').exists()
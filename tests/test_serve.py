@@ -0,0 +1,115 @@
+"""
+`schein serve` answers a local client, and only a local one, see
+`benchmarks/bench_serve.py` for the latency.
+"""
+import io
+import json
+import zipfile
+import threading
+import http.client
+from pathlib import Path
+
+import pytest
+
+from scheintool import serve
+from scheintool.synthetic import lsf_roster, write_lsf, grade_file, write_grades, write_config
+
+
+@pytest.fixture(scope='module')
+def inputs(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('inputs')
+    roster = lsf_roster(20)
+    write_lsf(roster, tmp / 'lsf.xlsx')
+    write_grades(grade_file(roster), tmp / 'grades.csv')
+    write_config(tmp / 'config.txt')
+    return [tmp / 'config.txt', tmp / 'lsf.xlsx', tmp / 'grades.csv']
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = serve.Server(('127.0.0.1', 0), jobs=1, queue=1, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=b'', headers=None):
+    "sends a request with exactly the given headers, returns status, headers and content"
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=60)
+    connection.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+    for name, value in (headers or {}).items():
+        connection.putheader(name, value)
+    connection.endheaders(body)
+    response = connection.getresponse()
+    return response.status, response.headers, response.read()
+
+
+def test_generate(server, inputs):
+    status, content = serve.post(server.url, *inputs, name='astro1')
+    assert status == 200
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        assert sorted(archive.namelist()) == ['astro1.pdf', 'astro1.xlsx', 'preflight.json']
+        assert archive.read('astro1.pdf').startswith(b'%PDF')
+
+
+@pytest.mark.parametrize('name, stem', [
+    ('/tmp/scheintool-test/PWNED', 'tmp_scheintool-test_PWNED'),
+    ('../../escape', 'escape'),
+    ('a\r\nX-Evil: 1', 'a_X-Evil_1'),
+    ('Łódź', 'Łódź'),
+    ('...', 'certificates'),
+])
+def test_file_stem(name, stem):
+    assert serve.file_stem(name) == stem
+
+
+@pytest.mark.parametrize('name', ['/tmp/scheintool-test/PWNED', '../../PWNED', 'a\r\nX-Evil: 1', 'Łódź'])
+def test_names_stay_names(server, inputs, name):
+    status, content = serve.post(server.url, *inputs, name=name, format='pdf')
+    assert status == 200 and content.startswith(b'%PDF')
+    assert not Path('/tmp/scheintool-test').exists() and not Path('../PWNED.pdf').exists()
+
+
+def test_download_name(server, inputs):
+    body = io.BytesIO()
+    boundary = 'b'
+    for key, filename in zip(['config', 'lsf', 'grades'], inputs):
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"; filename="{filename.name}"\r\n\r\n'.encode())
+        body.write(filename.read_bytes() + b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    body = body.getvalue()
+
+    port = server.server_address[1]
+    status, headers, content = request(server, 'POST', '/generate?format=pdf&name=%C5%81%C3%B3d%C5%BA%0D%0AX-Evil:%201', body, {
+        'Host': f'127.0.0.1:{port}', 'Content-Type': f'multipart/form-data; boundary={boundary}',
+        'Content-Length': str(len(body))})
+    assert status == 200 and content.startswith(b'%PDF')
+    assert 'X-Evil' not in headers
+    assert "filename*=UTF-8''%C5%81%C3%B3d%C5%BA_X-Evil_1.pdf" in headers['Content-Disposition']
+
+
+@pytest.mark.parametrize('headers', [
+    {'Host': 'evil.example:{port}'},
+    {'Host': '127.0.0.1:{port}', 'Origin': 'http://evil.example'},
+    {'Host': '127.0.0.1:{port}', 'Origin': 'null'},
+])
+def test_only_local(server, headers):
+    port = server.server_address[1]
+    headers = {name: value.format(port=port) for name, value in headers.items()}
+    assert request(server, 'GET', '/metrics', headers=headers)[0] == 403
+    assert request(server, 'POST', '/generate', headers={**headers, 'Content-Length': '0'})[0] == 403
+
+    local = {'Host': f'localhost:{port}', 'Origin': f'http://localhost:{port}'}
+    assert request(server, 'GET', '/health', headers=local)[0] == 200
+
+
+@pytest.mark.parametrize('length, status', [(None, 411), ('-1', 400), ('abc', 400), (str(serve.max_upload + 1), 413)])
+def test_content_length(server, length, status):
+    headers = {'Host': f'127.0.0.1:{server.server_address[1]}', 'Content-Type': 'multipart/form-data; boundary=b'}
+    if length is not None:
+        headers['Content-Length'] = length
+    answer, _, content = request(server, 'POST', '/generate', headers=headers)
+    assert answer == status
+    assert 'error' in json.loads(content)
@@ -0,0 +1,23 @@
+"""
+Certificates rendered by several worker processes are the same as the
+serial ones, and the template is stored once, see
+`benchmarks/bench_workers.py` and `benchmarks/bench_output_size.py`.
+"""
+import PyPDF2
+import pytest
+
+from scheintool import settings, backends
+from scheintool.synthetic import certificate_data, placed_text
+
+
+@pytest.mark.parametrize('backend', [name for name in ['form', 'direct'] if backends.get_backend(name).available()])
+def test_workers(backend, tmp_path):
+    data = certificate_data(40)
+    settings.fill_certificate(data, tmp_path / 'serial.pdf', backend=backend)
+    settings.fill_certificate(data, tmp_path / 'parallel.pdf', workers=2, backend=backend)
+
+    assert placed_text(tmp_path / 'parallel.pdf') == placed_text(tmp_path / 'serial.pdf')
+
+    pages = PyPDF2.PdfReader(str(tmp_path / 'parallel.pdf')).pages
+    assert len({page['/Resources']['/XObject'].raw_get('/Tpl').idnum for page in pages}) == 1
+    assert (tmp_path / 'parallel.pdf').stat().st_size < 1.2 * (tmp_path / 'serial.pdf').stat().st_size
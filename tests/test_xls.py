@@ -0,0 +1,118 @@
+"""
+`.XLS` rosters are read natively, and converted with LibreOffice only if the
+native reader cannot read the file.
+"""
+import sys
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scheintool import settings, xls
+
+example = Path(__file__).parents[1] / 'example' / 'LSF.XLS'
+
+
+class FakePool():
+    "stands in for the `ConversionPool`, the 'converted' file is `result`"
+
+    def __init__(self, result):
+        self.result = result
+        self.files = []
+
+    def convert(self, filename):
+        self.files.append(filename)
+        return str(self.result)
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    result = tmp_path / 'converted.xlsx'
+    shutil.copy(Path(__file__).parents[1] / 'example' / 'LSF.xlsx', result)
+    pool = FakePool(result)
+    monkeypatch.setattr(settings, '_conversion_pool', pool)
+    return pool
+
+
+def test_truncated_file_raises_value_error(tmp_path):
+    truncated = tmp_path / 'LSF.XLS'
+    truncated.write_bytes(example.read_bytes()[:600])
+    with pytest.raises(ValueError):
+        xls.read_sheet(truncated)
+
+
+def test_native(pool):
+    assert len(settings.read_LSF(example, use_cache=False)) > 0
+    assert pool.files == []
+
+
+@pytest.mark.parametrize('content', [
+    lambda data: data[:600],                                   # truncated compound document
+    lambda data: data.replace('Workbook'.encode('utf-16-le'), 'Book\0\0\0\0'.encode('utf-16-le')),  # BIFF5
+    lambda data: b'<html><body><table></table></body></html>',  # text export
+])
+def test_fallback_to_libreoffice(pool, tmp_path, content):
+    roster = tmp_path / 'LSF.XLS'
+    roster.write_bytes(content(example.read_bytes()))
+    with pytest.warns(UserWarning, match='converting it with libreoffice'):
+        lsf = settings.read_LSF(roster, use_cache=False)
+    assert pool.files == [roster]
+    pd.testing.assert_frame_equal(lsf, settings.read_LSF(example, use_cache=False))
+
+
+def test_missing_columns_are_not_converted(pool, monkeypatch):
+    monkeypatch.setattr(xls, 'read_xls', lambda *args, **kwargs: pd.DataFrame({'Nachname': ['Müller']}))
+    with pytest.raises(RuntimeError, match='Missing columns'):
+        settings.read_LSF(example, use_cache=False)
+    assert pool.files == []
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='the stand-in for soffice is a script')
+def test_ask_for_libreoffice_in_background(tmp_path, monkeypatch):
+    "the GUI reads in a background thread, which asks for libreoffice through `path_handler`"
+    soffice = tmp_path / 'soffice'
+    soffice.write_text(f'#!{sys.executable}\n'
+                       'import sys, shutil, pathlib\n'
+                       'args = sys.argv[1:]\n'
+                       'outdir = pathlib.Path(args[args.index("--outdir") + 1])\n'
+                       'for name in args[args.index("--outdir") + 2:]:\n'
+                       f'    shutil.copy({str(example.with_suffix(".xlsx"))!r}, outdir / (pathlib.Path(name).stem + ".xlsx"))\n')
+    soffice.chmod(0o755)
+
+    asked = []
+    monkeypatch.setattr(settings, 'interactive', True)
+    monkeypatch.setattr(settings, 'path_handler', lambda: asked.append(True) or str(soffice))
+    monkeypatch.setattr(settings, '_config', {})
+    monkeypatch.setattr(settings, '_conversion_pool', None)
+    monkeypatch.setattr(settings, 'write_config', lambda config: None)
+    monkeypatch.setattr(settings, 'guess_path', lambda platform: None)
+
+    roster = tmp_path / 'LSF.XLS'
+    roster.write_bytes(example.read_bytes()[:600])
+    result = {}
+
+    def read():
+        with pytest.warns(UserWarning, match='converting it with libreoffice'):
+            result['lsf'] = settings.read_LSF(roster, use_cache=False)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+    settings._conversion_pool.close()
+
+    assert asked == [True]
+    pd.testing.assert_frame_equal(result['lsf'], settings.read_LSF(example, use_cache=False))
+
+
+def test_no_libreoffice_in_background(monkeypatch):
+    monkeypatch.setattr(settings, 'interactive', True)
+    monkeypatch.setattr(settings, '_config', {})
+    monkeypatch.setattr(settings, 'guess_path', lambda platform: None)
+
+    errors = []
+    thread = threading.Thread(target=lambda: errors.append(pytest.raises(RuntimeError, settings.get_libreoffice_exec)))
+    thread.start()
+    thread.join()
+    assert 'libreoffice not found' in str(errors[0].value)